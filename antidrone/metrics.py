@@ -0,0 +1,90 @@
+"""
+Prometheus metrics for the site, served at /metrics.
+
+Under gunicorn with several workers, point PROMETHEUS_MULTIPROC_DIR at an
+empty directory shared by the workers (wipe it on deploy). prometheus_client
+then keeps each worker's samples in mmap'd files there and /metrics merges
+them, so every scrape sees the whole fleet instead of one random worker.
+"""
+import hmac
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_LATENCY = Histogram(
+    'antidrone_request_duration_seconds',
+    'Request latency by URL name.',
+    ['view'],
+)
+RESPONSES = Counter(
+    'antidrone_responses_total',
+    'Responses by URL name and status code.',
+    ['view', 'status'],
+)
+DB_QUERIES = Histogram(
+    'antidrone_request_db_queries',
+    'Database queries per request.',
+    ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+DB_TIME = Histogram(
+    'antidrone_request_db_seconds',
+    'Time spent in database queries per request.',
+    ['view'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+CACHE_LOOKUPS = Counter(
+    'antidrone_cache_lookups_total',
+    'Lookups of the catalog version and the sitemap caches by result (hit ratio = hit / (hit + miss)); '
+    'page and template fragment caches are not counted.',
+    ['result'],
+)
+ORDERS_CREATED = Counter(
+    'antidrone_orders_created_total',
+    'Orders created through the order API.',
+)
+THROTTLED = Counter(
+    'antidrone_throttled_requests_total',
+    'Requests rejected with 429 by rate limits, by scope and bucket (per_ip / global).',
+    ['scope', 'bucket'],
+)
+ORDERS_DEDUPLICATED = Counter(
+    'antidrone_orders_deduplicated_total',
+    'Order API requests answered with an existing order (retries, double clicks).',
+)
+
+
+def _registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition for scrapers sending ``Authorization: Bearer
+    <METRICS_TOKEN>``. Behind a reverse proxy every request comes from its
+    address, so METRICS_ALLOWED_IPS alone does not keep /metrics private;
+    without a token the endpoint is off.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not getattr(settings, 'METRICS_ENABLED', False) or not token:
+        raise Http404
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', [])
+    if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        raise Http404
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        raise Http404
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,291 @@
+"""
+Request instrumentation middleware.
+
+Both middlewares serve sync and async (ASGI) requests. Queries are counted
+by one execute wrapper installed on every database connection, which
+records into the timings of the request being served (a context variable,
+so it also follows the request into the threads of sync_to_async()).
+"""
+import contextvars
+import json
+import logging
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+logger = logging.getLogger('antidrone.perf')
+
+_current_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Timings and counters collected while serving one request."""
+
+    def __init__(self, slow_query_ms: int = 0):
+        self.started = time.perf_counter()
+        self.slow_query_ms = slow_query_ms
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.slow_queries = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.view_started = None
+        self.view_time = None
+        self.render_started = None
+        self.render_time = None
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper (see connection.execute_wrapper)."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.query_count += 1
+            self.sql_time += duration
+            self.statements[(sql, repr(params))] += 1
+            if (
+                self.slow_query_ms
+                and not many
+                and duration * 1000 >= self.slow_query_ms
+                and sql.lstrip()[:6].upper() == 'SELECT'
+            ):
+                self.slow_queries.append((context['connection'].alias, sql, params, duration))
+
+    @property
+    def duplicate_queries(self) -> int:
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    def mark_view_finished(self):
+        if self.view_started is not None and self.view_time is None:
+            self.view_time = time.perf_counter() - self.view_started
+
+    def server_timing(self, total: float) -> str:
+        entries = [
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.query_count} queries, {self.duplicate_queries} dup"',
+        ]
+        if self.view_time is not None:
+            entries.append(f'view;dur={self.view_time * 1000:.1f}')
+        if self.render_time is not None:
+            entries.append(f'render;dur={self.render_time * 1000:.1f}')
+        entries.append(f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"')
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def record_cache_access(hit: bool) -> None:
+    """Count a cache lookup against the current request, if instrumented."""
+    if getattr(settings, 'METRICS_ENABLED', False):
+        metrics.CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+    timings = _current_timings.get()
+    if timings is None:
+        return
+    if hit:
+        timings.cache_hits += 1
+    else:
+        timings.cache_misses += 1
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.record_query(execute, sql, params, many, context)
+
+
+def _instrument(connection, **kwargs) -> None:
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _instrument_connections() -> None:
+    """
+    Count the queries of every connection: those of this thread now, and
+    those opened later in any thread (e.g. by sync_to_async() in async views).
+    """
+    connection_created.connect(_instrument, dispatch_uid='antidrone.middleware.instrument')
+    for alias in connections:
+        _instrument(connections[alias])
+
+
+class _SyncAsyncMiddleware:
+    """Calls ``_call`` for sync requests and ``_acall`` under an async handler."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        _instrument_connections()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        return self._call(request)
+
+
+def _explain(alias: str, sql: str, params) -> str:
+    connection = connections[alias]
+    prefix = connection.ops.explain_query_prefix()
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+
+
+class ServerTimingMiddleware(_SyncAsyncMiddleware):
+    """
+    Per-request SQL, view, template and cache timings.
+
+    Enabled with PERF_INSTRUMENTATION=True. Adds a Server-Timing header,
+    logs one JSON line per request to the ``antidrone.perf`` logger and
+    logs the EXPLAIN plan of SELECTs slower than PERF_SLOW_QUERY_MS.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.slow_query_ms = getattr(settings, 'PERF_SLOW_QUERY_MS', 100)
+
+    def _call(self, request):
+        timings = RequestTimings(self.slow_query_ms)
+        token = _current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        total = self._finish(response, timings)
+        self._log(request, response, timings, total)
+        return response
+
+    async def _acall(self, request):
+        timings = RequestTimings(self.slow_query_ms)
+        token = _current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        total = self._finish(response, timings)
+        # EXPLAIN of slow queries needs the database
+        await sync_to_async(self._log)(request, response, timings, total)
+        return response
+
+    def _finish(self, response, timings: RequestTimings) -> float:
+        timings.mark_view_finished()
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.server_timing(total)
+        return total
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        timings = _current_timings.get()
+        if timings is None:
+            return response
+        timings.mark_view_finished()
+        timings.render_started = time.perf_counter()
+
+        def finish_render(rendered):
+            timings.render_time = time.perf_counter() - timings.render_started
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    def _log(self, request, response, timings: RequestTimings, total: float) -> None:
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'view_ms': round(timings.view_time * 1000, 1) if timings.view_time is not None else None,
+            'render_ms': round(timings.render_time * 1000, 1) if timings.render_time is not None else None,
+            'sql_ms': round(timings.sql_time * 1000, 1),
+            'queries': timings.query_count,
+            'duplicate_queries': timings.duplicate_queries,
+            'cache_hits': timings.cache_hits,
+            'cache_misses': timings.cache_misses,
+        }
+        if timings.duplicate_queries:
+            record['duplicates'] = [
+                {'sql': sql, 'count': count}
+                for (sql, _params), count in timings.statements.most_common(3)
+                if count > 1
+            ]
+        logger.info(json.dumps(record, ensure_ascii=False))
+
+        for alias, sql, params, duration in timings.slow_queries:
+            try:
+                plan = _explain(alias, sql, params)
+            except Exception as exc:
+                plan = f'EXPLAIN failed: {exc}'
+            logger.warning(
+                'Slow query (%.1f ms) on %s: %s\n%s', duration * 1000, request.path, sql, plan
+            )
+
+
+class MetricsMiddleware(_SyncAsyncMiddleware):
+    """
+    Feeds the Prometheus metrics in antidrone.metrics.
+
+    Enabled with METRICS_ENABLED=True. Reuses the timings collected by
+    ServerTimingMiddleware when that one runs first, otherwise counts
+    queries on its own.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def _start(self):
+        timings = _current_timings.get()
+        token = None
+        if timings is None:
+            timings = RequestTimings()
+            token = _current_timings.set(timings)
+        return timings, token, (time.perf_counter(), timings.query_count, timings.sql_time)
+
+    def _call(self, request):
+        timings, token, before = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                _current_timings.reset(token)
+        self._observe(request, response, timings, before)
+        return response
+
+    async def _acall(self, request):
+        timings, token, before = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                _current_timings.reset(token)
+        self._observe(request, response, timings, before)
+        return response
+
+    def _observe(self, request, response, timings: RequestTimings, before) -> None:
+        started, queries_before, sql_time_before = before
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        metrics.REQUEST_LATENCY.labels(view).observe(time.perf_counter() - started)
+        metrics.RESPONSES.labels(view, str(response.status_code)).inc()
+        metrics.DB_QUERIES.labels(view).observe(timings.query_count - queries_before)
+        metrics.DB_TIME.labels(view).observe(timings.sql_time - sql_time_before)
@@ -0,0 +1,168 @@
+"""
+Rate limiting for unauthenticated write endpoints.
+
+``@throttle('order')`` puts a view behind two buckets read from settings:
+``ORDER_RATE_LIMIT_PER_IP`` (one bucket per client address) and
+``ORDER_RATE_LIMIT_GLOBAL`` (shared by all clients, so a distributed flood
+still cannot exceed what the storage behind the view can absorb). Rates are
+written as ``"<requests>/<s|m|h>"``; an empty value disables the bucket.
+
+Buckets live in the default cache, which has to be shared by the workers
+(Redis/Memcached, see CACHE_BACKEND). The cache API has atomic incr() but no
+compare-and-set, so each bucket is kept as one counter per period and the
+level is the sliding-window estimate ``previous * (1 - elapsed) + current``:
+a client can burst up to the full limit, then gets the average rate. An
+allowed request costs two cache round trips per bucket and no locking; a
+request rejected by one bucket gives back the tokens it took from the
+others. Rejected requests get a 429 with Retry-After and are counted in
+antidrone_throttled_requests_total.
+"""
+import asyncio
+import logging
+import math
+import re
+import time
+from functools import lru_cache, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from .metrics import THROTTLED
+
+logger = logging.getLogger(__name__)
+
+RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*([smh])\s*$')
+PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+
+
+def parse_rate(rate):
+    """``'10/m'`` -> (10, 60); None for an empty (disabled) rate."""
+    if not rate:
+        return None
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f'Invalid rate {rate!r}, expected e.g. "10/m"')
+    return int(match.group(1)), PERIODS[match.group(2)]
+
+
+class RateLimit:
+    """``limit`` requests per ``period`` seconds for each identity."""
+
+    def __init__(self, key, limit, period):
+        self.key = key
+        self.limit = limit
+        self.period = period
+
+    def _incr(self, key) -> int:
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # The counter must outlive the next window, which reads it as "previous"
+            if cache.add(key, 1, timeout=self.period * 2 + 1):
+                return 1
+            return cache.incr(key)
+
+    def _prefix(self, ident):
+        return f'ratelimit:{self.key}:{ident}:'
+
+    def hit(self, ident='', timestamp=None) -> float:
+        """Count one request; returns 0 if it is allowed, else seconds until it would be."""
+        now = (timestamp or time.time()) / self.period
+        window = int(now)
+        elapsed = now - window
+        prefix = self._prefix(ident)
+        current_key = prefix + str(window)
+        current = self._incr(current_key)
+        if current > self.limit:
+            # Over the limit within this window alone: free again once enough
+            # of the next window has passed for the estimate to drop
+            retry_after = (1 - elapsed + 1 - self.limit / current) * self.period
+        else:
+            previous = cache.get(prefix + str(window - 1), 0)
+            if previous * (1 - elapsed) + current <= self.limit:
+                return 0
+            retry_after = max(0.0, 1 - (self.limit - current) / previous - elapsed) * self.period
+        # A rejected request takes no token, so a client retrying in a loop
+        # still gets the average rate through
+        cache.decr(current_key)
+        return max(retry_after, 0.001)
+
+    def release(self, ident, timestamp):
+        """Give back the token of a hit() at ``timestamp`` whose request was rejected after all."""
+        try:
+            cache.decr(self._prefix(ident) + str(int(timestamp / self.period)))
+        except ValueError:
+            # The counter expired in the meantime
+            pass
+
+
+def client_ip(request) -> str:
+    """
+    The client address. Behind a reverse proxy RATE_LIMIT_IP_HEADER names the
+    header it sets; in a list such as X-Forwarded-For only the entries
+    appended by our own RATE_LIMIT_PROXY_HOPS proxies can be trusted, so the
+    address is taken that many entries from the right (anything further left
+    was sent by the client).
+    """
+    if settings.RATE_LIMIT_IP_HEADER:
+        forwarded = [part.strip() for part in request.META.get(settings.RATE_LIMIT_IP_HEADER, '').split(',')]
+        hops = max(settings.RATE_LIMIT_PROXY_HOPS, 1)
+        if len(forwarded) >= hops and forwarded[-hops]:
+            return forwarded[-hops]
+    elif 'HTTP_X_FORWARDED_FOR' in request.META:
+        _warn_unset_ip_header()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+@lru_cache(maxsize=None)
+def _warn_unset_ip_header():
+    logger.error('Request came through a proxy (X-Forwarded-For) but RATE_LIMIT_IP_HEADER is not set: '
+                 'all clients share the proxy address and its per-IP rate limit.')
+
+
+def _buckets(scope):
+    prefix = f'{scope.upper()}_RATE_LIMIT_'
+    for bucket in ('per_ip', 'global'):
+        rate = parse_rate(getattr(settings, prefix + bucket.upper(), ''))
+        if rate:
+            yield bucket, RateLimit(f'{scope}:{bucket}', *rate)
+
+
+def check_rate(scope, request):
+    """None if the request may proceed, else a 429 response."""
+    timestamp = time.time()
+    taken = []
+    for bucket, limit in _buckets(scope):
+        ident = client_ip(request) if bucket == 'per_ip' else ''
+        retry_after = limit.hit(ident, timestamp)
+        if retry_after:
+            # A rejected request costs no bucket a token
+            for taken_limit, taken_ident in taken:
+                taken_limit.release(taken_ident, timestamp)
+            THROTTLED.labels(scope=scope, bucket=bucket).inc()
+            seconds = max(1, math.ceil(retry_after))
+            response = JsonResponse({'error': f'Забагато запитів. Спробуйте через {seconds} с.'}, status=429)
+            response['Retry-After'] = str(seconds)
+            return response
+        taken.append((limit, ident))
+    return None
+
+
+def throttle(scope):
+    """Decorator for sync and async views; see the module docstring for the settings."""
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            acheck_rate = sync_to_async(check_rate, thread_sensitive=False)
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                return await acheck_rate(scope, request) or await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return check_rate(scope, request) or view(request, *args, **kwargs)
+        return wrapper
+    return decorator
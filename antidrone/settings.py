@@ -35,6 +35,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'antidrone.middleware.ServerTimingMiddleware',
+    'antidrone.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,6 +75,14 @@ DATABASES = {
     }
 }
 
+# Cache (use a shared backend such as Redis/Memcached when running several workers)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='antidrone'),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -101,10 +111,94 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 CACHE_BUST = int(time.time())
 CATALOG_PAGE_SIZE = config('CATALOG_PAGE_SIZE', default=24, cast=int)
+# Serve catalog pages and the order API from async views (run under ASGI)
+CATALOG_ASYNC_VIEWS = config('CATALOG_ASYNC_VIEWS', default=False, cast=bool)
+
+# sitemap.xml: URLs per file before switching to a sitemap index (protocol max 50000);
+# cached documents are invalidated by the catalog version, the timeout is a backstop
+SITEMAP_URLS_PER_FILE = config('SITEMAP_URLS_PER_FILE', default=50000, cast=int)
+SITEMAP_CACHE_TIMEOUT = config('SITEMAP_CACHE_TIMEOUT', default=86400, cast=int)
+
+# Orders older than this are no longer served by the order API
+ORDER_TTL_HOURS = config('ORDER_TTL_HOURS', default=168, cast=int)
+# Seconds during which a repeated create-order (same Idempotency-Key, or same
+# cart from the same browser) returns the original order instead of a new one
+ORDER_IDEMPOTENCY_WINDOW = config('ORDER_IDEMPOTENCY_WINDOW', default=600, cast=int)
+# Currencies accepted from the cart (3-letter codes; others are rejected)
+ORDER_CURRENCIES = config('ORDER_CURRENCIES', default='UAH,USD,EUR', cast=Csv())
+# Most units of one SKU in an order (larger quantities are rejected)
+ORDER_MAX_QTY = config('ORDER_MAX_QTY', default=10000, cast=int)
+# Limits of /api/bulk-order/ (B2B orders as JSON or CSV line items): body size in bytes, number of lines
+ORDER_BULK_MAX_BYTES = config('ORDER_BULK_MAX_BYTES', default=512 * 1024, cast=int)
+ORDER_BULK_MAX_LINES = config('ORDER_BULK_MAX_LINES', default=2000, cast=int)
+# New orders pushed to the Telegram bot (dispatch_outbox command): spool dir,
+# bot inbox (http://127.0.0.1:8081/orders or unix:/path/to.sock; empty = off), shared token
+ORDER_OUTBOX_DIR = config('ORDER_OUTBOX_DIR', default=str(BASE_DIR / 'data' / 'outbox'))
+ORDER_OUTBOX_TARGET = config('ORDER_OUTBOX_TARGET', default='')
+ORDER_OUTBOX_TOKEN = config('ORDER_OUTBOX_TOKEN', default='')
+# Seconds an order report (admin / order_report) is cached
+ORDER_REPORT_CACHE_TIMEOUT = config('ORDER_REPORT_CACHE_TIMEOUT', default=300, cast=int)
+# Rate limits of /api/create-order/ and /api/bulk-order/ ("<requests>/<s|m|h>", empty = off), see antidrone/ratelimit.py
+ORDER_RATE_LIMIT_PER_IP = config('ORDER_RATE_LIMIT_PER_IP', default='10/m')
+ORDER_RATE_LIMIT_GLOBAL = config('ORDER_RATE_LIMIT_GLOBAL', default='300/m')
+# META key of the client address set by the reverse proxy (e.g. HTTP_X_REAL_IP); empty = REMOTE_ADDR
+RATE_LIMIT_IP_HEADER = config('RATE_LIMIT_IP_HEADER', default='')
+# Proxies of ours that append to RATE_LIMIT_IP_HEADER: the client address is that many entries from its right
+RATE_LIMIT_PROXY_HOPS = config('RATE_LIMIT_PROXY_HOPS', default=1, cast=int)
+# Order storage backend: 'database' (Order/OrderItem tables), 'file' (sharded
+# JSON files) or 'events' (append-only event log)
+ORDER_STORE = config('ORDER_STORE', default='database')
+ORDER_STORE_DIR = config('ORDER_STORE_DIR', default=str(BASE_DIR / 'data' / 'orders'))
+ORDER_EVENT_DIR = config('ORDER_EVENT_DIR', default=str(BASE_DIR / 'data' / 'order_events'))
+# Group commit window of the event log: appends wait at most this long for a shared fsync (0 = fsync each)
+ORDER_EVENT_FSYNC_MS = config('ORDER_EVENT_FSYNC_MS', default=2, cast=int)
+# /api/order/<id>/events/: file through which processes announce status changes and how often
+# each process checks it, long-poll wait and Server-Sent Events stream lifetime (async views
+# only) in seconds, waiting clients per process (each holds a thread with the sync views), rate limits
+ORDER_NOTIFY_FILE = config('ORDER_NOTIFY_FILE', default=str(BASE_DIR / 'data' / 'order_notify.log'))
+ORDER_NOTIFY_INTERVAL_MS = config('ORDER_NOTIFY_INTERVAL_MS', default=200, cast=int)
+ORDER_EVENTS_TIMEOUT = config('ORDER_EVENTS_TIMEOUT', default=25 if CATALOG_ASYNC_VIEWS else 5, cast=int)
+ORDER_EVENTS_STREAM_SECONDS = config('ORDER_EVENTS_STREAM_SECONDS', default=300, cast=int)
+ORDER_EVENTS_MAX_SUBSCRIBERS = config('ORDER_EVENTS_MAX_SUBSCRIBERS',
+                                      default=1000 if CATALOG_ASYNC_VIEWS else 2, cast=int)
+ORDER_EVENTS_RATE_LIMIT_PER_IP = config('ORDER_EVENTS_RATE_LIMIT_PER_IP', default='30/m')
+ORDER_EVENTS_RATE_LIMIT_GLOBAL = config('ORDER_EVENTS_RATE_LIMIT_GLOBAL', default='')
+
+# Popularity ranking (update_popularity command): products marked is_popular
+# and the half-life of their view-based score
+POPULAR_PRODUCTS_COUNT = config('POPULAR_PRODUCTS_COUNT', default=24, cast=int)
+POPULARITY_HALF_LIFE_HOURS = config('POPULARITY_HALF_LIFE_HOURS', default=168, cast=float)
+
+# Public site address, used where there is no request (marketplace feeds)
+SITE_URL = config('SITE_URL', default='http://127.0.0.1:8000')
+# Marketplace feeds (export_feed command, /feeds/<format>.xml)
+FEED_DIR = BASE_DIR / 'data' / 'feeds'
+FEED_LOCK_TIMEOUT = config('FEED_LOCK_TIMEOUT', default=300, cast=int)
 
 # Media files
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Request instrumentation (Server-Timing header + JSON log line per request)
+PERF_INSTRUMENTATION = config('PERF_INSTRUMENTATION', default=False, cast=bool)
+PERF_SLOW_QUERY_MS = config('PERF_SLOW_QUERY_MS', default=100, cast=int)
+
+# Prometheus metrics at /metrics (set PROMETHEUS_MULTIPROC_DIR under gunicorn)
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1', cast=Csv())
+# Bearer token the scraper must send; /metrics stays off while it is empty
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'antidrone.perf': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -9,8 +9,11 @@ from django.templatetags.static import static as static_url
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('favicon.ico', RedirectView.as_view(url=static_url('favicon.ico'), permanent=True)),
     path('', include('catalog.urls')),
 ]
@@ -1,13 +1,157 @@
-from django.contrib import admin
-from .models import Category, Product, ProductImage
+from datetime import timedelta
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+from mptt.exceptions import InvalidMove
+
+from . import bulk, order_notify, order_report, tree
+from .models import Category, Order, OrderItem, Product, ProductImage
+
+
+class CategoryTreeFilter(admin.SimpleListFilter):
+    """
+    Category drill-down filter.
+
+    Lists one level of the tree at a time (roots, then the children of the
+    selected node) instead of every category, and filters by the selected
+    node's whole subtree using its MPTT bounds.
+    """
+    title = 'Категорія'
+    parameter_name = 'category_tree'
+    # Lookup path from the filtered model to Category ('' for Category itself)
+    category_path = 'category'
+
+    def selected_category(self):
+        if not hasattr(self, '_selected'):
+            self._selected = None
+            if self.value():
+                try:
+                    self._selected = Category.objects.get(pk=self.value())
+                except (ValueError, Category.DoesNotExist):
+                    raise IncorrectLookupParameters
+        return self._selected
+
+    def lookups(self, request, model_admin):
+        selected = self.selected_category()
+        choices = []
+        if selected is None:
+            nodes = Category.objects.filter(level=0)
+        else:
+            if selected.parent_id:
+                parent = Category.objects.only('name').get(pk=selected.parent_id)
+                choices.append((str(parent.pk), f'↑ {parent.name}'))
+            choices.append((str(selected.pk), f'● {selected.name}'))
+            nodes = selected.get_children()
+        choices.extend((str(pk), f'{name} →') for pk, name in nodes.values_list('pk', 'name'))
+        return choices
+
+    def queryset(self, request, queryset):
+        selected = self.selected_category()
+        if selected is None:
+            return queryset
+        prefix = f'{self.category_path}__' if self.category_path else ''
+        return queryset.filter(**{
+            f'{prefix}tree_id': selected.tree_id,
+            f'{prefix}lft__gte': selected.lft,
+            f'{prefix}rght__lte': selected.rght,
+        })
+
+
+class CategorySubtreeFilter(CategoryTreeFilter):
+    title = 'Гілка дерева'
+    parameter_name = 'subtree'
+    category_path = ''
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'parent', 'slug', 'is_active', 'order']
-    list_filter = ['is_active', 'parent']
+    list_filter = ['is_active', CategorySubtreeFilter]
+    list_select_related = ['parent']
     search_fields = ['name', 'slug']
     prepopulated_fields = {'slug': ('name',)}
+    autocomplete_fields = ['parent']
+    show_full_result_count = False
+    change_list_template = 'admin/catalog/category/change_list.html'
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('tree/', self.admin_site.admin_view(self.tree_view), name='%s_%s_tree' % info),
+            path('tree/nodes/', self.admin_site.admin_view(self.tree_nodes_view), name='%s_%s_tree_nodes' % info),
+            path('tree/move/', self.admin_site.admin_view(require_POST(self.tree_move_view)),
+                 name='%s_%s_tree_move' % info),
+        ] + super().get_urls()
+
+    def tree_view(self, request):
+        """Drag-and-drop tree; only the roots are rendered, children load on expand."""
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        return TemplateResponse(request, 'admin/catalog/category/tree.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Дерево категорій',
+            'opts': self.model._meta,
+            'can_change': self.has_change_permission(request),
+        })
+
+    def tree_nodes_view(self, request):
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        parent_id = request.GET.get('parent') or None
+        if parent_id is not None and not parent_id.isdigit():
+            return JsonResponse({'error': 'Некоректний ідентифікатор'}, status=400)
+        return JsonResponse({'nodes': tree.child_nodes(parent_id)})
+
+    def tree_move_view(self, request):
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        node_id, target_id = request.POST.get('node', ''), request.POST.get('target', '')
+        if not (node_id.isdigit() and target_id.isdigit()):
+            return JsonResponse({'error': 'Некоректний ідентифікатор'}, status=400)
+        node = get_object_or_404(Category, pk=node_id)
+        target = get_object_or_404(Category, pk=target_id)
+        try:
+            node = tree.move_category(node, target, request.POST.get('position'))
+        except InvalidMove as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+        return JsonResponse({'id': node.pk, 'parent': node.parent_id})
+
+
+class PriceChangeForm(forms.Form):
+    mode = forms.ChoiceField(
+        label='Тип зміни',
+        choices=[('percent', 'Відсоток, %'), ('amount', 'Сума, грн')],
+    )
+    value = forms.DecimalField(label='Значення', max_digits=10, decimal_places=2,
+                               help_text='Від’ємне значення знижує ціну')
+    old_price = forms.ChoiceField(
+        label='Стара ціна',
+        choices=[
+            ('keep', 'Не змінювати'),
+            ('set', 'Поточна ціна стає старою (розпродаж)'),
+            ('clear', 'Прибрати стару ціну'),
+        ],
+    )
+
+
+def flag_action(field, value, description):
+    def action(modeladmin, request, queryset):
+        count = bulk.set_flags(queryset, **{field: value})
+        modeladmin.message_user(request, f'Оновлено товарів: {count}.', messages.SUCCESS)
+
+    action.__name__ = f'set_{field}_{str(value).lower()}'
+    return admin.action(description=description)(action)
 
 
 class ProductImageInline(admin.TabularInline):
@@ -18,12 +162,26 @@ class ProductImageInline(admin.TabularInline):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'sku', 'price', 'is_available', 'is_popular', 'is_new']
-    list_filter = ['category', 'is_available', 'is_popular', 'is_new']
-    search_fields = ['name', 'slug', 'sku', 'description']
+    list_display = ['name', 'category', 'sku', 'price', 'is_available', 'is_popular', 'is_new', 'view_count']
+    list_filter = [CategoryTreeFilter, 'is_available', 'is_popular', 'popular_override', 'is_new']
+    list_select_related = ['category']
+    search_fields = ['sku', 'name']
+    search_help_text = 'Точний артикул або початок назви'
     prepopulated_fields = {'slug': ('name',)}
-    raw_id_fields = ['category']
+    autocomplete_fields = ['category']
+    show_full_result_count = False
     inlines = [ProductImageInline]
+    actions = [
+        'change_prices',
+        'clear_sale',
+        flag_action('is_available', True, 'В наявності'),
+        flag_action('is_available', False, 'Немає в наявності'),
+        flag_action('is_popular', True, 'Позначити популярними'),
+        flag_action('is_popular', False, 'Зняти позначку «Популярний»'),
+        'unpin_popular',
+        flag_action('is_new', True, 'Позначити новинками'),
+        flag_action('is_new', False, 'Зняти позначку «Новинка»'),
+    ]
     fieldsets = (
         (None, {
             'fields': ('category', 'name', 'slug', 'sku')
@@ -37,11 +195,166 @@ class ProductAdmin(admin.ModelAdmin):
         ('Статус', {
             'fields': ('is_available', 'is_popular', 'is_new')
         }),
+        ('Популярність', {
+            'fields': ('popular_override', 'view_count', 'popularity_score'),
+            'description': 'Оновлюється командою update_popularity; «Популярний» виставляється автоматично, '
+                           'якщо його не закріплено вручну.',
+        }),
     )
+    readonly_fields = ['view_count', 'popularity_score']
+
+    def save_model(self, request, obj, form, change):
+        # Ticking «Популярний» by hand pins it; a pinned value wins over the checkbox
+        if 'popular_override' not in form.changed_data and 'is_popular' in form.changed_data:
+            obj.popular_override = obj.is_popular
+        elif obj.popular_override is not None:
+            obj.is_popular = obj.popular_override
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description='Популярність — за переглядами')
+    def unpin_popular(self, request, queryset):
+        count = bulk.unpin_popular(queryset)
+        self.message_user(request, f'Оновлено товарів: {count}.', messages.SUCCESS)
+
+    @admin.action(description='Змінити ціни…')
+    def change_prices(self, request, queryset):
+        """Percentage/absolute price change as one UPDATE (use the category filter for a whole branch)."""
+        if 'apply' in request.POST:
+            form = PriceChangeForm(request.POST)
+            if form.is_valid():
+                data = form.cleaned_data
+                count = bulk.change_prices(
+                    queryset,
+                    percent=data['value'] if data['mode'] == 'percent' else None,
+                    amount=data['value'] if data['mode'] == 'amount' else None,
+                    set_old_price=data['old_price'] == 'set',
+                    clear_old_price=data['old_price'] == 'clear',
+                )
+                self.message_user(request, f'Ціни змінено для {count} товарів.', messages.SUCCESS)
+                return None
+        else:
+            form = PriceChangeForm()
+
+        return TemplateResponse(request, 'admin/catalog/product/change_prices.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Зміна цін',
+            'opts': self.model._meta,
+            'form': form,
+            'count': queryset.count(),
+            'action_checkbox_name': ACTION_CHECKBOX_NAME,
+            'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+        })
+
+    @admin.action(description='Завершити розпродаж (прибрати стару ціну)')
+    def clear_sale(self, request, queryset):
+        count = bulk.clear_sale(queryset)
+        self.message_user(request, f'Оновлено товарів: {count}.', messages.SUCCESS)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Match exact SKU or name prefix so the sku/name indexes can be used."""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        capitalized = term[:1].upper() + term[1:]
+        return queryset.filter(
+            Q(sku=term) | Q(sku=term.upper())
+            | Q(name__startswith=term) | Q(name__startswith=capitalized)
+        ), False
 
 
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
     list_display = ['product', 'order', 'is_main']
     list_filter = ['is_main']
-    raw_id_fields = ['product']
+    list_select_related = ['product']
+    autocomplete_fields = ['product']
+    show_full_result_count = False
+
+
+class OrderReportForm(forms.Form):
+    date_from = forms.DateField(label='З', widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'))
+    date_to = forms.DateField(label='По', widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'))
+    top = forms.IntegerField(label='Топ SKU', min_value=1, max_value=100, initial=10, required=False)
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get('date_from') and cleaned.get('date_to') and cleaned['date_from'] > cleaned['date_to']:
+            raise forms.ValidationError('Початок періоду пізніше за кінець.')
+        cleaned['top'] = cleaned.get('top') or 10
+        return cleaned
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    fields = ['sku', 'name', 'price', 'qty']
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ['order_id', 'status', 'total', 'currency', 'source', 'created_at', 'confirmed_at']
+    list_filter = ['status', 'source']
+    search_fields = ['order_id', 'ttn']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['order_id', 'created_at', 'confirmed_at', 'ts', 'page']
+    show_full_result_count = False
+    inlines = [OrderItemInline]
+    change_list_template = 'admin/catalog/order/change_list.html'
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            # Wake the customer's cart page waiting on /api/order/<id>/events
+            transaction.on_commit(lambda: order_notify.publish(obj.order_id, obj.status))
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('report/', self.admin_site.admin_view(self.report_view), name='%s_%s_report' % info),
+            path('report/export/', self.admin_site.admin_view(self.report_export_view),
+                 name='%s_%s_report_export' % info),
+        ] + super().get_urls()
+
+    def _report_period(self, request):
+        """(form, date_from, date_to, top); the last 30 days until the form is submitted."""
+        today = timezone.localdate()
+        defaults = {'date_from': today - timedelta(days=29), 'date_to': today, 'top': 10}
+        form = OrderReportForm(request.GET if 'date_from' in request.GET else None, initial=defaults)
+        data = form.cleaned_data if form.is_valid() else defaults
+        return form, data['date_from'], data['date_to'], data['top']
+
+    def report_view(self, request):
+        """Revenue / top SKUs / funnel of the orders in the chosen period (from the configured store)."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        form, date_from, date_to, top = self._report_period(request)
+        report = None
+        if not form.is_bound or form.is_valid():
+            report = order_report.cached_report(date_from, date_to, top)
+        return TemplateResponse(request, 'admin/catalog/order/report.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Звіт по замовленнях',
+            'opts': self.model._meta,
+            'form': form,
+            'report': report,
+            'period': {'date_from': date_from.isoformat(), 'date_to': date_to.isoformat()},
+            'export_formats': order_report.EXPORT_FORMATS,
+        })
+
+    def report_export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in order_report.EXPORT_FORMATS:
+            return HttpResponseBadRequest('Невідомий формат')
+        form, date_from, date_to, _top = self._report_period(request)
+        if form.is_bound and not form.is_valid():
+            return HttpResponseBadRequest('Некоректний період')
+        content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(
+            order_report.export_lines(export_format, date_from, date_to),
+            content_type=f'{content_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="orders-{date_from}-{date_to}.{export_format}"'
+        return response
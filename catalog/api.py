@@ -1,27 +1,31 @@
+import asyncio
+import hashlib
 import json
 import re
-import secrets
 import time
-from pathlib import Path
 
-from decouple import config
 from django.conf import settings
+from django.core.cache import cache
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 
+from antidrone.metrics import ORDERS_CREATED, ORDERS_DEDUPLICATED
+from antidrone.ratelimit import throttle
 
-ORDER_ID_RE = re.compile(r'^[a-z0-9]{8,12}$')
+from .order_notify import Subscription, TooManySubscribers
+from .bulk_orders import BulkOrderError, parse_lines, price_lines
+from .order_store import ORDER_ID_RE, STATUS_LABELS, InvalidTransition, OrderStoreError, get_order_store
 
-
-def _generate_order_id(length: int = 10) -> str:
-    alphabet = '0123456789abcdefghijklmnopqrstuvwxyz'
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
-
-
-def _build_orders_dir() -> Path:
-    orders_dir = Path(settings.BASE_DIR) / 'data' / 'orders'
-    orders_dir.mkdir(parents=True, exist_ok=True)
-    return orders_dir
+IDEMPOTENCY_KEY_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+DEDUP_KEY = 'order:dedup:{}'
+# How long a request waits for a concurrent duplicate to finish creating the order
+DEDUP_WAIT_SECONDS = 3
+DEDUP_POLL_SECONDS = 0.05
+# Column ranges of Order/OrderItem: prices and totals (PositiveIntegerField), ts (BigIntegerField)
+MAX_AMOUNT = 2 ** 31 - 1
+MAX_TS = 2 ** 63 - 1
+# Order events: when to come back if the process has no room for another waiting client
+SUBSCRIBERS_BUSY_RETRY_SECONDS = 10
 
 
 def _validate_payload(payload: dict):
@@ -40,15 +44,19 @@ def _validate_payload(payload: dict):
         sku = str(item.get('sku', '')).strip()
         name = str(item.get('name', '')).strip() or 'Товар'
         try:
-            price = int(item.get('price', 0))
-        except (TypeError, ValueError):
+            price = max(int(item.get('price', 0)), 0)
+        except (TypeError, ValueError, OverflowError):
             price = 0
+        if price > MAX_AMOUNT:
+            return None, 'Невірна ціна товару.'
         try:
             qty = int(item.get('qty', 0))
-        except (TypeError, ValueError):
+        except (TypeError, ValueError, OverflowError):
             qty = 0
         if qty <= 0:
             return None, 'Невірна кількість товару.'
+        if qty > settings.ORDER_MAX_QTY:
+            return None, f'Забагато одиниць товару (максимум {settings.ORDER_MAX_QTY}).'
         items.append({
             'sku': sku[:50],
             'name': name[:120],
@@ -56,125 +64,339 @@ def _validate_payload(payload: dict):
             'qty': qty,
         })
         total += price * qty
+    if total > MAX_AMOUNT:
+        return None, 'Завелика сума замовлення.'
 
-    currency = str(payload.get('currency') or 'UAH').upper()
+    currency = str(payload.get('currency') or 'UAH').strip().upper()
+    if currency not in settings.ORDER_CURRENCIES:
+        return None, 'Непідтримувана валюта.'
     page = str(payload.get('page') or '')
-    ts = int(payload.get('ts') or int(time.time() * 1000))
+    try:
+        ts = int(payload.get('ts') or int(time.time() * 1000))
+    except (TypeError, ValueError, OverflowError):
+        return None, 'Некоректний час замовлення.'
+    if not 0 <= ts <= MAX_TS:
+        return None, 'Некоректний час замовлення.'
     return items, total, currency, page, ts
 
 
-def _cleanup_orders(orders_dir: Path, ttl_seconds: int) -> None:
-    if ttl_seconds <= 0:
-        return
-    now = time.time()
-    for path in orders_dir.glob('*.json'):
-        try:
-            if now - path.stat().st_mtime > ttl_seconds:
-                path.unlink(missing_ok=True)
-        except OSError:
-            continue
-
-
-def _load_order_data(order_id: str):
+def _load_order(order_id: str):
+    """(order, None) or (None, error response); orders past ORDER_TTL_HOURS count as missing."""
     if not ORDER_ID_RE.match(order_id):
         return None, JsonResponse({'error': 'Некоректний номер замовлення.'}, status=400)
-
-    orders_dir = _build_orders_dir()
-    ttl_hours = max(config('ORDER_TTL_HOURS', default=168, cast=int), 1)
-    _cleanup_orders(orders_dir, ttl_hours * 3600)
-
-    order_path = orders_dir / f"{order_id}.json"
-    if not order_path.exists():
+    try:
+        order = get_order_store().get(order_id)
+    except OrderStoreError as exc:
+        return None, JsonResponse({'error': str(exc)}, status=500)
+    ttl_seconds = max(settings.ORDER_TTL_HOURS, 1) * 3600
+    if order is None or order.get('created_at', 0) < time.time() - ttl_seconds:
         return None, JsonResponse({'error': 'Замовлення не знайдено.'}, status=404)
+    return order, None
 
+
+def _parse_json_body(request):
+    try:
+        return json.loads(request.body.decode('utf-8') or '{}'), None
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None, JsonResponse({'error': 'Некоректний JSON.'}, status=400)
+
+
+def client_scope(request) -> str:
+    """Identifies the browser for deduplication: its CSRF cookie, else its address."""
+    return request.COOKIES.get(settings.CSRF_COOKIE_NAME) or request.META.get('REMOTE_ADDR', '')
+
+
+def _cart_fingerprint(items, currency) -> str:
+    """Hash of the cart contents, independent of item order and client-side extras."""
+    lines = sorted(f"{item['sku']}|{item['name']}|{item['price']}|{item['qty']}" for item in items)
+    return hashlib.sha256('\n'.join([currency, *lines]).encode('utf-8')).hexdigest()
+
+
+def _dedup_key(*parts) -> str:
+    return DEDUP_KEY.format(hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest())
+
+
+def _claim_keys(data, idempotency_key, client):
+    """(cart fingerprint, cart key, claimed key) of an order about to be created."""
+    fingerprint = _cart_fingerprint(data['items'], data['currency'])
+    cart_key = _dedup_key('cart', client, fingerprint)
+    claim_key = _dedup_key('key', client, idempotency_key) if idempotency_key else cart_key
+    return fingerprint, cart_key, claim_key
+
+
+def _claim_outcome(entry, fingerprint):
+    """The result of a lost claim given the winner's entry; None while it is still pending."""
+    if entry is None:
+        # Expired or evicted between add() and get(): try again
+        return None
+    if entry['fingerprint'] != fingerprint:
+        return None, JsonResponse(
+            {'error': 'Ключ ідемпотентності вже використано для іншого кошика.'}, status=422)
+    if entry['order_id']:
+        return entry, None
+    return None
+
+
+def _claim_pending() -> JsonResponse:
+    return JsonResponse({'error': 'Замовлення ще обробляється, спробуйте пізніше.'}, status=409)
+
+
+def _claim(key, fingerprint):
+    """
+    Reserve ``key`` for a new order, or return the entry of the request that
+    got there first: ``(None, None)`` when claimed, ``(entry, None)`` for a
+    finished duplicate, ``(None, error response)`` otherwise.
+    """
+    deadline = time.monotonic() + DEDUP_WAIT_SECONDS
+    while True:
+        if cache.add(key, {'fingerprint': fingerprint, 'order_id': None}, settings.ORDER_IDEMPOTENCY_WINDOW):
+            return None, None
+        outcome = _claim_outcome(cache.get(key), fingerprint)
+        if outcome is not None:
+            return outcome
+        if time.monotonic() >= deadline:
+            return None, _claim_pending()
+        time.sleep(DEDUP_POLL_SECONDS)
+
+
+async def aclaim_order(data, idempotency_key, client):
+    """
+    _claim() for async views: waits for a concurrent duplicate on the event
+    loop, so the shared sync thread (and every ORM call) is never blocked.
+    Pass the result to _store_order() as ``claim``.
+    """
+    fingerprint, _cart_key, key = _claim_keys(data, idempotency_key, client)
+    deadline = time.monotonic() + DEDUP_WAIT_SECONDS
+    while True:
+        if await cache.aadd(key, {'fingerprint': fingerprint, 'order_id': None}, settings.ORDER_IDEMPOTENCY_WINDOW):
+            return None, None
+        outcome = _claim_outcome(await cache.aget(key), fingerprint)
+        if outcome is not None:
+            return outcome
+        if time.monotonic() >= deadline:
+            return None, _claim_pending()
+        await asyncio.sleep(DEDUP_POLL_SECONDS)
+
+
+def _is_new(order_id) -> bool:
     try:
-        with open(order_path, 'r', encoding='utf-8') as handle:
-            data = json.load(handle)
-    except OSError:
-        return None, JsonResponse({'error': 'Не вдалося прочитати замовлення.'}, status=500)
+        order = get_order_store().get(order_id)
+    except OrderStoreError:
+        return False
+    return order is not None and order.get('status') == 'new'
 
-    return data, None
 
+def _replayed(order_id) -> JsonResponse:
+    ORDERS_DEDUPLICATED.inc()
+    response = JsonResponse({'order_id': order_id})
+    response['Idempotent-Replayed'] = 'true'
+    return response
 
-@require_POST
-def create_order(request):
-    try:
-        payload = json.loads(request.body.decode('utf-8') or '{}')
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Некоректний JSON.'}, status=400)
 
+def _order_data(payload, idempotency_key=''):
+    """(order data, None) for a valid create-order payload, else (None, error response)."""
     validated = _validate_payload(payload)
     if validated[0] is None:
-        return JsonResponse({'error': validated[1]}, status=400)
+        return None, JsonResponse({'error': validated[1]}, status=400)
+    if idempotency_key and not IDEMPOTENCY_KEY_RE.match(idempotency_key):
+        return None, JsonResponse({'error': 'Некоректний ключ ідемпотентності.'}, status=400)
 
     items, total, currency, page, ts = validated
-    orders_dir = _build_orders_dir()
-    ttl_hours = max(config('ORDER_TTL_HOURS', default=168, cast=int), 1)
-    _cleanup_orders(orders_dir, ttl_hours * 3600)
-
-    order_id = _generate_order_id()
-    for _ in range(5):
-        order_path = orders_dir / f"{order_id}.json"
-        if not order_path.exists():
-            break
-        order_id = _generate_order_id()
-    else:
-        return JsonResponse({'error': 'Не вдалося створити замовлення.'}, status=500)
-
-    order_data = {
-        'order_id': order_id,
+    return {
         'items': items,
         'total': total,
         'currency': currency,
         'source': payload.get('source', 'site'),
         'page': page,
         'ts': ts,
-        'status': 'new',
-        'created_at': int(time.time()),
-    }
+    }, None
+
+
+def _create_order(payload, idempotency_key='', client='') -> JsonResponse:
+    """
+    Create an order, unless it duplicates one this client created within
+    ORDER_IDEMPOTENCY_WINDOW seconds: the same Idempotency-Key (any status),
+    or the same cart while that order is still new. Duplicates, including
+    concurrent ones, get the original order_id.
+    """
+    data, error = _order_data(payload, idempotency_key)
+    if error:
+        return error
+    return _store_order(data, idempotency_key, client)
+
+
+def _store_order(data, idempotency_key, client, claim=None) -> JsonResponse:
+    """
+    Deduplicate and create a validated order; the store queues it for the
+    bot's outbox in the same write. ``claim`` is the result of aclaim_order() when an async view has
+    already claimed the order's key.
+    """
+    fingerprint, cart_key, claim_key = _claim_keys(data, idempotency_key, client)
+    entry, error = claim if claim is not None else _claim(claim_key, fingerprint)
+    if error:
+        return error
+    if entry:
+        if idempotency_key or _is_new(entry['order_id']):
+            return _replayed(entry['order_id'])
+        # Same cart again after the previous order moved on: a new order
+        cache.set(claim_key, {'fingerprint': fingerprint, 'order_id': None}, settings.ORDER_IDEMPOTENCY_WINDOW)
+    elif idempotency_key:
+        # A new checkout attempt (reopened modal) with the cart of a pending order
+        previous = cache.get(cart_key)
+        if previous and previous['order_id'] and _is_new(previous['order_id']):
+            cache.set(claim_key, previous, settings.ORDER_IDEMPOTENCY_WINDOW)
+            return _replayed(previous['order_id'])
 
     try:
-        with open(order_path, 'w', encoding='utf-8') as handle:
-            json.dump(order_data, handle, ensure_ascii=False, indent=2)
-    except OSError:
-        return JsonResponse({'error': 'Не вдалося зберегти замовлення.'}, status=500)
+        order = get_order_store().create(data, notify_bot=True)
+    except OrderStoreError as exc:
+        cache.delete(claim_key)
+        return JsonResponse({'error': str(exc)}, status=500)
+    except Exception:
+        # Never leave the key claimed by an order that does not exist
+        cache.delete(claim_key)
+        raise
+
+    entry = {'fingerprint': fingerprint, 'order_id': order['order_id']}
+    cache.set_many({claim_key: entry, cart_key: entry}, settings.ORDER_IDEMPOTENCY_WINDOW)
+    ORDERS_CREATED.inc()
+    return JsonResponse({'order_id': order['order_id']})
+
+
+def _bulk_order_data(request):
+    """
+    (order data, None) from bulk line items (see catalog.bulk_orders), else
+    (None, error response). Data is returned only if every line is valid;
+    otherwise all errors are listed with their line numbers.
+    """
+    idempotency_key = request.headers.get('Idempotency-Key', '')
+    if idempotency_key and not IDEMPOTENCY_KEY_RE.match(idempotency_key):
+        return None, JsonResponse({'error': 'Некоректний ключ ідемпотентності.'}, status=400)
+    try:
+        lines, errors = parse_lines(request)
+    except BulkOrderError as exc:
+        return None, JsonResponse({'error': str(exc)}, status=exc.status)
+    items, catalog_errors = price_lines(lines)
+    errors = sorted(errors + catalog_errors, key=lambda error: error['line'])
+    if errors:
+        return None, JsonResponse({'error': 'Замовлення містить помилки.', 'errors': errors}, status=400)
+    total = sum(item['price'] * item['qty'] for item in items)
+    if total > MAX_AMOUNT:
+        return None, JsonResponse({'error': 'Завелика сума замовлення.'}, status=400)
+
+    return {
+        'items': items,
+        'total': total,
+        'currency': 'UAH',
+        'source': 'b2b',
+        'page': request.headers.get('Referer', '')[:500],
+        'ts': int(time.time() * 1000),
+    }, None
 
-    if not order_path.exists():
-        return JsonResponse({'error': 'Не вдалося створити замовлення.'}, status=500)
 
-    return JsonResponse({'order_id': order_id})
+def _bulk_order(request) -> JsonResponse:
+    """Create an order from bulk line items, all or nothing."""
+    data, error = _bulk_order_data(request)
+    if error:
+        return error
+    return _store_order(data, request.headers.get('Idempotency-Key', ''), client_scope(request))
 
 
-def get_order(request, order_id: str):
-    data, error = _load_order_data(order_id)
+def _get_order(order_id: str) -> JsonResponse:
+    order, error = _load_order(order_id)
     if error:
         return error
 
     response = {
-        'order_id': data.get('order_id', order_id),
-        'items': data.get('items', []),
-        'total': data.get('total', 0),
-        'currency': data.get('currency', 'UAH'),
-        'ts': data.get('ts', 0),
-        'source': data.get('source', 'site'),
+        'order_id': order.get('order_id', order_id),
+        'items': order.get('items', []),
+        'total': order.get('total', 0),
+        'currency': order.get('currency', 'UAH'),
+        'ts': order.get('ts', 0),
+        'source': order.get('source', 'site'),
     }
     return JsonResponse(response)
 
 
-@require_POST
-def confirm_order(request, order_id: str):
-    data, error = _load_order_data(order_id)
+def _order_status(order) -> dict:
+    status = order.get('status', 'new')
+    return {
+        'order_id': order['order_id'],
+        'status': status,
+        'label': STATUS_LABELS.get(status, status),
+        'ttn': order.get('ttn', ''),
+    }
+
+
+def subscribers_busy() -> JsonResponse:
+    response = JsonResponse({'error': 'Сервер зайнятий, спробуйте пізніше.'}, status=503)
+    response['Retry-After'] = str(SUBSCRIBERS_BUSY_RETRY_SECONDS)
+    return response
+
+
+def _long_poll(order_id, known_status, subscription) -> JsonResponse:
+    """The order's status once it differs from ``known_status`` (or after ORDER_EVENTS_TIMEOUT)."""
+    try:
+        with subscription:
+            order, error = _load_order(order_id)
+            if error:
+                return error
+            if order['status'] == known_status and subscription.wait(settings.ORDER_EVENTS_TIMEOUT):
+                order, error = _load_order(order_id)
+                if error:
+                    return error
+    except TooManySubscribers:
+        return subscribers_busy()
+    return JsonResponse(_order_status(order))
+
+
+def _confirm_order(order_id: str) -> JsonResponse:
+    _order, error = _load_order(order_id)
     if error:
         return error
-
-    orders_dir = _build_orders_dir()
-    order_path = orders_dir / f"{order_id}.json"
-    data['status'] = 'confirmed'
-    data['confirmed_at'] = int(time.time())
     try:
-        with open(order_path, 'w', encoding='utf-8') as handle:
-            json.dump(data, handle, ensure_ascii=False, indent=2)
-    except OSError:
+        get_order_store().transition(order_id, 'confirmed')
+    except InvalidTransition as exc:
+        return JsonResponse({'error': str(exc)}, status=409)
+    except OrderStoreError:
         return JsonResponse({'error': 'Не вдалося оновити замовлення.'}, status=500)
-
     return JsonResponse({'order_id': order_id, 'status': 'confirmed'})
+
+
+@require_POST
+@throttle('order')
+def create_order(request):
+    payload, error = _parse_json_body(request)
+    if error:
+        return error
+    return _create_order(payload, request.headers.get('Idempotency-Key', ''), client_scope(request))
+
+
+@require_POST
+@throttle('order')
+def bulk_order(request):
+    return _bulk_order(request)
+
+
+def get_order(request, order_id: str):
+    return _get_order(order_id)
+
+
+@throttle('order_events')
+def order_events(request, order_id: str):
+    """
+    Status changes of an order as a long poll: ``?status=<status the page
+    shows>`` answers as soon as the status differs, or after
+    ORDER_EVENTS_TIMEOUT. Each waiting request holds a worker thread, so
+    Server-Sent Events (Accept: text/event-stream) are only served by the
+    async views; here they get the long-poll answer.
+    """
+    _order, error = _load_order(order_id)
+    if error:
+        return error
+    return _long_poll(order_id, request.GET.get('status', 'new'), Subscription(order_id))
+
+
+@require_POST
+def confirm_order(request, order_id: str):
+    return _confirm_order(order_id)
@@ -0,0 +1,222 @@
+"""
+Async counterparts of the catalog views and order API for ASGI deployments.
+
+Enabled with CATALOG_ASYNC_VIEWS=True; the URL names and templates are the
+same as for the sync views in views.py and api.py.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.views import View
+
+from antidrone.ratelimit import throttle
+
+from . import api
+from .models import Category, Product
+from .order_notify import Subscription, TooManySubscribers, get_notifier
+from .popularity import arecord_view
+from .views import pagination_context
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+class IndexView(View):
+    """Home page view."""
+    template_name = 'catalog/index.html'
+
+    async def get(self, request, *args, **kwargs):
+        categories, popular_products, new_products = await asyncio.gather(
+            _alist(Category.objects.filter(is_active=True, level=0)),
+            _alist(Product.objects.filter(is_popular=True, is_available=True)
+                   .order_by('-popularity_score', '-created_at').select_related('category')[:8]),
+            _alist(Product.objects.filter(is_new=True, is_available=True).select_related('category')[:8]),
+        )
+        return TemplateResponse(request, self.template_name, {
+            'view': self,
+            'categories': categories,
+            'popular_products': popular_products,
+            'new_products': new_products,
+        })
+
+
+class CategoryDetailView(View):
+    """Category detail with products."""
+    template_name = 'catalog/category_detail.html'
+
+    async def get(self, request, slug, *args, **kwargs):
+        try:
+            category = await Category.objects.aget(is_active=True, slug=slug)
+        except Category.DoesNotExist:
+            raise Http404('Категорію не знайдено.')
+
+        products_qs = Product.objects.filter(
+            category__in=category.get_descendants(include_self=True),
+            is_available=True
+        ).select_related('category').prefetch_related('images')
+        paginator = Paginator(products_qs, getattr(settings, 'CATALOG_PAGE_SIZE', 24))
+
+        page_obj, subcategories, ancestors = await asyncio.gather(
+            sync_to_async(paginator.get_page)(request.GET.get('page')),
+            _alist(category.get_children().filter(is_active=True)),
+            _alist(category.get_ancestors()),
+        )
+        page_obj.object_list = await _alist(page_obj.object_list)
+
+        context = {
+            'view': self,
+            'object': category,
+            'category': category,
+            'subcategories': subcategories,
+            'ancestors': ancestors,
+        }
+        context.update(pagination_context(paginator, page_obj))
+        return TemplateResponse(request, self.template_name, context)
+
+
+class ProductDetailView(View):
+    """Product detail page."""
+    template_name = 'catalog/product_detail.html'
+
+    async def get(self, request, category_slug, product_slug, *args, **kwargs):
+        queryset = Product.objects.filter(
+            is_available=True
+        ).select_related('category').prefetch_related('images')
+        try:
+            product = await queryset.aget(slug=product_slug, category__slug=category_slug)
+        except Product.DoesNotExist:
+            raise Http404('Товар не знайдено.')
+
+        ancestors, related_products, _ = await asyncio.gather(
+            _alist(product.category.get_ancestors()),
+            _alist(Product.objects.filter(
+                category=product.category,
+                is_available=True
+            ).select_related('category').exclude(pk=product.pk)[:4]),
+            arecord_view(product.pk),
+        )
+        return TemplateResponse(request, self.template_name, {
+            'view': self,
+            'object': product,
+            'product': product,
+            'category': product.category,
+            'ancestors': ancestors,
+            'related_products': related_products,
+        })
+
+
+# Order API: the transactional ORM code of api.py runs on the sync thread;
+# waiting for a concurrent duplicate of the order happens on the event loop.
+
+async def _store_order(request, data):
+    idempotency_key, client = request.headers.get('Idempotency-Key', ''), api.client_scope(request)
+    claim = await api.aclaim_order(data, idempotency_key, client)
+    return await sync_to_async(api._store_order)(data, idempotency_key, client, claim)
+
+
+@throttle('order')
+async def create_order(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    payload, error = api._parse_json_body(request)
+    if error:
+        return error
+    data, error = api._order_data(payload, request.headers.get('Idempotency-Key', ''))
+    if error:
+        return error
+    return await _store_order(request, data)
+
+
+@throttle('order')
+async def bulk_order(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    data, error = await sync_to_async(api._bulk_order_data)(request)
+    if error:
+        return error
+    return await _store_order(request, data)
+
+
+async def get_order(request, order_id: str):
+    return await sync_to_async(api._get_order)(order_id)
+
+
+# Server-Sent Events: keep-alive comment interval, reconnect delay, statuses after which the stream ends
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 3000
+FINAL_STATUSES = {'shipped', 'cancelled'}
+
+
+def _sse_message(order) -> str:
+    return f'event: status\ndata: {json.dumps(api._order_status(order), ensure_ascii=False)}\n\n'
+
+
+async def _event_stream(order_id, subscription):
+    """The current status, then every change until the stream ends; an open stream costs no thread."""
+    try:
+        with subscription:
+            order, error = await sync_to_async(api._load_order)(order_id)
+            if error:
+                return
+            yield f'retry: {SSE_RETRY_MS}\n' + _sse_message(order)
+            deadline = time.monotonic() + settings.ORDER_EVENTS_STREAM_SECONDS
+            while order['status'] not in FINAL_STATUSES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if not await subscription.await_change(min(remaining, SSE_HEARTBEAT_SECONDS)):
+                    yield ': ping\n\n'
+                    continue
+                status = order['status']
+                order, error = await sync_to_async(api._load_order)(order_id)
+                if error:
+                    return
+                if order['status'] != status:
+                    yield _sse_message(order)
+    except TooManySubscribers:
+        # Filled up since order_events() checked; the browser reconnects after SSE_RETRY_MS
+        return
+
+
+@throttle('order_events')
+async def order_events(request, order_id: str):
+    """api.order_events, plus Server-Sent Events for Accept: text/event-stream."""
+    _order, error = await sync_to_async(api._load_order)(order_id)
+    if error:
+        return error
+    if get_notifier().is_full():
+        return api.subscribers_busy()
+    if 'text/event-stream' not in request.headers.get('Accept', ''):
+        try:
+            with Subscription(order_id) as subscription:
+                order, error = await sync_to_async(api._load_order)(order_id)
+                if error:
+                    return error
+                if (order['status'] == request.GET.get('status', 'new')
+                        and await subscription.await_change(settings.ORDER_EVENTS_TIMEOUT)):
+                    order, error = await sync_to_async(api._load_order)(order_id)
+                    if error:
+                        return error
+        except TooManySubscribers:
+            return api.subscribers_busy()
+        return JsonResponse(api._order_status(order))
+
+    response = StreamingHttpResponse(_event_stream(order_id, Subscription(order_id)),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def confirm_order(request, order_id: str):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    return await sync_to_async(api._confirm_order)(order_id)
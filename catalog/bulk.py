@@ -0,0 +1,87 @@
+"""
+Set-based product updates for admin actions and the bulk_products command.
+
+Each operation is a single UPDATE over the given queryset, run in one
+transaction, followed by one catalog cache invalidation for the whole batch.
+Per-object save() is deliberately avoided, so no post_save signals fire.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Category, Product
+
+FLAG_FIELDS = ('is_available', 'is_popular', 'is_new')
+
+
+def category_products(category: Category):
+    """Products of a category and all of its subcategories."""
+    return Product.objects.filter(
+        category__tree_id=category.tree_id,
+        category__lft__gte=category.lft,
+        category__rght__lte=category.rght,
+    )
+
+
+def _apply(queryset, **updates) -> int:
+    updates['updated_at'] = timezone.now()
+    with transaction.atomic():
+        count = queryset.order_by().update(**updates)
+        if count:
+            transaction.on_commit(bump_catalog_version)
+    return count
+
+
+def change_prices(queryset, percent=None, amount=None, set_old_price=False,
+                  clear_old_price=False, decimals=0) -> int:
+    """
+    Raise or lower prices by a percentage or an absolute amount.
+
+    With set_old_price the current price becomes old_price (a sale); the
+    UPDATE reads the pre-update price for both columns. Products without a
+    price are left alone and prices never go below zero.
+    """
+    if (percent is None) == (amount is None):
+        raise ValueError('Вкажіть або відсоток, або суму зміни ціни.')
+    if percent is not None:
+        # Factor computed up front: SQLite would integer-divide price * 90 / 100
+        new_price = F('price') * ((Decimal(100) + Decimal(percent)) / Decimal(100))
+    else:
+        new_price = F('price') + Decimal(amount)
+
+    updates = {'price': Greatest(Round(new_price, decimals), Value(Decimal(0)))}
+    if set_old_price:
+        updates['old_price'] = F('price')
+    elif clear_old_price:
+        updates['old_price'] = None
+    return _apply(queryset.filter(price__isnull=False), **updates)
+
+
+def clear_sale(queryset) -> int:
+    """Drop old_price, ending a sale."""
+    return _apply(queryset.filter(old_price__isnull=False), old_price=None)
+
+
+def set_flags(queryset, **flags) -> int:
+    """
+    Set is_available / is_popular / is_new for every product in the queryset.
+    is_popular set by hand is pinned (popular_override), so the ranking of
+    update_popularity does not undo it.
+    """
+    unknown = set(flags) - set(FLAG_FIELDS)
+    if unknown:
+        raise ValueError(f'Невідомі поля: {", ".join(sorted(unknown))}')
+    if not flags:
+        return 0
+    if 'is_popular' in flags:
+        flags['popular_override'] = flags['is_popular']
+    return _apply(queryset, **flags)
+
+
+def unpin_popular(queryset) -> int:
+    """Hand is_popular back to the view-based ranking of update_popularity."""
+    return _apply(queryset.filter(popular_override__isnull=False), popular_override=None)
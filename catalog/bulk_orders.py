@@ -0,0 +1,208 @@
+"""
+Bulk (B2B) order lines: parsing and validation for /api/bulk-order/.
+
+Wholesale customers send line items as
+
+* JSON - an array of ``{"sku": ..., "qty": ...}`` objects
+  (Content-Type: application/json), or
+* CSV - ``sku,qty`` rows, with an optional header row (text/csv).
+
+The body is read from the request stream in chunks and parsed as it
+arrives: JSON elements are decoded one by one with raw_decode(), CSV rows
+as soon as their line is complete. The body may not exceed
+ORDER_BULK_MAX_BYTES and ORDER_BULK_MAX_LINES lines (413 otherwise), and
+no SKU may add up to more than ORDER_MAX_QTY units. All SKUs are then
+checked against the catalog in a single query, and names and prices come
+from the catalog, not from the client. Every problem is
+reported with its line number instead of stopping at the first one.
+"""
+import codecs
+import csv
+import json
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+from .models import Product
+
+CHUNK_SIZE = 64 * 1024
+JSON_TYPES = ('application/json',)
+CSV_TYPES = ('text/csv', 'text/plain', 'application/csv')
+
+
+class BulkOrderError(Exception):
+    """The request as a whole cannot be processed."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _read_chunks(request):
+    """The body as str chunks, enforcing ORDER_BULK_MAX_BYTES while reading."""
+    max_bytes = settings.ORDER_BULK_MAX_BYTES
+    try:
+        declared = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        declared = 0
+    if declared > max_bytes:
+        raise BulkOrderError(f'Завеликий запит (максимум {max_bytes // 1024} КБ).', status=413)
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    received = 0
+    try:
+        while True:
+            chunk = request.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > max_bytes:
+                raise BulkOrderError(f'Завеликий запит (максимум {max_bytes // 1024} КБ).', status=413)
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+    except UnicodeDecodeError as exc:
+        raise BulkOrderError('Запит має бути в кодуванні UTF-8.') from exc
+
+
+def _json_lines(chunks):
+    """(line number, element) of a top-level JSON array, decoded incrementally."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = finished = separated = False
+    number = 0
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise BulkOrderError('Очікується JSON-масив позицій.')
+                buffer, started = buffer[1:], True
+                continue
+            if finished or not buffer:
+                break
+            if buffer[0] == ']' and not separated:
+                buffer, finished = buffer[1:], True
+                continue
+            if number and not separated:
+                if buffer[0] != ',':
+                    raise BulkOrderError('Некоректний JSON.')
+                buffer, separated = buffer[1:], True
+                continue
+            try:
+                element, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Incomplete element: wait for the next chunk
+                break
+            if end == len(buffer):
+                # A number may continue in the next chunk; the array's "]" always follows
+                break
+            number += 1
+            buffer, separated = buffer[end:], False
+            yield number, element
+    if not finished or buffer.strip():
+        raise BulkOrderError('Некоректний JSON.')
+
+
+def _text_lines(chunks):
+    tail = ''
+    for chunk in chunks:
+        lines = (tail + chunk).split('\n')
+        tail = lines.pop()
+        yield from (line + '\n' for line in lines)
+    if tail:
+        yield tail
+
+
+def _csv_lines(chunks):
+    """(line number, {'sku', 'qty'}) of ``sku,qty`` rows; a header row is skipped."""
+    rows = csv.reader(_text_lines(chunks))
+    try:
+        for number, row in enumerate(rows, 1):
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            if number == 1 and row[0].strip().lower() in ('sku', 'артикул'):
+                continue
+            yield number, {'sku': row[0], 'qty': row[1] if len(row) > 1 else ''}
+    except csv.Error as exc:
+        # E.g. a field over csv.field_size_limit() or an unterminated quote
+        raise BulkOrderError(f'Некоректний CSV (рядок {rows.line_num}).') from exc
+
+
+def parse_lines(request):
+    """
+    Read the request body into ``(lines, errors)``: lines are
+    ``(line number, sku, qty)`` with a well-formed quantity, errors are dicts
+    with ``line`` and ``error`` (and ``sku`` where known).
+    """
+    content_type = request.content_type or ''
+    if content_type in JSON_TYPES:
+        elements = _json_lines(_read_chunks(request))
+    elif content_type in CSV_TYPES:
+        elements = _csv_lines(_read_chunks(request))
+    else:
+        raise BulkOrderError('Підтримуються JSON (application/json) і CSV (text/csv).', status=415)
+
+    max_lines = settings.ORDER_BULK_MAX_LINES
+    lines, errors = [], []
+    for number, element in elements:
+        if len(lines) + len(errors) >= max_lines:
+            raise BulkOrderError(f'Забагато позицій (максимум {max_lines}).', status=413)
+        if not isinstance(element, dict):
+            errors.append({'line': number, 'error': 'Очікується об’єкт з полями sku і qty.'})
+            continue
+        sku = str(element.get('sku') or '').strip()
+        if not sku:
+            errors.append({'line': number, 'error': 'Не вказано артикул.'})
+            continue
+        try:
+            qty = int(str(element.get('qty', '')).strip())
+        except ValueError:
+            qty = 0
+        if qty <= 0:
+            errors.append({'line': number, 'sku': sku, 'error': 'Невірна кількість товару.'})
+            continue
+        if qty > settings.ORDER_MAX_QTY:
+            errors.append({'line': number, 'sku': sku,
+                           'error': f'Забагато одиниць товару (максимум {settings.ORDER_MAX_QTY}).'})
+            continue
+        lines.append((number, sku, qty))
+    if not lines and not errors:
+        raise BulkOrderError('Кошик порожній.')
+    return lines, errors
+
+
+def price_lines(lines):
+    """
+    Check the SKUs of parsed lines against the catalog in one query.
+
+    Returns ``(items, errors)``; items are order items with the catalog
+    name and price (repeated SKUs are merged into one item).
+    """
+    products = {
+        product['sku']: product
+        for product in Product.objects.filter(sku__in={sku for _number, sku, _qty in lines})
+        .values('sku', 'name', 'price', 'is_available')
+    }
+    items, errors = {}, []
+    for number, sku, qty in lines:
+        product = products.get(sku)
+        if product is None:
+            errors.append({'line': number, 'sku': sku, 'error': 'Товар з таким артикулом не знайдено.'})
+        elif not product['is_available'] or product['price'] is None:
+            errors.append({'line': number, 'sku': sku, 'error': 'Товар недоступний для замовлення.'})
+        elif sku in items:
+            if items[sku]['qty'] + qty > settings.ORDER_MAX_QTY:
+                errors.append({'line': number, 'sku': sku,
+                               'error': f'Забагато одиниць товару (максимум {settings.ORDER_MAX_QTY}).'})
+            else:
+                items[sku]['qty'] += qty
+        else:
+            items[sku] = {
+                'sku': sku[:50],
+                'name': product['name'][:120],
+                'price': int(Decimal(product['price']).quantize(Decimal(1), ROUND_HALF_UP)),
+                'qty': qty,
+            }
+    return list(items.values()), errors
@@ -0,0 +1,28 @@
+"""
+Catalog cache versioning.
+
+Cached catalog output (sitemaps, feeds, ...) embeds the current catalog
+version in its cache key. Any change to products or categories bumps the
+version, which invalidates all of it at once without tracking keys.
+"""
+from django.core.cache import cache
+
+from antidrone.middleware import record_cache_access
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def get_catalog_version() -> int:
+    version = cache.get(CATALOG_VERSION_KEY)
+    record_cache_access(version is not None)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version() -> None:
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 2, timeout=None)
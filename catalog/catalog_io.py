@@ -0,0 +1,104 @@
+"""
+Row format shared by the import_catalog and export_catalog commands.
+
+A row is a flat dict keyed by CATALOG_FIELDS. ``category`` holds the
+category path of slugs from the root (``moduli/sdr-moduli``); a bare slug
+is accepted on import as well.
+"""
+import csv
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from .models import Category
+
+CATALOG_FIELDS = [
+    'sku', 'name', 'slug', 'category', 'price', 'old_price',
+    'is_available', 'is_popular', 'is_new', 'description', 'full_description',
+]
+# Product model fields a row can change (everything except the sku key)
+PRODUCT_FIELDS = [
+    'name', 'slug', 'category_id', 'price', 'old_price',
+    'is_available', 'is_popular', 'is_new', 'description', 'full_description',
+]
+BOOLEAN_FIELDS = {'is_available', 'is_popular', 'is_new'}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'так', '+'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'ні', '-', ''}
+
+
+def category_paths():
+    """Map of slug path -> category id, built from one query."""
+    rows = list(Category.objects.values_list('id', 'slug', 'parent_id'))
+    by_id = {pk: (slug, parent_id) for pk, slug, parent_id in rows}
+    paths = {}
+
+    def path_of(pk):
+        if pk not in paths:
+            slug, parent_id = by_id[pk]
+            paths[pk] = f'{path_of(parent_id)}/{slug}' if parent_id else slug
+        return paths[pk]
+
+    for pk in by_id:
+        path_of(pk)
+    return {path: pk for pk, path in paths.items()}
+
+
+def category_lookup():
+    """Resolve both full paths and bare slugs to category ids."""
+    lookup = category_paths()
+    for path, pk in list(lookup.items()):
+        lookup.setdefault(path.rsplit('/', 1)[-1], pk)
+    return lookup
+
+
+def parse_decimal(value):
+    value = str(value).strip().replace(' ', '').replace(',', '.')
+    if not value:
+        return None
+    try:
+        return Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'некоректна ціна: {value!r}')
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'некоректне логічне значення: {value!r}')
+
+
+def content_hash(values: dict) -> str:
+    """Stable hash of product field values, used to skip unchanged rows."""
+    normalized = {
+        key: str(value) if isinstance(value, Decimal) else value
+        for key, value in sorted(values.items())
+    }
+    return hashlib.sha1(json.dumps(normalized, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def read_rows(handle, fmt):
+    """Yield (line_number, row) from an open CSV or JSONL file, one at a time."""
+    if fmt == 'csv':
+        reader = csv.DictReader(handle)
+        for row in reader:
+            yield reader.line_num, {key.strip(): value for key, value in row.items() if key}
+    else:
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_number, exc
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else 'csv'
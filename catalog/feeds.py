@@ -0,0 +1,362 @@
+"""
+Marketplace product feeds.
+
+Two formats are generated from the same product rows:
+
+* ``yml`` - YML (Yandex Market Language) catalog, imported by Prom.ua,
+  Rozetka and most Ukrainian marketplaces;
+* ``google`` - RSS 2.0 with the ``g:`` namespace for Google Merchant Center.
+
+Feeds are written to FEED_DIR by a streaming writer: products are read as
+values() rows in primary key order and serialized in batches (one query for
+the rows, one for their main images), so memory stays flat at any catalog
+size. Every product is a single line in the file. An incremental run reads
+the previous feed alongside the current product ids, copies the lines of
+unchanged products and re-serializes only products updated since the last
+run (or new to the feed); removed products simply drop out.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from .cache import get_catalog_version
+from .models import Category, Product, ProductImage
+from .utils import batched, url_pattern
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the fragment markup changes, forcing a full rebuild
+FEED_SCHEMA = 1
+BATCH_SIZE = 1000
+SHOP_NAME = 'Antidrone'
+CURRENCY = 'UAH'
+# Keep every fragment on one line so feeds can be merged line by line
+TEXT_ENTITIES = {'\n': '&#10;', '\r': ''}
+
+PRODUCT_FIELDS = [
+    'id', 'sku', 'name', 'slug', 'category_id', 'category__slug', 'price', 'old_price',
+    'is_available', 'description', 'full_description',
+]
+
+
+def feed_products():
+    """Products that go into feeds: priced and in an active category."""
+    return Product.objects.filter(price__isnull=False, category__is_active=True)
+
+
+def _text(value):
+    return escape(str(value), TEXT_ENTITIES)
+
+
+def _price(value):
+    return str(Decimal(value).quantize(Decimal('0.01')))
+
+
+class FeedFormat:
+    """Document skeleton and per-product fragment of one feed format."""
+    name = None
+    fragment_re = None
+
+    def __init__(self, site_url):
+        self.site_url = site_url.rstrip('/')
+        self.product_url = self.site_url + url_pattern('catalog:product_detail', 'category_slug', 'product_slug')
+
+    def header(self, generated_at):
+        raise NotImplementedError
+
+    def footer(self):
+        raise NotImplementedError
+
+    def fragment(self, product, image):
+        raise NotImplementedError
+
+    def link(self, product):
+        return self.product_url.format(category_slug=product['category__slug'], product_slug=product['slug'])
+
+    def image_url(self, image):
+        return f'{self.site_url}/{settings.MEDIA_URL.strip("/")}/{image}'
+
+
+class YmlFeed(FeedFormat):
+    name = 'yml'
+    fragment_re = re.compile(r'^<offer id="(\d+)"')
+
+    def header(self, generated_at):
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            f'<yml_catalog date="{generated_at:%Y-%m-%d %H:%M}">\n<shop>\n',
+            f'<name>{_text(SHOP_NAME)}</name>\n<company>{_text(SHOP_NAME)}</company>\n',
+            f'<url>{_text(self.site_url)}</url>\n',
+            f'<currencies><currency id="{CURRENCY}" rate="1"/></currencies>\n<categories>\n',
+        ]
+        for pk, parent_id, name in (
+            Category.objects.filter(is_active=True).order_by('tree_id', 'lft')
+            .values_list('id', 'parent_id', 'name').iterator(chunk_size=BATCH_SIZE)
+        ):
+            parent = f' parentId="{parent_id}"' if parent_id else ''
+            parts.append(f'<category id="{pk}"{parent}>{_text(name)}</category>\n')
+        parts.append('</categories>\n<offers>\n')
+        return ''.join(parts)
+
+    def footer(self):
+        return '</offers>\n</shop>\n</yml_catalog>\n'
+
+    def fragment(self, product, image):
+        available = 'true' if product['is_available'] else 'false'
+        parts = [
+            f'<offer id="{product["id"]}" available="{available}">',
+            f'<url>{_text(self.link(product))}</url>',
+            f'<price>{_price(product["price"])}</price>',
+        ]
+        if product['old_price'] and product['old_price'] > product['price']:
+            parts.append(f'<oldprice>{_price(product["old_price"])}</oldprice>')
+        parts.append(f'<currencyId>{CURRENCY}</currencyId><categoryId>{product["category_id"]}</categoryId>')
+        if image:
+            parts.append(f'<picture>{_text(self.image_url(image))}</picture>')
+        parts.append(f'<name>{_text(product["name"])}</name>')
+        if product['sku']:
+            parts.append(f'<vendorCode>{_text(product["sku"])}</vendorCode>')
+        description = product['full_description'] or product['description']
+        if description:
+            parts.append(f'<description>{_text(description)}</description>')
+        parts.append('</offer>\n')
+        return ''.join(parts)
+
+
+class GoogleFeed(FeedFormat):
+    name = 'google'
+    fragment_re = re.compile(r'^<item><g:id>(\d+)</g:id>')
+
+    def header(self, generated_at):
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+            f'<title>{_text(SHOP_NAME)}</title>\n<link>{_text(self.site_url)}</link>\n'
+            f'<description>{_text(SHOP_NAME)} {generated_at:%Y-%m-%d %H:%M}</description>\n'
+        )
+
+    def footer(self):
+        return '</channel>\n</rss>\n'
+
+    def fragment(self, product, image):
+        parts = [
+            f'<item><g:id>{product["id"]}</g:id>',
+            f'<title>{_text(product["name"])}</title>',
+            f'<link>{_text(self.link(product))}</link>',
+        ]
+        description = product['description'] or product['full_description']
+        if description:
+            parts.append(f'<description>{_text(description)}</description>')
+        if image:
+            parts.append(f'<g:image_link>{_text(self.image_url(image))}</g:image_link>')
+        availability = 'in_stock' if product['is_available'] else 'out_of_stock'
+        parts.append(f'<g:availability>{availability}</g:availability><g:condition>new</g:condition>')
+        if product['old_price'] and product['old_price'] > product['price']:
+            parts.append(f'<g:price>{_price(product["old_price"])} {CURRENCY}</g:price>')
+            parts.append(f'<g:sale_price>{_price(product["price"])} {CURRENCY}</g:sale_price>')
+        else:
+            parts.append(f'<g:price>{_price(product["price"])} {CURRENCY}</g:price>')
+        if product['sku']:
+            parts.append(f'<g:mpn>{_text(product["sku"])}</g:mpn>')
+        else:
+            parts.append('<g:identifier_exists>no</g:identifier_exists>')
+        parts.append('</item>\n')
+        return ''.join(parts)
+
+
+FORMATS = {feed.name: feed for feed in (YmlFeed, GoogleFeed)}
+
+
+def feed_path(name) -> Path:
+    return Path(settings.FEED_DIR) / f'{name}.xml'
+
+
+def _state_path(name) -> Path:
+    return Path(settings.FEED_DIR) / f'{name}.state.json'
+
+
+def read_state(name):
+    try:
+        with open(_state_path(name), encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _categories_signature():
+    """Hash of category ids and slugs: product links embed the category slug."""
+    digest = hashlib.sha1()
+    for pk, slug in Category.objects.order_by('pk').values_list('pk', 'slug').iterator(chunk_size=BATCH_SIZE):
+        digest.update(f'{pk}:{slug}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _main_images(product_ids):
+    """product_id -> image path of its main (or first) image, in one query."""
+    images = {}
+    rows = (
+        ProductImage.objects.filter(product_id__in=product_ids)
+        .order_by('product_id', '-is_main', 'order', 'pk')
+        .values_list('product_id', 'image')
+    )
+    for product_id, image in rows:
+        images.setdefault(product_id, image)
+    return images
+
+
+def _serialize(feed, product_ids):
+    if not product_ids:
+        return {}
+    products = feed_products().filter(pk__in=product_ids).values(*PRODUCT_FIELDS)
+    images = _main_images(product_ids)
+    return {product['id']: feed.fragment(product, images.get(product['id'])) for product in products}
+
+
+class _PreviousFeed:
+    """Reads fragment lines of the previous feed in primary key order."""
+
+    def __init__(self, path, fragment_re):
+        self.fragment_re = fragment_re
+        self.lines = self._fragments(path) if path else iter(())
+        self.pending = next(self.lines, None)
+
+    def _fragments(self, path):
+        try:
+            handle = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with handle:
+            for line in handle:
+                match = self.fragment_re.match(line)
+                if match:
+                    yield int(match.group(1)), line
+
+    def take_until(self, last_id):
+        """Fragments with id <= last_id, keyed by id."""
+        taken = {}
+        while self.pending is not None and self.pending[0] <= last_id:
+            taken[self.pending[0]] = self.pending[1]
+            self.pending = next(self.lines, None)
+        return taken
+
+
+def generate_feed(name, full=False, site_url=None):
+    """
+    Write FEED_DIR/<name>.xml (atomically) and its state file.
+
+    Returns a dict with ``products`` (lines written) and ``serialized``
+    (products rendered from the database rather than copied).
+    """
+    site_url = site_url or settings.SITE_URL
+    feed = FORMATS[name](site_url)
+    started_at = timezone.now()
+    catalog_version = get_catalog_version()
+    path = feed_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    categories = _categories_signature()
+
+    # Incremental only when the previous fragments are still valid as-is
+    state = read_state(name)
+    since = None
+    if not full and state and path.exists() and (
+        state.get('schema'), state.get('site_url'), state.get('categories')
+    ) == (FEED_SCHEMA, site_url, categories):
+        since = datetime.fromisoformat(state['started_at'])
+    previous = _PreviousFeed(path if since else None, feed.fragment_re)
+
+    stats = {'products': 0, 'serialized': 0}
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    rows = feed_products().order_by('pk').values_list('pk', 'updated_at').iterator(chunk_size=BATCH_SIZE)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            handle.write(feed.header(timezone.localtime(started_at)))
+            for batch in batched(rows, BATCH_SIZE):
+                old = previous.take_until(batch[-1][0]) if since else {}
+                fresh = _serialize(feed, [
+                    pk for pk, updated_at in batch
+                    if pk not in old or updated_at >= since
+                ])
+                for pk, _updated_at in batch:
+                    line = fresh.get(pk) or old.get(pk)
+                    if line:
+                        handle.write(line)
+                        stats['products'] += 1
+                stats['serialized'] += len(fresh)
+            handle.write(feed.footer())
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    state = {
+        'schema': FEED_SCHEMA,
+        'site_url': site_url,
+        'categories': categories,
+        'started_at': started_at.isoformat(),
+        'catalog_version': catalog_version,
+        **stats,
+    }
+    state_tmp = _state_path(name).with_suffix('.tmp')
+    with open(state_tmp, 'w', encoding='utf-8') as handle:
+        json.dump(state, handle)
+    os.replace(state_tmp, _state_path(name))
+    return stats
+
+
+def _regenerate(name, lock_key):
+    try:
+        generate_feed(name)
+    except Exception:
+        logger.exception('Could not regenerate the %s feed', name)
+    finally:
+        cache.delete(lock_key)
+        connection.close()
+
+
+def refresh_in_background(name):
+    """
+    Regenerate a feed incrementally in a background thread of this worker,
+    unless some worker already does (the lock expires after FEED_LOCK_TIMEOUT).
+    """
+    lock_key = f'feed:lock:{name}'
+    if cache.add(lock_key, 1, timeout=settings.FEED_LOCK_TIMEOUT):
+        threading.Thread(target=_regenerate, args=(name, lock_key), name=f'feed-{name}', daemon=True).start()
+
+
+@require_GET
+def feed_view(request, name):
+    """
+    Serve a feed file as written by export_feed (run it from cron). When the
+    catalog version moved since, the file is still served as is and a
+    regeneration starts in the background; no request waits for one.
+    """
+    if name not in FORMATS:
+        raise Http404
+    path = feed_path(name)
+    state = read_state(name)
+    if state is None or state.get('catalog_version') != get_catalog_version():
+        refresh_in_background(name)
+    try:
+        handle = open(path, 'rb')
+    except FileNotFoundError:
+        response = HttpResponse('Фід генерується, спробуйте пізніше.', status=503, content_type='text/plain')
+        response['Retry-After'] = '30'
+        return response
+    return FileResponse(handle, content_type='application/xml; charset=utf-8')
@@ -0,0 +1,306 @@
+"""
+Management command to benchmark the catalog hot paths over HTTP.
+
+Drives the pages and order API of a running server (runserver, gunicorn or
+uvicorn) at a fixed concurrency and reports throughput and latency
+percentiles. Results are written as JSON so runs can be diffed between
+commits with --compare.
+
+Every create_order request sends a cart and Idempotency-Key of its own, so
+the API's deduplication does not turn the scenario into replays. The order
+API is rate limited, though: start the benchmarked server with
+ORDER_RATE_LIMIT_PER_IP= and ORDER_RATE_LIMIT_GLOBAL= (empty, i.e. off), or
+the 429s are reported as errors.
+"""
+
+import itertools
+import json
+import math
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPSConnection
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from catalog.models import Category, Product
+
+
+SCENARIOS = ['index', 'category_first', 'category_deep', 'product', 'create_order', 'get_order']
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class HttpClient:
+    """Keep-alive HTTP client with one connection per worker thread."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'http'
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.cookies = {}
+        self.local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn_class = HTTPSConnection if self.scheme == 'https' else HTTPConnection
+            conn = conn_class(self.netloc, timeout=self.timeout)
+            self.local.conn = conn
+        return conn
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, self.prefix + path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                return response.status, data, response.getheader('Set-Cookie')
+            except (ConnectionError, OSError):
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise
+
+    def prime_csrf(self):
+        """Fetch the cart page to obtain the CSRF cookie used by create-order."""
+        status, _data, set_cookie = self.request('GET', '/cart/')
+        if status != 200 or not set_cookie:
+            raise CommandError('Could not obtain a CSRF cookie from /cart/.')
+        cookie = SimpleCookie()
+        cookie.load(set_cookie)
+        if 'csrftoken' not in cookie:
+            raise CommandError('Could not obtain a CSRF cookie from /cart/.')
+        self.cookies['csrftoken'] = cookie['csrftoken'].value
+
+
+class Command(BaseCommand):
+    help = 'Benchmark catalog pages and the order API against a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to benchmark')
+        parser.add_argument('--concurrency', type=int, default=10, help='Parallel clients')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per scenario')
+        parser.add_argument(
+            '--scenarios',
+            default=','.join(SCENARIOS),
+            help=f'Comma-separated subset of: {", ".join(SCENARIOS)}',
+        )
+        parser.add_argument('--seed-data', action='store_true', help='Run load_test_data before benchmarking')
+        parser.add_argument('--products', type=int, default=None, help='With --seed-data: generate N products')
+        parser.add_argument('--depth', type=int, default=1, help='With --seed-data: category depth')
+        parser.add_argument('--seed', type=int, default=42, help='With --seed-data: random seed')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline JSON file to diff results against')
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            default=None,
+            help='Fail if any p95 latency is worse than the baseline by more than this percent',
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        if options['seed_data']:
+            call_command(
+                'load_test_data',
+                products=options['products'],
+                depth=options['depth'],
+                seed=options['seed'],
+                stdout=self.stdout,
+            )
+
+        client = HttpClient(options['base_url'])
+        targets = self.build_targets(client, scenarios)
+
+        results = {}
+        for name in scenarios:
+            request = targets[name]
+            for _ in range(options['warmup']):
+                client.request(*request())
+            results[name] = self.run_scenario(client, request, options['requests'], options['concurrency'])
+            self.report(name, results[name])
+
+        payload = {
+            'meta': {
+                'commit': self.git_commit(),
+                'timestamp': int(time.time()),
+                'base_url': options['base_url'],
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'products': Product.objects.count(),
+                'categories': Category.objects.count(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(payload, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if options['compare']:
+            self.compare(options['compare'], results, options['max_regression'])
+
+    def build_targets(self, client, scenarios):
+        """Pick representative URLs from the current database."""
+        category = (
+            Category.objects.filter(is_active=True)
+            .annotate(num_products=Count('products'))
+            .order_by('-num_products')
+            .first()
+        )
+        product = Product.objects.filter(is_available=True).select_related('category').first()
+        if category is None or product is None:
+            raise CommandError('Catalog is empty; run with --seed-data or load_test_data first.')
+
+        products_count = Product.objects.filter(
+            category__in=category.get_descendants(include_self=True),
+            is_available=True,
+        ).count()
+        page_size = getattr(settings, 'CATALOG_PAGE_SIZE', 24)
+        last_page = max(math.ceil(products_count / page_size), 1)
+        category_url = category.get_absolute_url()
+
+        referer = f'{client.scheme}://{client.netloc}/cart/'
+        run = uuid.uuid4().hex[:12]
+        counter = itertools.count(1)
+
+        def create_order():
+            # A distinct cart and key per request: identical ones would be replayed
+            key = f'bench-{run}-{next(counter)}'
+            order_body = json.dumps({
+                'items': [{'sku': product.sku, 'name': f'{product.name[:80]} ({key})',
+                           'price': int(product.price or 0), 'qty': 1}],
+                'currency': 'UAH',
+                'source': 'bench',
+            }).encode('utf-8')
+            return 'POST', '/api/create-order/', order_body, {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': client.cookies.get('csrftoken', ''),
+                'Referer': referer,
+                'Idempotency-Key': key,
+            }
+
+        targets = {
+            'index': lambda: ('GET', '/'),
+            'category_first': lambda: ('GET', category_url),
+            'category_deep': lambda: ('GET', f'{category_url}?page={last_page}'),
+            'product': lambda: ('GET', product.get_absolute_url()),
+            'create_order': create_order,
+        }
+
+        if 'create_order' in scenarios or 'get_order' in scenarios:
+            client.prime_csrf()
+        if 'get_order' in scenarios:
+            status, data, _cookie = client.request(*create_order())
+            if status != 200:
+                raise CommandError(f'Could not create an order for get_order (HTTP {status}).')
+            order_id = json.loads(data)['order_id']
+            targets['get_order'] = lambda: ('GET', f'/api/order/{order_id}/')
+        return targets
+
+    def run_scenario(self, client, request, total, concurrency):
+        def timed_call(_):
+            start = time.perf_counter()
+            try:
+                status, _data, _cookie = client.request(*request())
+            except OSError:
+                status = None
+            return time.perf_counter() - start, status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed_call, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(duration * 1000 for duration, _status in samples)
+        errors = sum(1 for _duration, status in samples if status != 200)
+        throttled = sum(1 for _duration, status in samples if status == 429)
+        return {
+            'requests': total,
+            'errors': errors,
+            'throttled': throttled,
+            'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+        }
+
+    def report(self, name, result):
+        line = (
+            f'{name:<15} {result["throughput_rps"]:>8.1f} req/s  '
+            f'p50 {result["p50_ms"]:>7.1f} ms  p95 {result["p95_ms"]:>7.1f} ms  '
+            f'p99 {result["p99_ms"]:>7.1f} ms  errors {result["errors"]}'
+        )
+        style = self.style.ERROR if result['errors'] else self.style.SUCCESS
+        self.stdout.write(style(line))
+        if result.get('throttled'):
+            self.stdout.write(self.style.WARNING(
+                f'{"":<15} {result["throttled"]} requests got 429: disable the rate limits '
+                'of the benchmarked server (ORDER_RATE_LIMIT_PER_IP= ORDER_RATE_LIMIT_GLOBAL=)'
+            ))
+
+    def compare(self, baseline_path, results, max_regression):
+        with open(baseline_path, 'r', encoding='utf-8') as handle:
+            baseline = json.load(handle).get('results', {})
+
+        self.stdout.write(f'\nCompared with {baseline_path}:')
+        regressions = []
+        for name, result in results.items():
+            old = baseline.get(name)
+            if not old:
+                self.stdout.write(f'{name:<15} (no baseline)')
+                continue
+            rps_delta = _delta(old['throughput_rps'], result['throughput_rps'])
+            p95_delta = _delta(old['p95_ms'], result['p95_ms'])
+            self.stdout.write(
+                f'{name:<15} throughput {rps_delta:+6.1f}%  p95 {p95_delta:+6.1f}%  '
+                f'({old["p95_ms"]} -> {result["p95_ms"]} ms)'
+            )
+            if max_regression is not None and p95_delta > max_regression:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(f'p95 regressed by more than {max_regression}% in: {", ".join(regressions)}')
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+def _delta(old, new):
+    if not old:
+        return 0.0
+    return (new - old) / old * 100
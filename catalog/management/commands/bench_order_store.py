@@ -0,0 +1,98 @@
+"""
+Management command to compare order store backends.
+
+Runs create / get / confirm directly against each OrderStore (no HTTP) and
+reports throughput and latency percentiles per operation:
+    python manage.py bench_order_store --orders 2000 --threads 4
+
+The file and events backends write to a temporary directory; the database backend uses
+the configured database and deletes its benchmark orders afterwards.
+"""
+
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from catalog.management.commands.bench_catalog import percentile
+from catalog.models import Order
+from catalog.order_store import OrderStoreError, build_order_store
+
+SAMPLE_ORDER = {
+    'items': [
+        {'sku': 'ANT-2400-Y18', 'name': 'Антена Yagi 2.4 ГГц 18 dBi', 'price': 3200, 'qty': 2},
+        {'sku': 'SDR-MOD-01', 'name': 'SDR модуль', 'price': 12500, 'qty': 1},
+    ],
+    'total': 18900,
+    'currency': 'UAH',
+    'source': 'bench',
+    'page': '/cart/',
+    'ts': 0,
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark order store backends (create/get/confirm)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', default='file,events,database', help='Comma-separated backends')
+        parser.add_argument('--orders', type=int, default=1000, help='Orders per backend')
+        parser.add_argument('--threads', type=int, default=1, help='Concurrent workers')
+        parser.add_argument('--no-fsync', action='store_true', help='File backend without fsync (unsafe, for comparison)')
+        parser.add_argument('--fsync-ms', type=int, default=settings.ORDER_EVENT_FSYNC_MS,
+                            help='Group commit window of the events backend (0 = fsync each append)')
+
+    def handle(self, *args, **options):
+        for backend in options['backends'].split(','):
+            backend = backend.strip()
+            tmp_dir = None
+            if backend == 'file':
+                tmp_dir = tempfile.mkdtemp(prefix='order-store-bench-')
+                store = build_order_store('file', root=tmp_dir, fsync=not options['no_fsync'])
+            elif backend == 'events':
+                tmp_dir = tempfile.mkdtemp(prefix='order-store-bench-')
+                store = build_order_store('events', root=tmp_dir, fsync_interval=options['fsync_ms'] / 1000)
+            elif backend == 'database':
+                store = build_order_store('database')
+            else:
+                raise CommandError(f'Unknown backend: {backend}')
+
+            self.stdout.write(f'\n{backend}' + (f' ({connection.vendor})' if backend == 'database' else ''))
+            order_ids = []
+            try:
+                order_ids = self.run(store, 'create', options, lambda _i: store.create(SAMPLE_ORDER)['order_id'])
+                self.run(store, 'get', options, lambda i: store.get(order_ids[i % len(order_ids)]))
+                self.run(store, 'confirm', options, lambda i: store.transition(order_ids[i % len(order_ids)], 'confirmed'))
+            finally:
+                if tmp_dir:
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                else:
+                    Order.objects.filter(source='bench', order_id__in=order_ids).delete()
+
+    def run(self, store, name, options, operation):
+        def timed(index):
+            started = time.perf_counter()
+            try:
+                result = operation(index)
+            except (OrderStoreError, DatabaseError):
+                return None, None
+            return (time.perf_counter() - started) * 1000, result
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            outcomes = list(pool.map(timed, range(options['orders'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(ms for ms, _result in outcomes if ms is not None)
+        errors = len(outcomes) - len(latencies)
+        line = (
+            f'  {name:<8} {len(latencies) / elapsed:>9.1f} ops/s  '
+            f'p50 {percentile(latencies, 50):>6.2f} ms  p95 {percentile(latencies, 95):>6.2f} ms  '
+            f'p99 {percentile(latencies, 99):>6.2f} ms  errors {errors}'
+        )
+        self.stdout.write((self.style.ERROR if errors else self.style.SUCCESS)(line))
+        return [result for _ms, result in outcomes if result is not None]
@@ -0,0 +1,93 @@
+"""
+Management command for set-based price and availability changes.
+
+Examples:
+    python manage.py bulk_products --category anteny --price-percent -15 --set-old-price
+    python manage.py bulk_products --sku ANT-2400-Y18 --sku ANT-5800-Y24 --available no
+    python manage.py bulk_products --category moduli --clear-sale --new no
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import bulk
+from catalog.catalog_io import parse_bool
+from catalog.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = 'Change prices and flags of many products with single UPDATE statements'
+
+    def add_arguments(self, parser):
+        target = parser.add_argument_group('products')
+        target.add_argument('--category', help='Category slug; includes all subcategories')
+        target.add_argument('--sku', action='append', default=[], help='Product SKU (repeatable)')
+        target.add_argument('--all', action='store_true', help='Every product in the catalog')
+
+        price = parser.add_argument_group('prices')
+        price.add_argument('--price-percent', type=str, help='Change prices by percent, e.g. 10 or -15')
+        price.add_argument('--price-amount', type=str, help='Change prices by an amount in UAH, e.g. -200')
+        price.add_argument('--set-old-price', action='store_true', help='Keep the current price as old_price (sale)')
+        price.add_argument('--clear-sale', action='store_true', help='Remove old_price')
+
+        flags = parser.add_argument_group('flags')
+        flags.add_argument('--available', help='yes/no')
+        flags.add_argument('--popular', help='yes/no')
+        flags.add_argument('--new', help='yes/no')
+
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many products match')
+
+    def handle(self, *args, **options):
+        queryset = self.get_queryset(options)
+        self.stdout.write(f'Matched products: {queryset.count()}')
+        if options['dry_run']:
+            return
+
+        try:
+            flags = {
+                field: parse_bool(options[option])
+                for option, field in (('available', 'is_available'), ('popular', 'is_popular'), ('new', 'is_new'))
+                if options[option] is not None
+            }
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        changed = False
+        if options['price_percent'] is not None or options['price_amount'] is not None:
+            try:
+                count = bulk.change_prices(
+                    queryset,
+                    percent=options['price_percent'],
+                    amount=options['price_amount'],
+                    set_old_price=options['set_old_price'],
+                    clear_old_price=options['clear_sale'],
+                )
+            except (ValueError, ArithmeticError) as exc:
+                raise CommandError(exc)
+            self.stdout.write(self.style.SUCCESS(f'Prices changed: {count}'))
+            changed = True
+        elif options['clear_sale']:
+            self.stdout.write(self.style.SUCCESS(f'Sales cleared: {bulk.clear_sale(queryset)}'))
+            changed = True
+        elif options['set_old_price']:
+            raise CommandError('--set-old-price needs --price-percent or --price-amount.')
+
+        if flags:
+            self.stdout.write(self.style.SUCCESS(f'Flags updated: {bulk.set_flags(queryset, **flags)}'))
+            changed = True
+
+        if not changed:
+            raise CommandError('Nothing to do: pass a price change, --clear-sale or a flag.')
+
+    def get_queryset(self, options):
+        selectors = sum(bool(options[name]) for name in ('category', 'sku', 'all'))
+        if selectors != 1:
+            raise CommandError('Choose exactly one of --category, --sku or --all.')
+        if options['all']:
+            return Product.objects.all()
+        if options['sku']:
+            return Product.objects.filter(sku__in=options['sku'])
+        try:
+            category = Category.objects.get(slug=options['category'])
+        except Category.DoesNotExist:
+            raise CommandError(f'Category not found: {options["category"]}')
+        return bulk.category_products(category)
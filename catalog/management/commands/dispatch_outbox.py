@@ -0,0 +1,50 @@
+"""
+Management command that delivers spooled new orders to the Telegram bot.
+
+Runs as a long-lived process next to the bot (systemd/supervisor), polling
+ORDER_OUTBOX_DIR and pushing over one keep-alive connection to
+ORDER_OUTBOX_TARGET; see catalog/outbox.py:
+    python manage.py dispatch_outbox
+    python manage.py dispatch_outbox --once    # drain and exit (cron, deploys)
+"""
+
+import http.client
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import outbox
+
+MAX_BACKOFF = 30
+
+
+class Command(BaseCommand):
+    help = 'Push spooled new orders to the Telegram bot inbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Deliver what is pending and exit')
+        parser.add_argument('--interval', type=float, default=0.2, help='Seconds between spool scans')
+
+    def handle(self, *args, **options):
+        if not outbox.enabled():
+            raise CommandError('ORDER_OUTBOX_TARGET is not set')
+        connection, request_path = outbox.connect()
+        backoff = options['interval']
+        while True:
+            try:
+                delivered = outbox.dispatch(connection, request_path)
+            except (OSError, http.client.HTTPException) as exc:
+                # Bot down or restarting: the messages stay spooled
+                connection.close()
+                if options['once']:
+                    raise CommandError(f'Bot inbox unavailable: {exc}') from exc
+                self.stderr.write(f'Bot inbox unavailable ({exc}), retrying in {backoff:.1f}s')
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+            backoff = options['interval']
+            if delivered:
+                self.stdout.write(self.style.SUCCESS(f'Delivered {delivered} orders'))
+            if options['once']:
+                return
+            time.sleep(options['interval'])
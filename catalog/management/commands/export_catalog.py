@@ -0,0 +1,72 @@
+"""
+Management command to export products to CSV or JSONL.
+
+Products are read with values().iterator() so rows are fetched in chunks
+(server-side cursors on PostgreSQL) and written out one at a time; the
+output can be fed back into import_catalog.
+"""
+
+import csv
+import json
+import sys
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.catalog_io import CATALOG_FIELDS, category_paths, detect_format
+from catalog.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = 'Export products to CSV/JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Output file (default: stdout)')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: by file extension')
+        parser.add_argument('--category', help='Only export this category slug and its subcategories')
+        parser.add_argument('--available-only', action='store_true', help='Skip unavailable products')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per round trip')
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['path'], options['format'])
+        paths = {pk: path for path, pk in category_paths().items()}
+
+        queryset = Product.objects.order_by('pk')
+        if options['category']:
+            try:
+                category = Category.objects.get(slug=options['category'])
+            except Category.DoesNotExist:
+                raise CommandError(f'Category not found: {options["category"]}')
+            queryset = queryset.filter(category__in=category.get_descendants(include_self=True))
+        if options['available_only']:
+            queryset = queryset.filter(is_available=True)
+
+        columns = [field if field != 'category' else 'category_id' for field in CATALOG_FIELDS]
+        rows = queryset.values(*columns).iterator(chunk_size=options['chunk_size'])
+
+        if options['path'] == '-':
+            count = self.write(sys.stdout, fmt, rows, paths)
+        else:
+            with open(options['path'], 'w', encoding='utf-8', newline='') as handle:
+                count = self.write(handle, fmt, rows, paths)
+            self.stderr.write(self.style.SUCCESS(f'Exported {count} products to {options["path"]}'))
+
+    def write(self, handle, fmt, rows, paths):
+        if fmt == 'csv':
+            writer = csv.DictWriter(handle, fieldnames=CATALOG_FIELDS)
+            writer.writeheader()
+        count = 0
+        for row in rows:
+            row['category'] = paths.get(row.pop('category_id'), '')
+            if fmt == 'csv':
+                writer.writerow(row)
+            else:
+                handle.write(json.dumps(row, ensure_ascii=False, default=_json_default) + '\n')
+            count += 1
+        return count
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
@@ -0,0 +1,38 @@
+"""
+Management command to (re)generate marketplace feeds.
+
+Examples:
+    python manage.py export_feed              # every format, incrementally
+    python manage.py export_feed yml --full   # rebuild the YML feed from scratch
+
+Run it from cron after imports; /feeds/<format>.xml serves the files and,
+when the catalog changed since the last run, only starts a background
+regeneration while it keeps serving the current file.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.feeds import FORMATS, feed_path, generate_feed
+
+
+class Command(BaseCommand):
+    help = 'Generate marketplace product feeds (YML for Prom.ua/Rozetka, Google Merchant RSS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('formats', nargs='*', help=f'{", ".join(FORMATS)} (default: all)')
+        parser.add_argument('--full', action='store_true', help='Re-serialize every product')
+        parser.add_argument('--site-url', help='Absolute site address for links (default: SITE_URL)')
+
+    def handle(self, *args, **options):
+        unknown = set(options['formats']) - set(FORMATS)
+        if unknown:
+            raise CommandError(f'Unknown feed format: {", ".join(sorted(unknown))}')
+        for name in options['formats'] or FORMATS:
+            started = time.perf_counter()
+            stats = generate_feed(name, full=options['full'], site_url=options['site_url'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{feed_path(name)}: {stats["products"]} products, '
+                f'{stats["serialized"]} serialized in {time.perf_counter() - started:.1f}s'
+            ))
@@ -0,0 +1,162 @@
+"""
+Management command to import products from a CSV or JSONL price list.
+
+Rows are streamed from the file and upserted by SKU in batches: one query
+to load the existing products of a batch, then bulk_create for new SKUs and
+bulk_update for changed ones. Rows whose content hash matches the database
+are skipped. Columns missing from the file are left untouched, so a
+supplier list with just ``sku,price`` only updates prices.
+"""
+
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from catalog.cache import bump_catalog_version
+from catalog.catalog_io import (
+    BOOLEAN_FIELDS,
+    PRODUCT_FIELDS,
+    category_lookup,
+    content_hash,
+    detect_format,
+    parse_bool,
+    parse_decimal,
+    read_rows,
+)
+from catalog.models import Product
+from catalog.utils import batched, make_slug
+
+
+class Command(BaseCommand):
+    help = 'Import products from CSV/JSONL, upserting by SKU'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: by file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report changes without writing')
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['path'], options['format'])
+        self.dry_run = options['dry_run']
+        self.categories = category_lookup()
+        self.stats = Counter()
+
+        try:
+            handle = open(options['path'], 'r', encoding='utf-8-sig', newline='')
+        except OSError as exc:
+            raise CommandError(f'Cannot open {options["path"]}: {exc}')
+
+        with handle:
+            rows = self.clean_rows(read_rows(handle, fmt))
+            for batch in batched(rows, options['batch_size']):
+                self.import_batch(batch)
+
+        if not self.dry_run and (self.stats['created'] or self.stats['updated']):
+            bump_catalog_version()
+
+        prefix = 'Dry run: ' if self.dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{self.stats["created"]} created, {self.stats["updated"]} updated, '
+            f'{self.stats["unchanged"]} unchanged, {self.stats["errors"]} errors'
+        ))
+
+    def error(self, line_number, message):
+        self.stats['errors'] += 1
+        self.stderr.write(self.style.ERROR(f'Line {line_number}: {message}'))
+
+    def clean_rows(self, rows):
+        """Yield (line_number, sku, values) with values keyed by Product field."""
+        for line_number, row in rows:
+            if isinstance(row, Exception):
+                self.error(line_number, f'некоректний JSON ({row})')
+                continue
+            try:
+                yield (line_number, *self.clean_row(row))
+            except ValueError as exc:
+                self.error(line_number, exc)
+
+    def clean_row(self, row):
+        sku = str(row.get('sku') or '').strip()
+        if not sku:
+            raise ValueError('порожній артикул (sku)')
+
+        values = {}
+        for field in ('name', 'slug'):
+            if str(row.get(field) or '').strip():
+                values[field] = str(row[field]).strip()
+        for field in ('description', 'full_description'):
+            if row.get(field) is not None:
+                values[field] = str(row[field]).strip()
+        for field in ('price', 'old_price'):
+            if row.get(field) is not None:
+                values[field] = parse_decimal(row[field])
+        for field in BOOLEAN_FIELDS:
+            if row.get(field) is not None:
+                values[field] = parse_bool(row[field])
+        if str(row.get('category') or '').strip():
+            path = str(row['category']).strip().strip('/')
+            if path not in self.categories:
+                raise ValueError(f'невідома категорія: {path!r}')
+            values['category_id'] = self.categories[path]
+        return sku, values
+
+    def import_batch(self, batch):
+        # Last row wins when a SKU repeats within a batch
+        incoming = {sku: (line_number, values) for line_number, sku, values in batch}
+        existing = {
+            row['sku']: row
+            for row in Product.objects.filter(sku__in=incoming).values('id', 'sku', *PRODUCT_FIELDS)
+        }
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        update_fields = set()
+        for sku, (line_number, values) in incoming.items():
+            current = existing.get(sku)
+            if current is None:
+                if not values.get('name') or 'category_id' not in values:
+                    self.error(line_number, f'новий товар {sku} потребує name і category')
+                    continue
+                values.setdefault('slug', make_slug(values['name']))
+                to_create.append(Product(sku=sku, **values))
+                continue
+
+            if content_hash({key: current[key] for key in values}) == content_hash(values):
+                self.stats['unchanged'] += 1
+                continue
+            current.update(values)
+            update_fields.update(values)
+            current.pop('sku')
+            to_update.append(Product(sku=sku, updated_at=now, **current))
+
+        self.dedupe_slugs(to_create)
+        if self.dry_run:
+            self.stats['created'] += len(to_create)
+            self.stats['updated'] += len(to_update)
+            return
+
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(to_create)
+                if to_update:
+                    Product.objects.bulk_update(to_update, sorted(update_fields | {'updated_at'}))
+        except IntegrityError as exc:
+            first_line = min(line_number for line_number, _sku, _values in batch)
+            self.error(first_line, f'пакет з {len(batch)} рядків не імпортовано: {exc}')
+            return
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+
+    def dedupe_slugs(self, products):
+        """Suffix new slugs with the SKU when they clash with existing products or each other."""
+        taken = set(
+            Product.objects.filter(slug__in=[product.slug for product in products]).values_list('slug', flat=True)
+        )
+        for product in products:
+            if product.slug in taken:
+                product.slug = f'{product.slug}-{make_slug(product.sku)}'
+            taken.add(product.slug)
@@ -0,0 +1,101 @@
+"""
+Management command to import the legacy data/orders/<id>.json files into
+the Order/OrderItem tables.
+
+Orders already in the database are skipped, so the command can be re-run
+(e.g. once more right after deploying, for files written by the old code).
+"""
+
+import json
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.api import ORDER_ID_RE
+from catalog.models import Order, OrderItem
+from catalog.utils import batched
+
+
+def _timestamp(value):
+    if not value:
+        return None
+    return datetime.fromtimestamp(int(value), tz=dt_timezone.utc)
+
+
+class Command(BaseCommand):
+    help = 'Import legacy JSON order files into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=str(Path(settings.BASE_DIR) / 'data' / 'orders'),
+                            help='Directory with <order_id>.json files')
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders per transaction')
+        parser.add_argument('--delete', action='store_true', help='Delete files once imported (or already present)')
+
+    def handle(self, *args, **options):
+        paths = sorted(Path(options['dir']).glob('*.json'))
+        stats = {'imported': 0, 'skipped': 0, 'errors': 0}
+        for batch in batched(paths, options['batch_size']):
+            orders = []
+            for path in batch:
+                try:
+                    orders.append((path, self.load(path)))
+                except (OSError, ValueError, TypeError, KeyError) as exc:
+                    stats['errors'] += 1
+                    self.stderr.write(self.style.ERROR(f'{path.name}: {exc}'))
+
+            existing = set(Order.objects.filter(
+                order_id__in=[order.order_id for _path, (order, _items) in orders]
+            ).values_list('order_id', flat=True))
+            new = [(path, order, items) for path, (order, items) in orders if order.order_id not in existing]
+            with transaction.atomic():
+                Order.objects.bulk_create([order for _path, order, _items in new])
+                saved = dict(Order.objects.filter(
+                    order_id__in=[order.order_id for _path, order, _items in new]
+                ).values_list('order_id', 'pk'))
+                OrderItem.objects.bulk_create(
+                    OrderItem(order_id=saved[order.order_id], **item)
+                    for _path, order, items in new
+                    for item in items
+                )
+            stats['imported'] += len(new)
+            stats['skipped'] += len(orders) - len(new)
+
+            if options['delete']:
+                for path, _order in orders:
+                    path.unlink(missing_ok=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{stats["imported"]} imported, {stats["skipped"]} already present, {stats["errors"]} errors'
+        ))
+
+    def load(self, path):
+        with open(path, encoding='utf-8') as handle:
+            data = json.load(handle)
+        order_id = str(data.get('order_id') or path.stem)
+        if not ORDER_ID_RE.match(order_id):
+            raise ValueError(f'некоректний номер замовлення: {order_id!r}')
+        items = [
+            {
+                'sku': str(item.get('sku', ''))[:50],
+                'name': (str(item.get('name', '')) or 'Товар')[:120],
+                'price': max(int(item.get('price') or 0), 0),
+                'qty': max(int(item.get('qty') or 1), 1),
+            }
+            for item in data.get('items', [])
+        ]
+        created_at = _timestamp(data.get('created_at')) or _timestamp(path.stat().st_mtime)
+        order = Order(
+            order_id=order_id,
+            status=data.get('status') if data.get('status') in dict(Order.STATUS_CHOICES) else Order.STATUS_NEW,
+            total=max(int(data.get('total') or 0), 0),
+            currency=str(data.get('currency') or 'UAH')[:3],
+            source=str(data.get('source') or 'site')[:50],
+            page=str(data.get('page') or '')[:500],
+            ts=int(data.get('ts') or 0),
+            created_at=created_at,
+            confirmed_at=_timestamp(data.get('confirmed_at')),
+        )
+        return order, items
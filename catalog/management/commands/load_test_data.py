@@ -1,40 +1,32 @@
 """
 Management command to load test data for the antidrone catalog.
+
+Without options it loads the curated demo catalog. With --products N it
+generates a scaled, optionally deeper (--depth) and reproducible (--seed)
+dataset for benchmarking, using bulk inserts and a per-tree MPTT rebuild.
 """
 
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal
-from django.core.management.base import BaseCommand
-from django.utils.text import slugify
-from catalog.models import Category, Product
-
-
-# Transliteration table for Ukrainian
-TRANSLIT_TABLE = {
-    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'h', 'ґ': 'g', 'д': 'd', 'е': 'e',
-    'є': 'ie', 'ж': 'zh', 'з': 'z', 'и': 'y', 'і': 'i', 'ї': 'i', 'й': 'i',
-    'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
-    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch',
-    'ш': 'sh', 'щ': 'shch', 'ь': '', 'ю': 'iu', 'я': 'ia',
-    'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'H', 'Ґ': 'G', 'Д': 'D', 'Е': 'E',
-    'Є': 'Ie', 'Ж': 'Zh', 'З': 'Z', 'И': 'Y', 'І': 'I', 'Ї': 'I', 'Й': 'I',
-    'К': 'K', 'Л': 'L', 'М': 'M', 'Н': 'N', 'О': 'O', 'П': 'P', 'Р': 'R',
-    'С': 'S', 'Т': 'T', 'У': 'U', 'Ф': 'F', 'Х': 'Kh', 'Ц': 'Ts', 'Ч': 'Ch',
-    'Ш': 'Sh', 'Щ': 'Shch', 'Ь': '', 'Ю': 'Iu', 'Я': 'Ia',
-}
-
 
-def transliterate(text):
-    """Transliterate Ukrainian text to Latin characters."""
-    result = []
-    for char in text:
-        result.append(TRANSLIT_TABLE.get(char, char))
-    return ''.join(result)
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from PIL import Image, ImageDraw
 
+from catalog.cache import bump_catalog_version
+from catalog.models import Category, Product, ProductImage
+from catalog.tree import batch_tree_updates
+from catalog.utils import batched, make_slug
 
-def make_slug(text):
-    """Create a slug from Ukrainian text."""
-    return slugify(transliterate(text))
+BATCH_SIZE = 1000
+# Children per category on each generated level below the curated subcategories
+BRANCHING = 3
+PLACEHOLDER_DIR = 'products/generated'
+PLACEHOLDER_SIZE = (400, 300)
 
 
 # Categories structure
@@ -596,41 +588,32 @@ GENERATED_META = {
 }
 
 
-def create_generated_products(category, target_count):
-    meta = GENERATED_META[category.slug]
+def build_generated_product(category, meta_key, index, width=2):
+    """Build (unsaved) generated product number `index` for a category."""
+    meta = GENERATED_META[meta_key]
     base_name = meta['base_name']
-    sku_prefix = meta['sku_prefix']
-    price_range = meta['price_range']
-    specs_builder = meta['specs']
-
-    for index in range(1, target_count + 1):
-        name = f"{base_name} {index:02d}"
-        price = Decimal(random.randint(*price_range))
-        old_price = None
-        if random.random() < 0.25:
-            discount_percent = random.randint(15, 30)
-            old_price = price * Decimal(100 + discount_percent) / Decimal(100)
-            old_price = old_price.quantize(Decimal('1'))
-
-        is_popular = random.random() < 0.3
-        is_new = random.random() < 0.25
-
-        Product.objects.create(
-            category=category,
-            name=name,
-            slug=f"{make_slug(base_name)}-{index:02d}",
-            sku=f"{sku_prefix}-{index:03d}",
-            description=f"{base_name} для тестування каталогу",
-            full_description=format_full_description(
-                f"{base_name} для тестування каталогу",
-                specs_builder()
-            ),
-            price=price,
-            old_price=old_price,
-            is_available=True,
-            is_popular=is_popular,
-            is_new=is_new,
-        )
+    price = Decimal(random.randint(*meta['price_range']))
+    old_price = None
+    if random.random() < 0.25:
+        discount_percent = random.randint(15, 30)
+        old_price = price * Decimal(100 + discount_percent) / Decimal(100)
+        old_price = old_price.quantize(Decimal('1'))
+
+    description = f"{base_name} для тестування каталогу"
+    return Product(
+        category=category,
+        name=f"{base_name} {index:0{width}d}",
+        slug=f"{make_slug(base_name)}-{index:0{width}d}",
+        sku=f"{meta['sku_prefix']}-{index:0{max(width, 3)}d}",
+        description=description,
+        full_description=format_full_description(description, meta['specs']()),
+        price=price,
+        old_price=old_price,
+        is_available=True,
+        is_popular=random.random() < 0.3,
+        is_new=random.random() < 0.25,
+    )
+
 
 def format_full_description(description, specs):
     """Format full product description with specifications."""
@@ -640,6 +623,18 @@ def format_full_description(description, specs):
     return '\n'.join(lines)
 
 
+def render_placeholder_image(task):
+    """Draw a placeholder product image (runs in a worker process)."""
+    path, label, color = task
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image = Image.new('RGB', PLACEHOLDER_SIZE, color)
+    draw = ImageDraw.Draw(image)
+    draw.text((20, PLACEHOLDER_SIZE[1] // 2), label, fill=(255, 255, 255))
+    image.save(path, 'JPEG', quality=70)
+
+
 class Command(BaseCommand):
     help = 'Load test data for the antidrone catalog'
 
@@ -649,16 +644,51 @@ class Command(BaseCommand):
             action='store_true',
             help='Only clear existing data without creating new',
         )
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=None,
+            help='Generate exactly N products spread over the leaf categories '
+                 '(default: the curated demo catalog)',
+        )
+        parser.add_argument(
+            '--depth',
+            type=int,
+            default=1,
+            help='Category levels below the root categories (default 1)',
+        )
+        parser.add_argument(
+            '--images-per-product',
+            type=int,
+            default=0,
+            help='Generate K placeholder images per product with Pillow',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed for a reproducible dataset',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Rows per bulk insert (default {BATCH_SIZE})',
+        )
 
     def handle(self, *args, **options):
         clear_only = options.get('clear', False)
+        self.batch_size = options['batch_size']
+        if options['seed'] is not None:
+            random.seed(options['seed'])
+        if options['depth'] < 1:
+            raise CommandError('--depth must be at least 1.')
 
         # Clear existing data
         self.stdout.write('Clearing existing data...')
-        Product.objects.all().delete()
-        self.stdout.write(self.style.WARNING('Deleted all products'))
-        Category.objects.all().delete()
-        self.stdout.write(self.style.WARNING('Deleted all categories'))
+        self.truncate_catalog()
+        bump_catalog_version()
+        self.stdout.write(self.style.WARNING('Deleted all products and categories'))
 
         if clear_only:
             self.stdout.write(self.style.SUCCESS('Data cleared successfully!'))
@@ -666,43 +696,105 @@ class Command(BaseCommand):
 
         # Create categories
         self.stdout.write('\nCreating categories...')
-        category_map = {}
+        with batch_tree_updates() as touch_tree:
+            category_map, meta_keys = self.create_categories(options['depth'], touch_tree)
+        for category in Category.objects.all():
+            category_map[category.slug] = category
 
-        for parent_name, parent_data in CATEGORIES.items():
-            parent_cat = Category.objects.create(
-                name=parent_name,
-                slug=parent_data['slug'],
-                description=parent_data['description'],
-                is_active=True,
-            )
-            self.stdout.write(self.style.SUCCESS(f'Created category: {parent_name}'))
-            category_map[parent_data['slug']] = parent_cat
+        if options['products'] is None:
+            self.create_demo_products(category_map)
+        else:
+            leaves = [cat for cat in category_map.values() if cat.rght - cat.lft == 1]
+            self.create_scaled_products(leaves, meta_keys, options['products'])
 
-            for child_data in parent_data['children']:
-                child_cat = Category.objects.create(
+        if options['images_per_product']:
+            self.create_images(options['images_per_product'])
+
+        bump_catalog_version()
+        self.stdout.write('')
+        total_categories = Category.objects.count()
+        total_products = Product.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully created {total_categories} categories and {total_products} products!'
+        ))
+
+    def truncate_catalog(self):
+        """Empty the catalog tables with the backend's flush SQL instead of a cascading delete."""
+        tables = [ProductImage._meta.db_table, Product._meta.db_table, Category._meta.db_table]
+        sql_list = connection.ops.sql_flush(no_style(), tables, reset_sequences=True)
+        with transaction.atomic():
+            connection.ops.execute_sql_flush(sql_list)
+
+    def create_categories(self, depth, touch_tree):
+        """
+        Insert the category tree level by level; each MPTT tree is marked with
+        ``touch_tree`` and rebuilt once when batch_tree_updates() exits.
+        """
+        category_map = {}
+        meta_keys = {}
+
+        def new_category(parent=None, **fields):
+            # tree_id is inherited from the root; lft/rght/level are filled in
+            # by the per-tree rebuild on exit from batch_tree_updates()
+            return Category(is_active=True, lft=0, rght=0, level=0, parent=parent,
+                            tree_id=parent.tree_id if parent else fields.pop('tree_id'), **fields)
+
+        roots = [
+            new_category(name=name, slug=data['slug'], description=data['description'],
+                         order=order, tree_id=order + 1)
+            for order, (name, data) in enumerate(CATEGORIES.items())
+        ]
+        Category.objects.bulk_create(roots)
+        level = []
+        for root, data in zip(roots, CATEGORIES.values()):
+            category_map[root.slug] = root
+            meta_keys[root.slug] = root.slug
+            self.stdout.write(self.style.SUCCESS(f'Created category: {root.name}'))
+            for order, child_data in enumerate(data['children']):
+                level.append(new_category(
                     name=child_data['name'],
                     slug=child_data['slug'],
                     description=child_data['description'],
-                    parent=parent_cat,
-                    is_active=True,
+                    parent=root,
+                    order=order,
+                ))
+
+        for current_depth in range(1, depth + 1):
+            Category.objects.bulk_create(level, batch_size=self.batch_size)
+            for category in level:
+                category_map[category.slug] = category
+                # Generated levels reuse the product templates of their curated ancestor
+                meta_keys[category.slug] = category.slug if current_depth == 1 else meta_keys[category.parent.slug]
+            self.stdout.write(self.style.SUCCESS(f'  Created {len(level)} categories on level {current_depth}'))
+            if current_depth == depth:
+                break
+            level = [
+                new_category(
+                    name=f'{parent.name} {index}',
+                    slug=f'{parent.slug}-{index}',
+                    description=parent.description,
+                    parent=parent,
+                    order=index,
                 )
-                category_map[child_data['slug']] = child_cat
-                self.stdout.write(self.style.SUCCESS(f'  Created subcategory: {child_data["name"]}'))
+                for parent in level
+                for index in range(1, BRANCHING + 1)
+            ]
 
-        # Rebuild MPTT tree
-        Category.objects.rebuild()
+        for root in roots:
+            touch_tree(root.tree_id)
+        return category_map, meta_keys
 
-        # Create products (static list)
+    def create_demo_products(self, category_map):
+        """Curated products plus generated ones up to GENERATED_TARGETS."""
         self.stdout.write('\nCreating products...')
-        product_count = 0
-
-        for category_slug, products in PRODUCTS.items():
+        products = []
+        for category_slug, products_data in PRODUCTS.items():
             category = category_map.get(category_slug)
             if not category:
                 self.stdout.write(self.style.ERROR(f'Category not found: {category_slug}'))
                 continue
 
-            for product_data in products:
+            for product_data in products_data:
                 price = Decimal(random.randint(*product_data['price_range']))
 
                 # Calculate old_price for some products (30% chance)
@@ -716,8 +808,7 @@ class Command(BaseCommand):
                 is_popular = product_data.get('is_popular', random.random() < 0.3)
                 is_new = product_data.get('is_new', random.random() < 0.2)
 
-                # Create product
-                product = Product.objects.create(
+                products.append(Product(
                     category=category,
                     name=product_data['name'],
                     slug=make_slug(product_data['name']),
@@ -732,8 +823,7 @@ class Command(BaseCommand):
                     is_available=True,
                     is_popular=is_popular,
                     is_new=is_new,
-                )
-                product_count += 1
+                ))
 
                 flags = []
                 if is_popular:
@@ -745,30 +835,74 @@ class Command(BaseCommand):
                 flags_str = f' [{", ".join(flags)}]' if flags else ''
 
                 self.stdout.write(
-                    self.style.SUCCESS(f'Created product: {product.name} - {price} грн{flags_str}')
+                    self.style.SUCCESS(f'Created product: {product_data["name"]} - {price} грн{flags_str}')
                 )
 
-        # Create generated products to hit target counts per category
+        # Generated products to hit target counts per category
         self.stdout.write('\nGenerating additional products...')
+        curated_counts = {slug: len(items) for slug, items in PRODUCTS.items()}
         for category_slug, target_total in GENERATED_TARGETS.items():
             category = category_map.get(category_slug)
             if not category:
                 self.stdout.write(self.style.ERROR(f'Category not found for generation: {category_slug}'))
                 continue
-            existing_count = Product.objects.filter(category=category).count()
-            to_create = max(target_total - existing_count, 0)
+            to_create = max(target_total - curated_counts.get(category_slug, 0), 0)
+            products.extend(
+                build_generated_product(category, category_slug, index)
+                for index in range(1, to_create + 1)
+            )
             if to_create:
-                create_generated_products(category, to_create)
-                product_count += to_create
                 self.stdout.write(
                     self.style.SUCCESS(
                         f'Generated {to_create} products for {category.name} (total {target_total})'
                     )
                 )
 
-        self.stdout.write('')
-        total_categories = Category.objects.count()
-        total_products = Product.objects.count()
-        self.stdout.write(self.style.SUCCESS(
-            f'Successfully created {total_categories} categories and {total_products} products!'
-        ))
+        with transaction.atomic():
+            Product.objects.bulk_create(products, batch_size=self.batch_size)
+
+    def create_scaled_products(self, leaves, meta_keys, total):
+        """Spread `total` generated products round-robin over the leaf categories."""
+        self.stdout.write(f'\nGenerating {total} products in {len(leaves)} leaf categories...')
+        width = len(str(total))
+
+        def products():
+            for index in range(1, total + 1):
+                category = leaves[(index - 1) % len(leaves)]
+                yield build_generated_product(category, meta_keys[category.slug], index, width)
+
+        created = 0
+        for batch in batched(products(), self.batch_size):
+            with transaction.atomic():
+                Product.objects.bulk_create(batch)
+            created += len(batch)
+            if created % (self.batch_size * 20) == 0 or created == total:
+                self.stdout.write(f'  {created}/{total}')
+
+    def create_images(self, per_product):
+        """Render placeholder images in a process pool and attach them in bulk."""
+        self.stdout.write(f'\nGenerating {per_product} image(s) per product...')
+        media_root = str(settings.MEDIA_ROOT)
+        rows = Product.objects.order_by('pk').values_list('pk', 'sku').iterator(chunk_size=self.batch_size)
+
+        created = 0
+        with ProcessPoolExecutor() as pool:
+            for batch in batched(rows, self.batch_size):
+                images = []
+                tasks = []
+                for pk, sku in batch:
+                    for position in range(per_product):
+                        name = f'{PLACEHOLDER_DIR}/{sku.lower()}-{position + 1}.jpg'
+                        color = tuple(random.randint(40, 200) for _ in range(3))
+                        tasks.append((os.path.join(media_root, name), f'{sku} #{position + 1}', color))
+                        images.append(ProductImage(
+                            product_id=pk,
+                            image=name,
+                            order=position,
+                            is_main=position == 0,
+                        ))
+                list(pool.map(render_placeholder_image, tasks, chunksize=64))
+                with transaction.atomic():
+                    ProductImage.objects.bulk_create(images)
+                created += len(images)
+        self.stdout.write(self.style.SUCCESS(f'Created {created} product images'))
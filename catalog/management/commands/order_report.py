@@ -0,0 +1,77 @@
+"""
+Management command for order analytics and accounting exports.
+
+Summary of a period (default: the last 30 days, today included):
+    python manage.py order_report --from 2026-01-01 --to 2026-01-31 --top 20
+
+Export for accounting, one CSV row per order line or one JSON line per order:
+    python manage.py order_report --from 2026-01-01 --to 2026-01-31 --format csv --output january.csv
+
+Orders are streamed from the configured order store (see catalog.order_report).
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from catalog.order_report import EXPORT_FORMATS, build_report, export_lines
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError as exc:
+        raise CommandError(f'Invalid date {value!r}, expected YYYY-MM-DD') from exc
+
+
+class Command(BaseCommand):
+    help = 'Order revenue / top SKUs / status report, or CSV/JSONL export for accounting'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day, YYYY-MM-DD (default: 30 days ago)')
+        parser.add_argument('--to', dest='date_to', help='Last day, YYYY-MM-DD (default: today)')
+        parser.add_argument('--top', type=int, default=10, help='Number of top SKUs')
+        parser.add_argument('--format', default='text', help='text (summary), ' + ', '.join(EXPORT_FORMATS))
+        parser.add_argument('--output', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        date_to = _date(options['date_to']) if options['date_to'] else timezone.localdate()
+        date_from = _date(options['date_from']) if options['date_from'] else date_to - timedelta(days=29)
+        if date_from > date_to:
+            raise CommandError('--from must not be after --to')
+        if options['format'] not in ['text', *EXPORT_FORMATS]:
+            raise CommandError(f'Unknown format: {options["format"]}')
+
+        if options['format'] == 'text':
+            lines = self.summary(build_report(date_from, date_to, options['top']))
+        else:
+            lines = export_lines(options['format'], date_from, date_to)
+
+        if options['output']:
+            count = 0
+            with open(options['output'], 'w', encoding='utf-8', newline='') as handle:
+                for line in lines:
+                    handle.write(line)
+                    count += 1
+            self.stdout.write(self.style.SUCCESS(f'Wrote {count} lines to {options["output"]}'))
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
+
+    def summary(self, report):
+        yield f'Orders {report["from"]} .. {report["to"]}\n'
+        yield '\nRevenue by day:\n'
+        for row in report['days']:
+            yield f'  {row["date"]}  {row["orders"]:>5} orders  {row["items"]:>6} items  {row["revenue"]:>12} {row["currency"]}\n'
+        yield '\nTotals:\n'
+        for row in report['currencies']:
+            yield (f'  {row["currency"]}  {row["orders"]} orders, revenue {row["revenue"]}, '
+                   f'average basket {row["average_basket"]}\n')
+        yield '\nTop SKUs:\n'
+        for row in report['top_skus']:
+            yield f'  {row["sku"]:<24} {row["qty"]:>6} pcs  {row["revenue"]:>12}  {row["name"]}\n'
+        yield '\nFunnel:\n'
+        for row in report['funnel']:
+            yield f'  {row["status"]:<10} {row["orders"]}\n'
+        yield f'  cancelled  {report["statuses"].get("cancelled", 0)}\n'
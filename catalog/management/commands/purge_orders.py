@@ -0,0 +1,42 @@
+"""
+Management command to delete orders older than ORDER_TTL_HOURS.
+
+The API already ignores expired orders (a created_at check after the
+order_id lookup), so expiry costs nothing per request; this command removes
+them from the configured order store. The database backend walks the
+created_at index oldest first and deletes in small batches, each in its own
+transaction, so it never holds long locks; the file backend goes by file
+mtime; the events backend compacts its log into a new snapshot without the
+expired orders. Schedule it from cron, e.g. hourly:
+    0 * * * * python manage.py purge_orders
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from catalog.order_store import build_order_store, get_order_store
+
+
+class Command(BaseCommand):
+    help = 'Delete expired orders (older than ORDER_TTL_HOURS) in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=float, default=settings.ORDER_TTL_HOURS,
+                            help='Age in hours (default: ORDER_TTL_HOURS)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Orders deleted per transaction (database backend)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count expired orders')
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - max(options['older_than'], 1) * 3600
+        if settings.ORDER_STORE == 'database':
+            store = build_order_store('database', batch_size=options['batch_size'])
+        else:
+            store = get_order_store()
+        count = store.purge(cutoff, dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{count} expired orders would be deleted')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired orders'))
@@ -0,0 +1,32 @@
+"""
+Management command to move an order through its statuses.
+
+Goes through OrderStore.transition(), so the same rules apply as in the API
+(new -> confirmed -> paid -> shipped, cancellable until shipped):
+    python manage.py set_order_status abc123def4 paid
+    python manage.py set_order_status abc123def4 shipped --ttn 20450000000000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.order_store import TRANSITIONS, OrderStoreError, get_order_store
+
+
+class Command(BaseCommand):
+    help = 'Change the status of an order (confirmed/paid/shipped/cancelled)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('order_id')
+        parser.add_argument('status', choices=sorted(TRANSITIONS))
+        parser.add_argument('--ttn', default='', help='Nova Poshta waybill number (for shipped)')
+
+    def handle(self, *args, **options):
+        if options['status'] == 'shipped' and not options['ttn']:
+            raise CommandError('--ttn is required for shipped orders')
+        try:
+            order = get_order_store().transition(options['order_id'], options['status'], ttn=options['ttn'])
+        except OrderStoreError as exc:
+            raise CommandError(str(exc)) from exc
+        if order is None:
+            raise CommandError(f'Order {options["order_id"]} not found')
+        self.stdout.write(self.style.SUCCESS(f'Order {order["order_id"]}: {order["status"]}'))
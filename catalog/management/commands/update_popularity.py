@@ -0,0 +1,41 @@
+"""
+Management command to flush product view counters and re-rank popularity.
+
+Schedule it from cron, e.g. every 5 minutes for counters and hourly for
+the full run:
+    */5 * * * * python manage.py update_popularity --flush-only
+    0 * * * *   python manage.py update_popularity
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.popularity import decay_scores, flush_views, rank_popular, shared_cache
+
+
+class Command(BaseCommand):
+    help = 'Flush cached product view counters to the DB, decay scores and update is_popular'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flush-only', action='store_true', help='Only move pending views to the DB')
+        parser.add_argument('--half-life', type=float, default=settings.POPULARITY_HALF_LIFE_HOURS,
+                            help='Score half-life in hours (0 disables decay)')
+        parser.add_argument('--top', type=int, default=settings.POPULAR_PRODUCTS_COUNT,
+                            help='How many products to mark as popular')
+
+    def handle(self, *args, **options):
+        if not shared_cache():
+            raise CommandError(
+                'The default cache is local to each process, so the view counters of the web '
+                'workers are not visible here. Set CACHE_BACKEND to a shared cache (e.g. Redis).'
+            )
+        flushed = flush_views()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} product views'))
+        if options['flush_only']:
+            return
+
+        factor = decay_scores(options['half_life'])
+        changed = rank_popular(options['top'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Scores decayed by x{factor:.4f}; is_popular changed for {changed} products'
+        ))
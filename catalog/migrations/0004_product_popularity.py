@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_product_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='popularity_score',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Рейтинг популярності'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Перегляди'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(max_length=12, unique=True, verbose_name='Номер')),
+                ('status', models.CharField(choices=[('new', 'Нове'), ('confirmed', 'Підтверджене')], db_index=True, default='new', max_length=20, verbose_name='Статус')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Сума')),
+                ('currency', models.CharField(default='UAH', max_length=3, verbose_name='Валюта')),
+                ('source', models.CharField(default='site', max_length=50, verbose_name='Джерело')),
+                ('page', models.CharField(blank=True, max_length=500, verbose_name='Сторінка')),
+                ('ts', models.BigIntegerField(default=0, verbose_name='Час клієнта')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Створено')),
+                ('confirmed_at', models.DateTimeField(blank=True, null=True, verbose_name='Підтверджено')),
+            ],
+            options={
+                'verbose_name': 'Замовлення',
+                'verbose_name_plural': 'Замовлення',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(blank=True, max_length=50, verbose_name='Артикул')),
+                ('name', models.CharField(max_length=120, verbose_name='Назва')),
+                ('price', models.PositiveIntegerField(default=0, verbose_name='Ціна')),
+                ('qty', models.PositiveIntegerField(verbose_name='Кількість')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='catalog.order', verbose_name='Замовлення')),
+            ],
+            options={
+                'verbose_name': 'Позиція замовлення',
+                'verbose_name_plural': 'Позиції замовлення',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='ttn',
+            field=models.CharField(blank=True, max_length=50, verbose_name='ТТН'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('new', 'Нове'), ('confirmed', 'Підтверджене'), ('paid', 'Оплачене'), ('shipped', 'Відправлене'), ('cancelled', 'Скасоване')], db_index=True, default='new', max_length=20, verbose_name='Статус'),
+        ),
+    ]
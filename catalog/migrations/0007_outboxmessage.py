@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_order_status_ttn'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(max_length=12, unique=True, verbose_name='Номер замовлення')),
+                ('payload', models.TextField(verbose_name='Повідомлення')),
+                ('rejected', models.BooleanField(default=False, verbose_name='Відхилено ботом')),
+            ],
+            options={
+                'verbose_name': 'Повідомлення для бота',
+                'verbose_name_plural': 'Повідомлення для бота',
+                'ordering': ['order_id'],
+            },
+        ),
+    ]
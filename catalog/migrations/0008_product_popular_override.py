@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='popular_override',
+            field=models.BooleanField(blank=True, help_text='Порожньо — «Популярний» визначається переглядами; так/ні — закріплено вручну.', null=True, verbose_name='Популярний вручну'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from mptt.models import MPTTModel, TreeForeignKey
 
 
@@ -43,16 +44,24 @@ class Product(models.Model):
         related_name='products',
         verbose_name='Категорія'
     )
-    name = models.CharField('Назва', max_length=200)
+    name = models.CharField('Назва', max_length=200, db_index=True)
     slug = models.SlugField('URL', max_length=200, unique=True)
-    sku = models.CharField('Артикул', max_length=50, blank=True)
+    sku = models.CharField('Артикул', max_length=50, blank=True, db_index=True)
     description = models.TextField('Короткий опис', blank=True)
     full_description = models.TextField('Повний опис', blank=True)
     price = models.DecimalField('Ціна', max_digits=10, decimal_places=2, null=True, blank=True)
     old_price = models.DecimalField('Стара ціна', max_digits=10, decimal_places=2, null=True, blank=True)
     is_available = models.BooleanField('В наявності', default=True)
     is_popular = models.BooleanField('Популярний', default=False)
+    # Set by the admin/bulk_products flag changes; update_popularity only ranks products without it
+    popular_override = models.BooleanField(
+        'Популярний вручну', null=True, blank=True,
+        help_text='Порожньо — «Популярний» визначається переглядами; так/ні — закріплено вручну.',
+    )
     is_new = models.BooleanField('Новинка', default=False)
+    # Filled by the update_popularity command from cached page view counters
+    view_count = models.PositiveIntegerField('Перегляди', default=0, editable=False)
+    popularity_score = models.FloatField('Рейтинг популярності', default=0, db_index=True, editable=False)
     created_at = models.DateTimeField('Створено', auto_now_add=True)
     updated_at = models.DateTimeField('Оновлено', auto_now=True)
 
@@ -98,3 +107,95 @@ class ProductImage(models.Model):
 
     def __str__(self):
         return f'Зображення {self.product.name}'
+
+
+class Order(models.Model):
+    """Order placed from the cart and handed over to the Telegram bot."""
+
+    STATUS_NEW = 'new'
+    STATUS_CONFIRMED = 'confirmed'
+    STATUS_PAID = 'paid'
+    STATUS_SHIPPED = 'shipped'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_NEW, 'Нове'),
+        (STATUS_CONFIRMED, 'Підтверджене'),
+        (STATUS_PAID, 'Оплачене'),
+        (STATUS_SHIPPED, 'Відправлене'),
+        (STATUS_CANCELLED, 'Скасоване'),
+    ]
+
+    order_id = models.CharField('Номер', max_length=12, unique=True)
+    status = models.CharField('Статус', max_length=20, choices=STATUS_CHOICES, default=STATUS_NEW, db_index=True)
+    total = models.PositiveIntegerField('Сума', default=0)
+    currency = models.CharField('Валюта', max_length=3, default='UAH')
+    source = models.CharField('Джерело', max_length=50, default='site')
+    page = models.CharField('Сторінка', max_length=500, blank=True)
+    # Client-side timestamp (ms) sent by cart.js
+    ts = models.BigIntegerField('Час клієнта', default=0)
+    created_at = models.DateTimeField('Створено', default=timezone.now, db_index=True)
+    confirmed_at = models.DateTimeField('Підтверджено', null=True, blank=True)
+    # Nova Poshta waybill number, set when the order is shipped
+    ttn = models.CharField('ТТН', max_length=50, blank=True)
+
+    class Meta:
+        verbose_name = 'Замовлення'
+        verbose_name_plural = 'Замовлення'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.order_id
+
+    def to_dict(self):
+        """Payload of the order API (items must be prefetched to avoid a query)."""
+        return {
+            'order_id': self.order_id,
+            'items': [item.to_dict() for item in self.items.all()],
+            'total': self.total,
+            'currency': self.currency,
+            'ts': self.ts,
+            'source': self.source,
+        }
+
+
+class OrderItem(models.Model):
+    """Cart line as submitted; name and price are a snapshot at order time."""
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name='Замовлення'
+    )
+    sku = models.CharField('Артикул', max_length=50, blank=True)
+    name = models.CharField('Назва', max_length=120)
+    price = models.PositiveIntegerField('Ціна', default=0)
+    qty = models.PositiveIntegerField('Кількість')
+
+    class Meta:
+        verbose_name = 'Позиція замовлення'
+        verbose_name_plural = 'Позиції замовлення'
+        ordering = ['id']
+
+    def __str__(self):
+        return f'{self.name} × {self.qty}'
+
+    def to_dict(self):
+        return {'sku': self.sku, 'name': self.name, 'price': self.price, 'qty': self.qty}
+
+
+class OutboxMessage(models.Model):
+    """New order waiting to be pushed to the Telegram bot (see catalog.outbox)."""
+
+    order_id = models.CharField('Номер замовлення', max_length=12, unique=True)
+    payload = models.TextField('Повідомлення')
+    # Answered 4xx by the bot: kept for inspection, no longer sent
+    rejected = models.BooleanField('Відхилено ботом', default=False)
+
+    class Meta:
+        verbose_name = 'Повідомлення для бота'
+        verbose_name_plural = 'Повідомлення для бота'
+        ordering = ['order_id']
+
+    def __str__(self):
+        return self.order_id
@@ -0,0 +1,406 @@
+"""
+Event-sourced order store (ORDER_STORE = 'events').
+
+Orders are never rewritten: creating an order and every status change
+(confirmed, paid, shipped with its TTN, cancelled) is one JSON line
+appended to ``<ORDER_EVENT_DIR>/events-<segment>.jsonl``, so a status
+change costs a single O_APPEND write however large the order is.
+
+Durability is group-committed: a writer thread appends its line and waits
+for the next fsync, which a background flusher issues for all lines written
+in the meantime, at most once per ORDER_EVENT_FSYNC_MS. With the setting at
+0 every append is fsynced on its own.
+
+Each worker keeps a materialized view (order_id -> order dict) in memory.
+It is built from the last snapshot plus the log after the snapshot's
+checkpoint, and before every read it replays only the bytes other workers
+appended since (one stat() when nothing changed). Events that are not a
+valid transition at replay time, and a second "created" event for an id,
+are ignored, so the log order decides races between workers the same way
+everywhere. A writer that died mid-append leaves a line without its
+newline; the next append terminates it first, so it is skipped on replay
+instead of swallowing the next event.
+
+compact() (run by purge_orders) seals the current segment, folds the
+sealed segments into ``snapshot.json`` (dropping expired orders), then
+deletes them; workers whose segment disappeared reload from the snapshot.
+"""
+import copy
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from . import order_notify, outbox
+from .order_store import (
+    CREATE_ATTEMPTS,
+    TRANSITIONS,
+    InvalidTransition,
+    OrderStore,
+    OrderStoreError,
+    check_transition,
+    id_range,
+    new_order_id,
+    order_id_time,
+)
+
+SEGMENT_RE = re.compile(r'^events-(\d{6})\.jsonl$')
+SNAPSHOT_NAME = 'snapshot.json'
+COMPACT_LOCK_NAME = '.compact.lock'
+
+
+def parse_events(lines):
+    """Decode log lines, skipping one left torn by a writer that crashed mid-append."""
+    for line in lines:
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def apply_event(orders: dict, event: dict) -> bool:
+    """
+    Fold one event into the ``orders`` view. Invalid transitions and a
+    second "created" event for an existing order id are skipped (False).
+    """
+    order_id, status, at = event['order_id'], event['type'], event['at']
+    if status == 'created':
+        if order_id in orders:
+            return False
+        orders[order_id] = {
+            **event['order'],
+            'order_id': order_id,
+            'status': 'new',
+            'created_at': at,
+            'confirmed_at': None,
+            'history': [{'status': 'new', 'at': at}],
+        }
+        return True
+    order = orders.get(order_id)
+    if order is None or status not in TRANSITIONS or order['status'] not in TRANSITIONS[status]:
+        return False
+    order['status'] = status
+    order[f'{status}_at'] = at
+    if event.get('ttn'):
+        order['ttn'] = event['ttn']
+    order['history'].append({'status': status, 'at': at})
+    return True
+
+
+class EventLog:
+    """Segmented append-only JSONL log with group-committed fsync."""
+
+    def __init__(self, root, fsync_interval=0.01):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._fd = None
+        self._segment = max(self.segments(), default=1)
+        self._written = 0
+        self._flushed = 0
+        self._flusher = None
+        self._fsync_error = None
+
+    def segment_path(self, segment) -> Path:
+        return self.root / f'events-{segment:06d}.jsonl'
+
+    def segments(self):
+        return sorted(
+            int(match.group(1))
+            for match in map(SEGMENT_RE.match, os.listdir(self.root)) if match
+        )
+
+    def append(self, event: dict) -> None:
+        """Append one event; returns once it is on disk."""
+        line = (json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock:
+            try:
+                self._write(line)
+                if not self.fsync_interval:
+                    os.fsync(self._fd)
+                    return
+            except OSError as exc:
+                raise OrderStoreError('Не вдалося записати подію замовлення.') from exc
+            self._written += 1
+            ticket = self._written
+            self._start_flusher()
+            self._synced.notify_all()
+            while self._flushed < ticket:
+                self._synced.wait()
+            if self._fsync_error is not None:
+                raise OrderStoreError('Не вдалося записати подію замовлення.') from self._fsync_error
+
+    def _write(self, line):
+        while True:
+            if self._fd is None:
+                self._fd = self._open_segment()
+            # The segment lock orders us against compact() sealing the segment;
+            # a segment that is gone was sealed and compacted since our last append
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if self.segment_path(self._segment).exists() and not self.segment_path(self._segment + 1).exists():
+                    self._terminate_torn_line()
+                    os.write(self._fd, line)
+                    return
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            # Lines already written to the sealed segment still need their fsync
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            self._segment += 1
+
+    def _terminate_torn_line(self):
+        """
+        End a line left without its newline by a writer that died mid-append
+        (checked under the segment lock, so no live writer is mid-line). Our
+        line would otherwise be glued to it and both lost to parse_events().
+        """
+        size = os.fstat(self._fd).st_size
+        if size and os.pread(self._fd, 1, size - 1) != b'\n':
+            os.write(self._fd, b'\n')
+
+    def _open_segment(self):
+        segments = self.segments()
+        if not segments:
+            return os.open(self.segment_path(self._segment), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        # Never O_CREAT an existing log: that could resurrect a compacted segment
+        self._segment = max(self._segment, segments[-1])
+        return os.open(self.segment_path(self._segment), os.O_RDWR | os.O_APPEND)
+
+    def _start_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, name='order-event-fsync', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        last_fsync = 0.0
+        while True:
+            with self._lock:
+                while self._flushed >= self._written:
+                    self._synced.wait()
+            # Appends arriving while the previous fsync ran (or within the
+            # window after it) share the next one
+            time.sleep(max(0.0, last_fsync + self.fsync_interval - time.monotonic()))
+            last_fsync = time.monotonic()
+            with self._lock:
+                target = self._written
+                fd = os.dup(self._fd)
+            error = None
+            try:
+                os.fsync(fd)
+            except OSError as exc:
+                error = exc
+            finally:
+                os.close(fd)
+            with self._lock:
+                self._flushed = target
+                self._fsync_error = error
+                self._synced.notify_all()
+
+    def read_from(self, segment, offset):
+        """
+        Complete lines after (segment, offset), following into newer segments.
+
+        Returns ``(events, segment, offset)`` with the position after the
+        last line read; raises FileNotFoundError if ``segment`` was compacted away.
+        """
+        events = []
+        while True:
+            path = self.segment_path(segment)
+            sealed = self.segment_path(segment + 1).exists()
+            if os.stat(path).st_size > offset:
+                with open(path, 'rb') as handle:
+                    handle.seek(offset)
+                    data = handle.read()
+                end = data.rfind(b'\n') + 1
+                events.extend(parse_events(data[:end].splitlines()))
+                offset += end
+            if not sealed:
+                return events, segment, offset
+            segment, offset = segment + 1, 0
+
+    def seal(self) -> int:
+        """Start a new segment; returns the last sealed one."""
+        current = max(self.segments(), default=1)
+        fd = os.open(self.segment_path(current), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.close(os.open(self.segment_path(current + 1), os.O_WRONLY | os.O_CREAT, 0o644))
+        finally:
+            os.close(fd)
+        return current
+
+
+class EventLogOrderStore(OrderStore):
+    """OrderStore over an EventLog with an in-memory view per process."""
+
+    def __init__(self, root, fsync_interval=0.01):
+        self.log = EventLog(root, fsync_interval)
+        self._view_lock = threading.Lock()
+        # order_id -> nonce of the "created" event that won, for our creates in flight
+        self._creating = {}
+        self._load_snapshot()
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.log.root / SNAPSHOT_NAME
+
+    def _read_snapshot(self):
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return {'segment': min(self.log.segments(), default=1), 'offset': 0, 'orders': {}}
+        except (OSError, ValueError) as exc:
+            raise OrderStoreError('Не вдалося прочитати знімок замовлень.') from exc
+
+    def _load_snapshot(self):
+        snapshot = self._read_snapshot()
+        self._orders = snapshot['orders']
+        self._position = (snapshot['segment'], snapshot['offset'])
+
+    def _catch_up(self):
+        with self._view_lock:
+            for _ in range(CREATE_ATTEMPTS):
+                try:
+                    events, *self._position = self.log.read_from(*self._position)
+                except FileNotFoundError:
+                    if not self.log.segment_path(self._position[0]).exists() and self.snapshot_path.exists():
+                        # Compacted away under us
+                        self._load_snapshot()
+                        continue
+                    return
+                except (OSError, ValueError) as exc:
+                    raise OrderStoreError('Не вдалося прочитати журнал замовлень.') from exc
+                for event in events:
+                    if apply_event(self._orders, event) and event['order_id'] in self._creating:
+                        self._creating[event['order_id']] = event.get('nonce')
+                return
+
+    def _append(self, event):
+        self.log.append({**event, 'at': int(time.time())})
+        self._catch_up()
+
+    def create(self, order, notify_bot=False):
+        """
+        Another worker may pick the same id before our view has its event:
+        the first "created" line in the log wins, and the loser retries with
+        a new id. The bot's message is spooled before the event is appended
+        and dropped again if the append fails or loses.
+        """
+        self._catch_up()
+        for _ in range(CREATE_ATTEMPTS):
+            order_id = new_order_id()
+            nonce = os.urandom(8).hex()
+            with self._view_lock:
+                if order_id in self._orders or order_id in self._creating:
+                    continue
+                self._creating[order_id] = None
+            try:
+                if notify_bot:
+                    try:
+                        outbox.enqueue({**order, 'order_id': order_id})
+                    except OSError as exc:
+                        raise OrderStoreError('Не вдалося створити замовлення.') from exc
+                self._append({'type': 'created', 'order_id': order_id, 'nonce': nonce, 'order': order})
+            finally:
+                with self._view_lock:
+                    won = self._creating.pop(order_id) == nonce
+                if notify_bot and not won:
+                    outbox.discard(order_id)
+            if won:
+                return self.get(order_id)
+        raise OrderStoreError('Не вдалося підібрати вільний номер замовлення.')
+
+    def get(self, order_id):
+        self._catch_up()
+        order = self._orders.get(order_id)
+        return copy.deepcopy(order) if order else None
+
+    def update(self, order_id, **fields):
+        """Only status changes can be recorded; they go through transition()."""
+        status = fields.pop('status', None)
+        if status is None:
+            raise OrderStoreError('Журнал подій зберігає лише зміни статусу.')
+        return self.transition(order_id, status, **fields)
+
+    def transition(self, order_id, status, **data):
+        order = self.get(order_id)
+        if order is None or not check_transition(order['status'], status):
+            return order
+        event = {'type': status, 'order_id': order_id}
+        if data.get('ttn'):
+            event['ttn'] = str(data['ttn'])[:50]
+        self._append(event)
+        order = self.get(order_id)
+        if order['status'] != status:
+            # Another worker's event landed first and made ours invalid
+            raise InvalidTransition(f'Статус замовлення вже змінено на «{order["status"]}».')
+        order_notify.publish(order_id, status)
+        return order
+
+    def created_between(self, start, end=None):
+        """Time-prefixed ids by id range, legacy ids by created_at."""
+        low, high = id_range(start, end)
+        self._catch_up()
+        order_ids = sorted(
+            (order['created_at'], order_id) for order_id, order in list(self._orders.items())
+            if (low <= order_id < high if order_id_time(order_id) is not None
+                else start <= order['created_at'] and (end is None or order['created_at'] < end))
+        )
+        for _created_at, order_id in order_ids:
+            order = self.get(order_id)
+            if order is not None:
+                yield order
+
+    def purge(self, created_before, dry_run=False):
+        if dry_run:
+            self._catch_up()
+            return sum(1 for order in self._orders.values() if order['created_at'] < created_before)
+        return self.compact(created_before)
+
+    def compact(self, created_before=None) -> int:
+        """
+        Fold the log into a new snapshot, dropping orders created before
+        ``created_before``; returns the number dropped.
+        """
+        with open(self.log.root / COMPACT_LOCK_NAME, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            sealed = self.log.seal()
+            snapshot = self._read_snapshot()
+            orders = snapshot['orders']
+            for segment in range(snapshot['segment'], sealed + 1):
+                path = self.log.segment_path(segment)
+                if not path.exists():
+                    continue
+                with open(path, 'rb') as handle:
+                    if segment == snapshot['segment']:
+                        handle.seek(snapshot['offset'])
+                    # Sealed segments end with a complete line unless a writer crashed
+                    for event in parse_events(line for line in handle if line.endswith(b'\n')):
+                        apply_event(orders, event)
+            dropped = 0
+            if created_before is not None:
+                expired = [order_id for order_id, order in orders.items() if order['created_at'] < created_before]
+                for order_id in expired:
+                    del orders[order_id]
+                dropped = len(expired)
+
+            tmp_path = self.snapshot_path.with_name(f'.{SNAPSHOT_NAME}.{os.getpid()}.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as handle:
+                json.dump({'segment': sealed + 1, 'offset': 0, 'orders': orders},
+                          handle, ensure_ascii=False, separators=(',', ':'))
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            for segment in self.log.segments():
+                if segment <= sealed:
+                    self.log.segment_path(segment).unlink(missing_ok=True)
+        self._load_snapshot()
+        return dropped
@@ -0,0 +1,197 @@
+"""
+Order status notifications for /api/order/<id>/events.
+
+Every status change made through the order store (and in the admin) is
+published here. Subscribers in the same process are woken directly. So
+that a change made by another worker, the bot (ORDER_SOURCE=store) or
+set_order_status reaches them too, the change is also appended as one line
+to ORDER_NOTIFY_FILE. While a process has subscribers, one watcher thread
+stat()s that file every ORDER_NOTIFY_INTERVAL_MS and dispatches the lines
+other processes appended. Waiting clients never touch the order store;
+they re-read the order once when woken. Each process serves at most
+ORDER_EVENTS_MAX_SUBSCRIBERS waiting clients at a time.
+
+The file is truncated once it exceeds MAX_BYTES. A watcher that misses
+lines across a truncation only delays its clients until their next
+reconnect, which re-reads the order.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = 1024 * 1024
+
+
+class TooManySubscribers(Exception):
+    """The process already serves ORDER_EVENTS_MAX_SUBSCRIBERS waiting clients."""
+
+
+class OrderNotifier:
+    """Per-process pub/sub of order status changes, backed by a shared file."""
+
+    def __init__(self, path, interval=0.2, max_subscribers=None):
+        self.path = str(path)
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._active = threading.Condition(self._lock)
+        self._offset = 0
+        self._thread = None
+        self._tag = f'{os.getpid()}:{id(self)}'
+
+    def publish(self, order_id, status):
+        """Wake local subscribers now and other processes' through the file."""
+        self._dispatch(order_id, status)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.fstat(fd).st_size > MAX_BYTES:
+                    os.ftruncate(fd, 0)
+                os.write(fd, f'{order_id} {status} {self._tag}\n'.encode('ascii'))
+            finally:
+                os.close(fd)
+        except OSError:
+            # Local subscribers were woken; others catch up on reconnect
+            logger.exception('Could not publish the status of order %s', order_id)
+
+    def is_full(self) -> bool:
+        return self.max_subscribers is not None and self._count >= self.max_subscribers
+
+    def subscribe(self, order_id, callback):
+        """
+        Call ``callback(status)`` (from any thread) on every change of the
+        order; raises TooManySubscribers over ``max_subscribers``.
+        """
+        with self._lock:
+            if self.is_full():
+                raise TooManySubscribers(f'{self._count} clients already wait for order changes')
+            self._count += 1
+            if not self._subscribers:
+                # Only changes from now on matter to the new subscribers
+                self._offset = self._size()
+                self._active.notify()
+            self._subscribers.setdefault(order_id, set()).add(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name='order-notify', daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, order_id, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(order_id, set())
+            if callback in callbacks:
+                callbacks.discard(callback)
+                self._count -= 1
+            if not callbacks:
+                self._subscribers.pop(order_id, None)
+
+    def _dispatch(self, order_id, status):
+        with self._lock:
+            callbacks = list(self._subscribers.get(order_id, ()))
+        for callback in callbacks:
+            callback(status)
+
+    def _size(self):
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _watch(self):
+        while True:
+            with self._lock:
+                while not self._subscribers:
+                    self._active.wait()
+            time.sleep(self.interval)
+            size = self._size()
+            if size < self._offset:
+                # Truncated by a publisher
+                self._offset = 0
+            if size == self._offset:
+                continue
+            try:
+                with open(self.path, 'rb') as handle:
+                    handle.seek(self._offset)
+                    data = handle.read(size - self._offset)
+            except OSError:
+                continue
+            # Keep a partially written last line for the next round
+            complete = data[:data.rfind(b'\n') + 1]
+            self._offset += len(complete)
+            for line in complete.decode('ascii', 'replace').splitlines():
+                parts = line.split()
+                if len(parts) == 3 and parts[2] != self._tag:
+                    self._dispatch(parts[0], parts[1])
+
+
+class Subscription:
+    """
+    Changes of one order for a single waiting request::
+
+        with Subscription(order_id) as subscription:
+            order = store.get(order_id)   # read after subscribing
+            subscription.wait(timeout)    # or: await subscription.await_change(timeout)
+
+    Async views create it inside the event loop.
+    """
+
+    def __init__(self, order_id, notifier=None):
+        self.order_id = order_id
+        self.notifier = notifier or get_notifier()
+        self._event = threading.Event()
+        try:
+            self._loop = asyncio.get_running_loop()
+            self._async_event = asyncio.Event()
+        except RuntimeError:
+            self._loop = None
+
+    def _notify(self, status):
+        self._event.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._async_event.set)
+
+    def __enter__(self):
+        self.notifier.subscribe(self.order_id, self._notify)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.notifier.unsubscribe(self.order_id, self._notify)
+
+    def wait(self, timeout) -> bool:
+        """Block until the order changes; False on timeout."""
+        changed = self._event.wait(timeout)
+        self._event.clear()
+        return changed
+
+    async def await_change(self, timeout) -> bool:
+        try:
+            await asyncio.wait_for(self._async_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._async_event.clear()
+        self._event.clear()
+        return True
+
+
+@lru_cache(maxsize=None)
+def get_notifier() -> OrderNotifier:
+    return OrderNotifier(
+        settings.ORDER_NOTIFY_FILE,
+        settings.ORDER_NOTIFY_INTERVAL_MS / 1000,
+        settings.ORDER_EVENTS_MAX_SUBSCRIBERS or None,
+    )
+
+
+def publish(order_id, status):
+    get_notifier().publish(order_id, status)
@@ -0,0 +1,156 @@
+"""
+Order analytics and accounting export.
+
+Reports stream over OrderStore.created_between(), i.e. the orders created in
+the period (an index scan of created_at for the database store, including
+orders with legacy random ids), and fold each order into running aggregates
+as it arrives. Memory is bounded by the number of days and
+distinct SKUs, never by the number of orders:
+
+* revenue, orders and items per day and currency (cancelled orders excluded);
+* average basket per currency;
+* top-N SKUs by quantity (heapq.nlargest over the per-SKU totals);
+* order counts per status and the new -> confirmed -> paid -> shipped funnel.
+
+Finished reports are cached for ORDER_REPORT_CACHE_TIMEOUT seconds. Exports
+write one CSV row per order line or one JSON line per order.
+"""
+import csv
+import heapq
+import json
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .order_store import get_order_store
+
+FUNNEL = ['new', 'confirmed', 'paid', 'shipped']
+EXPORT_FIELDS = [
+    'order_id', 'created_at', 'status', 'currency', 'sku', 'name', 'price', 'qty',
+    'line_total', 'order_total', 'ttn',
+]
+EXPORT_FORMATS = ['csv', 'jsonl']
+
+
+def period_bounds(date_from, date_to):
+    """Unix time range [start, end) covering the local calendar days date_from..date_to."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(date_from, dt_time.min), tz)
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), dt_time.min), tz)
+    return start.timestamp(), end.timestamp()
+
+
+def _local_date(timestamp):
+    return timezone.localtime(datetime.fromtimestamp(timestamp, tz=timezone.utc)).date()
+
+
+class OrderReport:
+    """Running aggregates over a stream of order dicts."""
+
+    def __init__(self, top=10):
+        self.top = top
+        self.days = {}
+        self.currencies = {}
+        self.statuses = {}
+        self.skus = {}
+
+    def add(self, order):
+        status = order.get('status', 'new')
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == 'cancelled':
+            return
+        currency = order.get('currency', 'UAH')
+        items = order.get('items', [])
+        quantity = sum(item['qty'] for item in items)
+        day = _local_date(order['created_at'])
+        for totals in (
+            self.days.setdefault((day, currency), {'orders': 0, 'revenue': 0, 'items': 0}),
+            self.currencies.setdefault(currency, {'orders': 0, 'revenue': 0, 'items': 0}),
+        ):
+            totals['orders'] += 1
+            totals['revenue'] += order.get('total', 0)
+            totals['items'] += quantity
+        for item in items:
+            sku = item['sku'] or item['name']
+            totals = self.skus.setdefault(sku, {'sku': sku, 'name': item['name'], 'qty': 0, 'revenue': 0})
+            totals['qty'] += item['qty']
+            totals['revenue'] += item['price'] * item['qty']
+
+    def result(self) -> dict:
+        reached = sum(self.statuses.get(status, 0) for status in FUNNEL)
+        funnel = []
+        for status in FUNNEL:
+            funnel.append({'status': status, 'orders': reached})
+            reached -= self.statuses.get(status, 0)
+        return {
+            'days': [
+                {'date': day.isoformat(), 'currency': currency, **totals}
+                for (day, currency), totals in sorted(self.days.items())
+            ],
+            'currencies': [
+                {'currency': currency, **totals, 'average_basket': round(totals['revenue'] / totals['orders'], 2)}
+                for currency, totals in sorted(self.currencies.items())
+            ],
+            'top_skus': heapq.nlargest(self.top, self.skus.values(), key=lambda sku: (sku['qty'], sku['revenue'])),
+            'statuses': dict(sorted(self.statuses.items())),
+            'funnel': funnel,
+        }
+
+
+def build_report(date_from, date_to, top=10, store=None) -> dict:
+    report = OrderReport(top)
+    for order in (store or get_order_store()).created_between(*period_bounds(date_from, date_to)):
+        report.add(order)
+    return {'from': date_from.isoformat(), 'to': date_to.isoformat(), **report.result()}
+
+
+def cached_report(date_from, date_to, top=10) -> dict:
+    key = f'order_report:{settings.ORDER_STORE}:{date_from}:{date_to}:{top}'
+    result = cache.get(key)
+    if result is None:
+        result = build_report(date_from, date_to, top)
+        cache.set(key, result, settings.ORDER_REPORT_CACHE_TIMEOUT)
+    return result
+
+
+def export_rows(orders):
+    """One dict per order line, in EXPORT_FIELDS."""
+    for order in orders:
+        created_at = timezone.localtime(datetime.fromtimestamp(order['created_at'], tz=timezone.utc))
+        for item in order.get('items', []):
+            yield {
+                'order_id': order['order_id'],
+                'created_at': created_at.isoformat(timespec='seconds'),
+                'status': order.get('status', 'new'),
+                'currency': order.get('currency', 'UAH'),
+                'sku': item['sku'],
+                'name': item['name'],
+                'price': item['price'],
+                'qty': item['qty'],
+                'line_total': item['price'] * item['qty'],
+                'order_total': order.get('total', 0),
+                'ttn': order.get('ttn') or '',
+            }
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(export_format, date_from, date_to, store=None):
+    """Lines (str) of a CSV or JSONL export of the period's orders."""
+    orders = (store or get_order_store()).created_between(*period_bounds(date_from, date_to))
+    if export_format == 'jsonl':
+        for order in orders:
+            order.pop('history', None)
+            yield json.dumps(order, ensure_ascii=False) + '\n'
+        return
+    writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in export_rows(orders):
+        yield writer.writerow(row)
@@ -0,0 +1,605 @@
+"""
+Order storage backends.
+
+The order API talks to an OrderStore chosen by the ORDER_STORE setting:
+
+* ``database`` (default) - Order/OrderItem tables through the ORM
+  (SQLite unless DATABASES says otherwise);
+* ``file`` - one compact JSON file per order under ORDER_STORE_DIR, sharded
+  into hash-prefix subdirectories. A new order reserves its name with
+  O_CREAT | O_EXCL (so two writers can never claim the same id), then the
+  content is written to a temp file, fsynced and renamed over it. Readers
+  see either nothing, an empty reservation (treated as missing) or the
+  complete order, never a partial file;
+* ``events`` - append-only order event log under ORDER_EVENT_DIR with an
+  in-memory view per worker (see catalog.order_events).
+
+Status changes go through OrderStore.transition() and follow TRANSITIONS:
+new -> confirmed -> paid -> shipped (with TTN), cancellable until shipped.
+Every applied change is published to catalog.order_notify.
+
+Orders are exchanged as plain dicts in the format of the order API, with
+``created_at`` / ``confirmed_at`` as Unix timestamps.
+
+Order ids are K-sortable: 8 base36 digits of milliseconds since
+ORDER_ID_EPOCH followed by 4 random ones (12 characters of the same
+alphabet as before, so ORDER_ID_RE and bot deep links still match). Ids
+sort by creation time, so every backend can answer "orders created between
+A and B" with a range scan over ids (see OrderStore.created_between).
+Legacy 10-character random ids remain valid but carry no time.
+"""
+import fcntl
+import hashlib
+import heapq
+import json
+import os
+import re
+import secrets
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils.module_loading import import_string
+
+from . import order_notify, outbox
+
+ORDER_ID_RE = re.compile(r'^[a-z0-9]{8,12}$')
+ORDER_ID_ALPHABET = '0123456789abcdefghijklmnopqrstuvwxyz'
+# 2024-01-01 UTC in milliseconds; 8 base36 digits cover ~89 years from it
+ORDER_ID_EPOCH = 1704067200000
+ORDER_ID_TIME_CHARS = 8
+ORDER_ID_RANDOM_CHARS = 4
+# Attempts to find a free order id before giving up
+CREATE_ATTEMPTS = 5
+# Conditional UPDATEs a transition retries while other writers keep changing the status
+TRANSITION_ATTEMPTS = 3
+
+
+# Order status -> statuses it can be reached from
+TRANSITIONS = {
+    'confirmed': {'new'},
+    'paid': {'new', 'confirmed'},
+    'shipped': {'confirmed', 'paid'},
+    'cancelled': {'new', 'confirmed', 'paid'},
+}
+
+
+class OrderStoreError(Exception):
+    """The order could not be stored (I/O error, no free id, ...)."""
+
+
+class InvalidTransition(OrderStoreError):
+    """The order cannot move to the requested status from its current one."""
+
+
+STATUS_LABELS = {
+    'new': 'нове',
+    'confirmed': 'підтверджене',
+    'paid': 'оплачене',
+    'shipped': 'відправлене',
+    'cancelled': 'скасоване',
+}
+
+
+def check_transition(current, status) -> bool:
+    """
+    True if ``current -> status`` is a change to apply, False if the order
+    already has that status (transitions are idempotent); raises InvalidTransition.
+    """
+    if status not in TRANSITIONS:
+        raise InvalidTransition(f'Невідомий статус: {status!r}')
+    if current == status:
+        return False
+    if current not in TRANSITIONS[status]:
+        raise InvalidTransition(
+            f'Замовлення {STATUS_LABELS.get(current, current)}, '
+            f'його не можна перевести у статус «{STATUS_LABELS[status]}».'
+        )
+    return True
+
+
+def _base36(value: int, width: int) -> str:
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, 36)
+        digits.append(ORDER_ID_ALPHABET[digit])
+    return ''.join(reversed(digits))
+
+
+def order_id_prefix(timestamp: float) -> str:
+    """The time part of ids created at ``timestamp``; ids of later orders sort after it."""
+    milliseconds = min(max(int(timestamp * 1000) - ORDER_ID_EPOCH, 0), 36 ** ORDER_ID_TIME_CHARS - 1)
+    return _base36(milliseconds, ORDER_ID_TIME_CHARS)
+
+
+def order_id_time(order_id: str):
+    """Creation time encoded in a K-sortable id, or None for a legacy random id."""
+    if len(order_id) != ORDER_ID_TIME_CHARS + ORDER_ID_RANDOM_CHARS or not ORDER_ID_RE.match(order_id):
+        return None
+    return (int(order_id[:ORDER_ID_TIME_CHARS], 36) + ORDER_ID_EPOCH) / 1000
+
+
+def new_order_id() -> str:
+    """
+    Time prefix + random suffix: 36**4 ids per millisecond make collisions
+    negligible, the stores still reject one (unique key / O_EXCL) as a backstop.
+    """
+    suffix = ''.join(secrets.choice(ORDER_ID_ALPHABET) for _ in range(ORDER_ID_RANDOM_CHARS))
+    return order_id_prefix(time.time()) + suffix
+
+
+class OrderStore:
+    """Interface of order storage backends."""
+
+    def create(self, order: dict, notify_bot: bool = False) -> dict:
+        """
+        Store a new order (without ``order_id``/``created_at``) under a fresh
+        id and return it with those fields filled in. With ``notify_bot`` the
+        order is also queued for the bot (catalog.outbox) in the same write.
+        """
+        raise NotImplementedError
+
+    def get(self, order_id: str):
+        """The order dict, or None."""
+        raise NotImplementedError
+
+    def update(self, order_id: str, **fields):
+        """Set top-level fields of an order; returns the updated order or None."""
+        raise NotImplementedError
+
+    def transition(self, order_id: str, status: str, **data):
+        """
+        Move an order to ``status`` (confirmed, paid, shipped with ``ttn``,
+        cancelled) if TRANSITIONS allow it; returns the order or None.
+        """
+        order = self.get(order_id)
+        if order is None or not check_transition(order['status'], status):
+            return order
+        fields = {key: value for key, value in data.items() if value}
+        order = self.update(order_id, status=status, **{f'{status}_at': int(time.time())}, **fields)
+        order_notify.publish(order_id, status)
+        return order
+
+    def purge(self, created_before: float, dry_run: bool = False) -> int:
+        """Delete orders created before the given Unix time; returns how many (would be) deleted."""
+        raise NotImplementedError
+
+    def created_between(self, start: float, end: float = None):
+        """
+        Orders created in [start, end), oldest first. K-sortable ids are
+        found by a range scan over ids; legacy random ids, which carry no
+        time, by their ``created_at``.
+        """
+        raise NotImplementedError
+
+
+def id_range(start, end=None):
+    """(low, high) such that low <= order_id < high selects ids created in [start, end)."""
+    return order_id_prefix(start), order_id_prefix(end) if end is not None else ORDER_ID_ALPHABET[-1] * 13
+
+
+def _timestamp(value):
+    return int(value.timestamp()) if value else None
+
+
+def _datetime(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc) if value else None
+
+
+def _created_order(order):
+    return order.get('created_at') or 0, order['order_id']
+
+
+class DatabaseOrderStore(OrderStore):
+    """Orders in the Order/OrderItem tables."""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+
+    def _to_dict(self, order):
+        data = order.to_dict()
+        data.update(
+            page=order.page,
+            status=order.status,
+            ttn=order.ttn,
+            created_at=_timestamp(order.created_at),
+            confirmed_at=_timestamp(order.confirmed_at),
+        )
+        return data
+
+    def create(self, order, notify_bot=False):
+        from .models import Order, OrderItem
+
+        for _ in range(CREATE_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    row = Order.objects.create(
+                        order_id=new_order_id(),
+                        total=order['total'],
+                        currency=order['currency'][:3],
+                        source=str(order.get('source') or 'site')[:50],
+                        page=order.get('page', '')[:500],
+                        ts=order.get('ts', 0),
+                        status=order.get('status', Order.STATUS_NEW),
+                    )
+                    OrderItem.objects.bulk_create(OrderItem(order=row, **item) for item in order['items'])
+                    created = {**order, 'order_id': row.order_id, 'created_at': _timestamp(row.created_at),
+                               'status': row.status, 'confirmed_at': None}
+                    if notify_bot:
+                        outbox.record(created)
+            except IntegrityError:
+                # order_id collision, retry with a new one
+                continue
+            return created
+        raise OrderStoreError('Не вдалося підібрати вільний номер замовлення.')
+
+    def get(self, order_id):
+        from .models import Order
+
+        order = Order.objects.prefetch_related('items').filter(order_id=order_id).first()
+        return self._to_dict(order) if order else None
+
+    def update(self, order_id, **fields):
+        from .models import Order
+
+        for key in ('created_at', 'confirmed_at'):
+            if key in fields:
+                fields[key] = _datetime(fields[key])
+        if not Order.objects.filter(order_id=order_id).update(**fields):
+            return None
+        return self.get(order_id)
+
+    def transition(self, order_id, status, **data):
+        """
+        A single conditional UPDATE (status must be one the transition is
+        allowed from), so concurrent transitions cannot overwrite each other
+        and no read lock has to be upgraded (SQLite has no SELECT FOR UPDATE).
+        The row is re-read only to tell a missing order from an invalid move.
+        """
+        from .models import Order
+
+        if status not in TRANSITIONS:
+            raise InvalidTransition(f'Невідомий статус: {status!r}')
+        fields = {'status': status}
+        if status == Order.STATUS_CONFIRMED:
+            fields['confirmed_at'] = _datetime(time.time())
+        if data.get('ttn'):
+            fields['ttn'] = str(data['ttn'])[:50]
+        try:
+            for _ in range(TRANSITION_ATTEMPTS):
+                if Order.objects.filter(order_id=order_id, status__in=TRANSITIONS[status]).update(**fields):
+                    transaction.on_commit(lambda: order_notify.publish(order_id, status))
+                    break
+                current = Order.objects.filter(order_id=order_id).values_list('status', flat=True).first()
+                if current is None:
+                    return None
+                if not check_transition(current, status):
+                    # Already in that status
+                    break
+                # The status changed between the UPDATE and the read: try again
+            return self.get(order_id)
+        except DatabaseError as exc:
+            raise OrderStoreError('Не вдалося оновити замовлення.') from exc
+
+    def created_between(self, start, end=None):
+        """A range scan of the created_at index, so legacy ids are included."""
+        from .models import Order
+
+        orders = Order.objects.filter(created_at__gte=_datetime(start))
+        if end is not None:
+            orders = orders.filter(created_at__lt=_datetime(end))
+        orders = orders.order_by('created_at', 'order_id').prefetch_related('items')
+        for order in orders.iterator(chunk_size=self.batch_size):
+            yield self._to_dict(order)
+
+    def purge(self, created_before, dry_run=False):
+        """Walks the created_at index oldest first, one transaction per batch."""
+        from .models import Order
+
+        expired = Order.objects.filter(created_at__lt=_datetime(created_before)).order_by('created_at')
+        if dry_run:
+            return expired.count()
+        deleted = 0
+        while True:
+            batch = list(expired.values_list('pk', flat=True)[:self.batch_size])
+            if not batch:
+                return deleted
+            with transaction.atomic():
+                Order.objects.filter(pk__in=batch).delete()
+            deleted += len(batch)
+
+
+class FileOrderStore(OrderStore):
+    """
+    Orders as ``<root>/<shard>/<order_id>.json``. For K-sortable ids the
+    shard is the first ``time_chars`` characters of the id (a new directory
+    every ~17 hours with the default 3), so created_between() only lists the
+    directories of its time range. Legacy random ids are sharded by the
+    first ``shard_chars`` hex digits of their SHA-1; files of the old flat
+    layout (``<root>/<order_id>.json``) are still readable.
+
+    Updates and transitions read, modify and replace the order file under
+    an flock on the shard's ``.lock`` file, so concurrent status changes
+    from several workers are applied one after another instead of the last
+    write silently undoing the others.
+    """
+
+    LOCK_NAME = '.lock'
+
+    def __init__(self, root, shard_chars=2, time_chars=3, fsync=True):
+        self.root = Path(root)
+        self.shard_chars = shard_chars
+        self.time_chars = time_chars
+        self.fsync = fsync
+        self._held = threading.local()
+
+    def path(self, order_id) -> Path:
+        if order_id_time(order_id) is not None:
+            shard = order_id[:self.time_chars]
+        else:
+            shard = hashlib.sha1(order_id.encode('ascii')).hexdigest()[:self.shard_chars]
+        return self.root / shard / f'{order_id}.json'
+
+    @contextmanager
+    def _locked(self, order_id):
+        """Exclusive lock on the order's shard; reentrant within a thread."""
+        directory = self.path(order_id).parent
+        held = self._held.__dict__.setdefault('directories', set())
+        if directory in held:
+            yield
+            return
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            fd = os.open(directory / self.LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as exc:
+            raise OrderStoreError('Не вдалося оновити замовлення.') from exc
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            held.add(directory)
+            yield
+        finally:
+            held.discard(directory)
+            os.close(fd)
+
+    def _fsync_dir(self, directory):
+        if not self.fsync:
+            return
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _write(self, path, data):
+        """Replace ``path`` atomically: temp file in the same dir, fsync, rename."""
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{secrets.token_hex(4)}.tmp')
+        try:
+            with open(tmp_path, 'wb') as handle:
+                handle.write(payload)
+                handle.flush()
+                if self.fsync:
+                    os.fsync(handle.fileno())
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            tmp_path.unlink(missing_ok=True)
+            raise OrderStoreError('Не вдалося зберегти замовлення.') from exc
+        self._fsync_dir(path.parent)
+
+    def _reserve(self, path) -> bool:
+        """Claim the file name; False if another order already has it."""
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        os.close(fd)
+        return True
+
+    def create(self, order, notify_bot=False):
+        """The bot's message is spooled between reserving the name and writing the order."""
+        for _ in range(CREATE_ATTEMPTS):
+            order_id = new_order_id()
+            path = self.path(order_id)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                reserved = self._reserve(path)
+            except OSError as exc:
+                raise OrderStoreError('Не вдалося створити замовлення.') from exc
+            if not reserved:
+                continue
+            data = {
+                **order,
+                'order_id': order_id,
+                'status': order.get('status', 'new'),
+                'created_at': int(time.time()),
+                'confirmed_at': None,
+            }
+            try:
+                if notify_bot:
+                    try:
+                        outbox.enqueue(data)
+                    except OSError as exc:
+                        raise OrderStoreError('Не вдалося створити замовлення.') from exc
+                self._write(path, data)
+            except OrderStoreError:
+                if notify_bot:
+                    outbox.discard(order_id)
+                path.unlink(missing_ok=True)
+                raise
+            return data
+        raise OrderStoreError('Не вдалося підібрати вільний номер замовлення.')
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as handle:
+                content = handle.read()
+        except FileNotFoundError:
+            return None
+        except OSError as exc:
+            raise OrderStoreError('Не вдалося прочитати замовлення.') from exc
+        if not content:
+            # Reserved by create() but not written yet (or abandoned by a crash)
+            return None
+        try:
+            return json.loads(content)
+        except ValueError as exc:
+            raise OrderStoreError('Не вдалося прочитати замовлення.') from exc
+
+    def get(self, order_id):
+        data = self._read(self.path(order_id))
+        if data is None:
+            data = self._read(self.root / f'{order_id}.json')
+        return data
+
+    def update(self, order_id, **fields):
+        path = self.path(order_id)
+        with self._locked(order_id):
+            data = self._read(path)
+            if data is None:
+                data = self._read(self.root / f'{order_id}.json')
+                if data is None:
+                    return None
+            data.update(fields)
+            self._write(path, data)
+            if data.get('created_at'):
+                # Keep mtime == creation time so purge() can go by stat() alone
+                os.utime(path, (data['created_at'], data['created_at']))
+        return data
+
+    def transition(self, order_id, status, **data):
+        # The status check and the write must see the same file
+        with self._locked(order_id):
+            return super().transition(order_id, status, **data)
+
+    def created_between(self, start, end=None):
+        """
+        Lists only the time-prefix directories of the range. Legacy ids are
+        read from their hash shards (and the old flat layout) and filtered by
+        created_at; there are no new ones, and purge_orders expires them.
+        """
+        return heapq.merge(
+            self._created_between_sortable(start, end),
+            sorted(self._created_between_legacy(start, end), key=_created_order),
+            key=_created_order,
+        )
+
+    def _created_between_sortable(self, start, end):
+        low, high = id_range(start, end)
+        try:
+            shards = sorted(
+                entry.name for entry in os.scandir(self.root)
+                if entry.is_dir() and len(entry.name) == self.time_chars
+                and low[:self.time_chars] <= entry.name <= high[:self.time_chars]
+            )
+        except FileNotFoundError:
+            return
+        for shard in shards:
+            order_ids = sorted(
+                name[:-5] for name in os.listdir(self.root / shard)
+                if name.endswith('.json') and low <= name[:-5] < high
+            )
+            for order_id in order_ids:
+                order = self.get(order_id)
+                if order is not None:
+                    yield order
+
+    def _created_between_legacy(self, start, end):
+        try:
+            directories = [self.root] + [
+                Path(entry.path) for entry in os.scandir(self.root)
+                if entry.is_dir() and len(entry.name) == self.shard_chars
+            ]
+        except FileNotFoundError:
+            return
+        for directory in directories:
+            for name in os.listdir(directory):
+                if not name.endswith('.json') or order_id_time(name[:-5]) is not None:
+                    continue
+                order = self._read(directory / name)
+                if order:
+                    order.setdefault('order_id', name[:-5])
+                if order and start <= order.get('created_at', 0) and (end is None or order['created_at'] < end):
+                    yield order
+
+    def purge(self, created_before, dry_run=False):
+        """
+        Time-prefix shards entirely older than ``created_before`` are removed
+        as whole directories without looking at their files; only the shard
+        that straddles it is filtered, by id. Legacy shards and the flat
+        layout go by mtime, which update() keeps equal to created_at. Stale
+        reservations are dropped along with the orders.
+        """
+        cutoff = order_id_prefix(created_before)
+
+        def by_id(order_id, _path):
+            return order_id < cutoff
+
+        def by_mtime(_order_id, path):
+            return path.stat().st_mtime < created_before
+
+        deleted = 0
+        try:
+            entries = [entry for entry in os.scandir(self.root) if entry.is_dir()]
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if len(entry.name) == self.time_chars and entry.name < cutoff[:self.time_chars]:
+                deleted += self._purge_shard(Path(entry.path), dry_run)
+            elif entry.name == cutoff[:self.time_chars]:
+                deleted += self._purge_files(Path(entry.path), dry_run, by_id)
+            elif len(entry.name) == self.shard_chars:
+                deleted += self._purge_files(Path(entry.path), dry_run, by_mtime)
+        return deleted + self._purge_files(self.root, dry_run, by_mtime)
+
+    def _purge_shard(self, directory, dry_run):
+        try:
+            count = sum(1 for name in os.listdir(directory) if name.endswith('.json'))
+            if not dry_run:
+                shutil.rmtree(directory)
+        except OSError:
+            return 0
+        return count
+
+    def _purge_files(self, directory, dry_run, expired):
+        """Delete the order files of ``directory`` for which ``expired(order_id, path)`` holds."""
+        deleted = 0
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            path = directory / name
+            try:
+                if expired(name[:-5], path):
+                    if not dry_run:
+                        path.unlink(missing_ok=True)
+                    deleted += 1
+            except OSError:
+                continue
+        return deleted
+
+
+BACKENDS = {
+    'database': 'catalog.order_store.DatabaseOrderStore',
+    'file': 'catalog.order_store.FileOrderStore',
+    'events': 'catalog.order_events.EventLogOrderStore',
+}
+
+
+def build_order_store(backend, **options) -> OrderStore:
+    if backend == 'file':
+        options.setdefault('root', settings.ORDER_STORE_DIR)
+    elif backend == 'events':
+        options.setdefault('root', settings.ORDER_EVENT_DIR)
+        options.setdefault('fsync_interval', settings.ORDER_EVENT_FSYNC_MS / 1000)
+    return import_string(BACKENDS.get(backend, backend))(**options)
+
+
+@lru_cache(maxsize=None)
+def get_order_store() -> OrderStore:
+    """The OrderStore configured by ORDER_STORE / ORDER_STORE_DIR / ORDER_EVENT_DIR."""
+    return build_order_store(settings.ORDER_STORE)
@@ -0,0 +1,204 @@
+"""
+Outbox that pushes new orders to the Telegram bot.
+
+The order store queues every order created by the API as part of the same
+write, so an order is never stored without its message (or the other way
+round): the database store inserts an OutboxMessage row in the transaction
+that creates the Order (record()), the file and event-log stores spool
+``<ORDER_OUTBOX_DIR>/<order_id>.json`` (temp file + fsync + rename) before
+the write that makes the order visible, and discard() it if that write
+fails. The notification survives restarts and never delays the customer on
+the bot.
+
+The dispatch_outbox command drains the table and the spool oldest first
+(K-sortable ids sort by creation time) and POSTs each order to the bot's
+inbox at ORDER_OUTBOX_TARGET, deleting the message once the bot answered
+2xx. By the time the customer opens the deep link, the bot already holds
+the order in memory and answers /start without calling the order API.
+
+ORDER_OUTBOX_TARGET is ``http://host:port/path`` or ``unix:/path/to/socket``
+(the path is then /orders); empty disables the outbox. Requests carry
+ORDER_OUTBOX_TOKEN in the X-Outbox-Token header.
+"""
+import http.client
+import json
+import os
+import secrets
+import socket
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+# Fields of the order pushed to the bot (the order API's GET format)
+PUSH_FIELDS = ['order_id', 'items', 'total', 'currency', 'ts', 'source']
+SEND_TIMEOUT = 5
+# Table rows loaded per scan of the outbox
+PENDING_ROWS = 500
+
+
+def enabled() -> bool:
+    return bool(settings.ORDER_OUTBOX_TARGET)
+
+
+def outbox_dir() -> Path:
+    return Path(settings.ORDER_OUTBOX_DIR)
+
+
+def message(order: dict) -> str:
+    return json.dumps({key: order.get(key) for key in PUSH_FIELDS}, ensure_ascii=False)
+
+
+def record(order: dict) -> None:
+    """
+    Queue a new order in the outbox table; call it inside the transaction
+    that creates the order. A no-op when the outbox is disabled.
+    """
+    if not enabled():
+        return
+    from .models import OutboxMessage
+
+    OutboxMessage.objects.create(order_id=order['order_id'], payload=message(order))
+
+
+def enqueue(order: dict) -> None:
+    """Spool a new order for the bot; a no-op when the outbox is disabled."""
+    if not enabled():
+        return
+    directory = outbox_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{order["order_id"]}.json'
+    tmp_path = directory / f'.{path.name}.{os.getpid()}.{secrets.token_hex(4)}.tmp'
+    payload = message(order)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def discard(order_id: str) -> None:
+    """Drop the spooled message of an order whose write failed."""
+    if enabled():
+        (outbox_dir() / f'{order_id}.json').unlink(missing_ok=True)
+
+
+class SpooledMessage:
+    def __init__(self, path):
+        self.path = path
+        self.order_id = path.stem
+
+    def body(self) -> bytes:
+        return self.path.read_bytes()
+
+    def delivered(self):
+        self.path.unlink(missing_ok=True)
+
+    def rejected(self):
+        rejected = self.path.parent / 'rejected'
+        rejected.mkdir(exist_ok=True)
+        os.replace(self.path, rejected / self.path.name)
+
+
+class QueuedMessage:
+    def __init__(self, row):
+        self.row = row
+        self.order_id = row.order_id
+
+    def body(self) -> bytes:
+        return self.row.payload.encode('utf-8')
+
+    def delivered(self):
+        type(self.row).objects.filter(pk=self.row.pk).delete()
+
+    def rejected(self):
+        type(self.row).objects.filter(pk=self.row.pk).update(rejected=True)
+
+
+def pending():
+    """Queued messages of the table and the spool, oldest order first."""
+    from .models import OutboxMessage
+
+    messages = [QueuedMessage(row) for row in OutboxMessage.objects.filter(rejected=False)[:PENDING_ROWS]]
+    try:
+        names = os.listdir(outbox_dir())
+    except FileNotFoundError:
+        names = []
+    messages += [SpooledMessage(outbox_dir() / name) for name in names if name.endswith('.json')]
+    return sorted(messages, key=lambda message: message.order_id)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def connect(target=None):
+    """(connection, request path) for ORDER_OUTBOX_TARGET; reusable for many sends."""
+    target = target or settings.ORDER_OUTBOX_TARGET
+    if target.startswith('unix:'):
+        return UnixHTTPConnection(target[len('unix:'):], SEND_TIMEOUT), '/orders'
+    parts = urlsplit(target)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(parts.netloc, timeout=SEND_TIMEOUT), parts.path or '/orders'
+
+
+def send(connection, request_path, body: bytes) -> int:
+    """
+    POST one message over a keep-alive connection; returns the HTTP status.
+
+    The inbox closes connections idle for 30 s, so a failure on a reused
+    connection is retried once on a new one (the bot accepts an order
+    twice without harm).
+    """
+    for attempt in range(2):
+        reused = connection.sock is not None
+        try:
+            connection.request('POST', request_path, body=body, headers={
+                'Content-Type': 'application/json',
+                'X-Outbox-Token': settings.ORDER_OUTBOX_TOKEN,
+            })
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            if attempt or not reused:
+                raise
+
+
+def dispatch(connection, request_path) -> int:
+    """
+    Deliver the spooled messages in order; returns how many were delivered.
+
+    A message the bot rejects as invalid (4xx other than auth/rate errors)
+    is set aside (moved to ``rejected/``, or flagged in the table) instead
+    of blocking the queue; any other failure stops the run so later
+    messages do not overtake it. Connection errors propagate to the caller,
+    which reconnects and retries later.
+    """
+    delivered = 0
+    for message in pending():
+        try:
+            body = message.body()
+        except FileNotFoundError:
+            # Delivered by another dispatcher
+            continue
+        status = send(connection, request_path, body)
+        if 200 <= status < 300:
+            message.delivered()
+            delivered += 1
+        elif 400 <= status < 500 and status not in (401, 403, 429):
+            message.rejected()
+        else:
+            break
+    return delivered
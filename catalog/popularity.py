@@ -0,0 +1,181 @@
+"""
+Write-behind product view counters and popularity ranking.
+
+A product page view is a single cache increment (``views:<product id>``),
+never a database write. The first view of a product in each
+VIEWED_WINDOW-second window also appends its id to that window's list in
+the cache, so the update_popularity command only visits products viewed
+since its last run. It moves their pending counts into Product.view_count
+/ popularity_score with one UPDATE per batch of products, decays
+popularity_score exponentially and marks the top-ranked products as
+is_popular, leaving alone the products whose flag was set by hand
+(popular_override).
+
+The counters live in the default cache, so it has to be shared by the web
+workers and the command (Redis/Memcached, see CACHE_BACKEND).
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+
+from .models import Product
+from .utils import batched
+
+VIEW_KEY = 'views:{}'
+DECAYED_AT_KEY = 'popularity:decayed_at'
+BATCH_SIZE = 1000
+# Scores below this after decay are reset to zero
+MIN_SCORE = 0.01
+# Products viewed per window: a counter of list slots, one slot per product id,
+# and a marker so a product is listed once per window
+VIEWED_WINDOW = 300
+VIEWED_TTL = 24 * 3600
+VIEWED_COUNT_KEY = 'views:viewed:{}'
+VIEWED_SLOT_KEY = 'views:viewed:{}:{}'
+VIEWED_MARK_KEY = 'views:seen:{}:{}'
+# First window the next flush_views() reads
+SCAN_FROM_KEY = 'popularity:scan_from'
+
+
+def shared_cache() -> bool:
+    """False for a per-process cache, where views never reach update_popularity."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _incr(key, timeout) -> int:
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=timeout):
+            return 1
+        return cache.incr(key)
+
+
+def record_view(product_id) -> None:
+    _incr(VIEW_KEY.format(product_id), None)
+    window = int(time.time()) // VIEWED_WINDOW
+    if cache.add(VIEWED_MARK_KEY.format(window, product_id), 1, timeout=VIEWED_TTL):
+        slot = _incr(VIEWED_COUNT_KEY.format(window), VIEWED_TTL)
+        cache.set(VIEWED_SLOT_KEY.format(window, slot), product_id, timeout=VIEWED_TTL)
+
+
+arecord_view = sync_to_async(record_view, thread_sensitive=False)
+
+
+def _viewed_products(first_window, last_window):
+    """Ids of the products viewed in the given windows, sorted."""
+    product_ids = set()
+    for window in range(first_window, last_window + 1):
+        count = cache.get(VIEWED_COUNT_KEY.format(window)) or 0
+        slots = [VIEWED_SLOT_KEY.format(window, slot) for slot in range(1, count + 1)]
+        for batch in batched(slots, BATCH_SIZE):
+            product_ids.update(cache.get_many(batch).values())
+    return sorted(product_ids)
+
+
+def _pending_views(product_ids):
+    keys = {VIEW_KEY.format(pk): pk for pk in product_ids}
+    return {keys[key]: count for key, count in cache.get_many(keys).items() if count}
+
+
+def _claim(counts) -> None:
+    """Subtract flushed counts, keeping views recorded since they were read."""
+    for pk, count in counts.items():
+        cache.decr(VIEW_KEY.format(pk), count)
+
+
+def _unclaim(counts) -> None:
+    for pk, count in counts.items():
+        cache.incr(VIEW_KEY.format(pk), count)
+
+
+def flush_views() -> int:
+    """
+    Move pending view counts into the database.
+
+    Returns the number of views flushed. Only products listed as viewed
+    since the previous flush are visited; the first run, or one after the
+    lists expired (VIEWED_TTL), scans all products instead. Each batch of
+    products with pending views becomes one UPDATE adding its count to
+    view_count and popularity_score; counts are only dropped from the cache
+    if the UPDATE commits.
+    """
+    flushed = 0
+    current = int(time.time()) // VIEWED_WINDOW
+    scan_from = cache.get(SCAN_FROM_KEY)
+    if scan_from is None or (current - scan_from) * VIEWED_WINDOW >= VIEWED_TTL:
+        product_ids = Product.objects.order_by().values_list('pk', flat=True).iterator(chunk_size=BATCH_SIZE)
+    else:
+        product_ids = _viewed_products(scan_from, current)
+    for batch in batched(product_ids, BATCH_SIZE):
+        counts = _pending_views(batch)
+        if not counts:
+            continue
+        _claim(counts)
+        try:
+            with transaction.atomic():
+                Product.objects.filter(pk__in=counts).update(
+                    view_count=F('view_count') + Case(
+                        *[When(pk=pk, then=Value(count)) for pk, count in counts.items()],
+                        default=Value(0), output_field=IntegerField(),
+                    ),
+                    popularity_score=F('popularity_score') + Case(
+                        *[When(pk=pk, then=Value(float(count))) for pk, count in counts.items()],
+                        default=Value(0.0), output_field=FloatField(),
+                    ),
+                )
+        except Exception:
+            _unclaim(counts)
+            raise
+        flushed += sum(counts.values())
+    # The previous window is read again next time, for views that were
+    # still being recorded in it
+    cache.set(SCAN_FROM_KEY, current - 1, timeout=None)
+    return flushed
+
+
+def decay_scores(half_life_hours: float) -> float:
+    """
+    Multiply every popularity_score by 0.5 ** (hours since last decay / half-life).
+
+    The first run only records the time. Returns the factor applied.
+    """
+    now = time.time()
+    decayed_at = cache.get(DECAYED_AT_KEY)
+    cache.set(DECAYED_AT_KEY, now, timeout=None)
+    if decayed_at is None or half_life_hours <= 0:
+        return 1.0
+    factor = 0.5 ** ((now - decayed_at) / 3600 / half_life_hours)
+    with transaction.atomic():
+        Product.objects.filter(popularity_score__gt=0).update(popularity_score=F('popularity_score') * factor)
+        Product.objects.filter(popularity_score__gt=0, popularity_score__lt=MIN_SCORE).update(popularity_score=0)
+    return factor
+
+
+def rank_popular(top: int) -> int:
+    """
+    Set is_popular on the ``top`` available products by popularity_score and
+    clear it elsewhere, among products without a manual setting
+    (popular_override); pinned products keep their flag. Does nothing until
+    there is view data, so manual flags stay in place on a fresh install.
+    Returns the number of changed products.
+    """
+    ranked = Product.objects.filter(popular_override__isnull=True)
+    top_ids = list(
+        ranked.filter(is_available=True, popularity_score__gt=0)
+        .order_by('-popularity_score', 'pk')
+        .values_list('pk', flat=True)[:top]
+    )
+    if not top_ids:
+        return 0
+    # Plain UPDATEs: a ranking change is not an edit of the products, so
+    # updated_at and the catalog cache version stay as they are
+    with transaction.atomic():
+        changed = ranked.filter(is_popular=True).exclude(pk__in=top_ids).update(is_popular=False)
+        changed += ranked.filter(pk__in=top_ids, is_popular=False).update(is_popular=True)
+    return changed
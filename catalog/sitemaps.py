@@ -0,0 +1,194 @@
+"""
+sitemap.xml for the catalog.
+
+URLs are built from lightweight values_list() queries streamed with
+iterator(), never from model instances (get_absolute_url() would need the
+category of every product). Up to SITEMAP_URLS_PER_FILE URLs /sitemap.xml
+is a single urlset; past that it becomes a sitemap index pointing at
+/sitemap-<section>-<page>.xml files. Every document is streamed to the
+client on a cache miss and cached under the current catalog version, so a
+catalog change invalidates all of them at once.
+
+Section files are paged by key, not by OFFSET: one index-only scan per
+section (cached with the counts) records the sort key that starts every
+page, and a page selects the rows from its start key on, so deep pages cost
+the same as the first.
+"""
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from antidrone.middleware import record_cache_access
+
+from .cache import get_catalog_version
+from .models import Category, Product
+from .utils import url_pattern
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = '</urlset>\n'
+# URL entries joined into one chunk of the streamed response
+CHUNK_URLS = 500
+
+STATIC_PAGES = ['catalog:index', 'catalog:category_list', 'catalog:about', 'catalog:delivery']
+
+
+def _url_entry(loc, lastmod=None):
+    if lastmod is None:
+        return f'<url><loc>{escape(loc)}</loc></url>\n'
+    return f'<url><loc>{escape(loc)}</loc><lastmod>{lastmod.isoformat(timespec="seconds")}</lastmod></url>\n'
+
+
+def _pages_rows(base):
+    for name in STATIC_PAGES:
+        yield _url_entry(base + reverse(name))
+
+
+def _categories():
+    return Category.objects.filter(is_active=True).order_by('tree_id', 'lft')
+
+
+def _products():
+    return Product.objects.filter(is_available=True).order_by('pk')
+
+
+def _category_rows(base, start, limit):
+    pattern = base + url_pattern('catalog:category_detail', 'slug')
+    rows = _categories()
+    if start is not None:
+        tree_id, lft = start
+        rows = rows.filter(Q(tree_id__gt=tree_id) | Q(tree_id=tree_id, lft__gte=lft))
+    rows = rows.annotate(lastmod=Max('products__updated_at')).values_list('slug', 'lastmod')[:limit]
+    for slug, lastmod in rows.iterator(chunk_size=2000):
+        yield _url_entry(pattern.format(slug=slug), lastmod)
+
+
+def _product_rows(base, start, limit):
+    pattern = base + url_pattern('catalog:product_detail', 'category_slug', 'product_slug')
+    rows = _products()
+    if start is not None:
+        rows = rows.filter(pk__gte=start)
+    rows = rows.values_list('category__slug', 'slug', 'updated_at')[:limit]
+    for category_slug, slug, updated_at in rows.iterator(chunk_size=2000):
+        yield _url_entry(pattern.format(category_slug=category_slug, product_slug=slug), updated_at)
+
+
+def _page_starts(keys):
+    """(row count, sort key of the first row of every page) from the section's keys in order."""
+    per_file = settings.SITEMAP_URLS_PER_FILE
+    count, starts = 0, []
+    for key in keys:
+        if count % per_file == 0:
+            starts.append(key)
+        count += 1
+    return count, starts
+
+
+def _section_pages():
+    """section -> (URL count, start key of each page); None starts a section at its first row."""
+    categories = _page_starts(
+        tuple(key) for key in _categories().values_list('tree_id', 'lft').iterator(chunk_size=2000))
+    products = _page_starts(_products().values_list('pk', flat=True).iterator(chunk_size=2000))
+    return {
+        'pages': (len(STATIC_PAGES), [None]),
+        'categories': categories,
+        'products': products,
+    }
+
+
+def _section_rows(section, base, start, limit):
+    if section == 'pages':
+        return _pages_rows(base)
+    if section == 'categories':
+        return _category_rows(base, start, limit)
+    return _product_rows(base, start, limit)
+
+
+def _chunked(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_URLS:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _cached_xml(key, render):
+    """
+    Serve the document from cache, or stream ``render()`` (a generator of
+    str chunks) to the client and cache the full document once it is done.
+    """
+    content = cache.get(key)
+    record_cache_access(content is not None)
+    if content is not None:
+        return HttpResponse(content, content_type='application/xml; charset=utf-8')
+
+    def stream():
+        parts = []
+        for chunk in render():
+            parts.append(chunk)
+            yield chunk
+        cache.set(key, ''.join(parts), settings.SITEMAP_CACHE_TIMEOUT)
+
+    return StreamingHttpResponse(stream(), content_type='application/xml; charset=utf-8')
+
+
+def _cache_key(request, *parts):
+    # The host is part of the output (absolute <loc> URLs)
+    return ':'.join(['sitemap', str(get_catalog_version()), request.get_host(), *map(str, parts)])
+
+
+def _sections(request):
+    key = _cache_key(request, 'sections')
+    sections = cache.get(key)
+    record_cache_access(sections is not None)
+    if sections is None:
+        sections = _section_pages()
+        cache.set(key, sections, settings.SITEMAP_CACHE_TIMEOUT)
+    return sections
+
+
+@require_GET
+def sitemap_index(request):
+    base = f'{request.scheme}://{request.get_host()}'
+    sections = _sections(request)
+
+    if sum(count for count, _starts in sections.values()) <= settings.SITEMAP_URLS_PER_FILE:
+        def render():
+            yield XML_HEADER + URLSET_OPEN
+            for section in sections:
+                yield from _chunked(_section_rows(section, base, None, settings.SITEMAP_URLS_PER_FILE))
+            yield URLSET_CLOSE
+        return _cached_xml(_cache_key(request, 'all'), render)
+
+    def render_index():
+        yield XML_HEADER + '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        for section, (_count, starts) in sections.items():
+            for page in range(1, max(len(starts), 1) + 1):
+                loc = base + reverse('catalog:sitemap_section', kwargs={'section': section, 'page': page})
+                yield f'<sitemap><loc>{escape(loc)}</loc></sitemap>\n'
+        yield '</sitemapindex>\n'
+    return _cached_xml(_cache_key(request, 'index'), render_index)
+
+
+@require_GET
+def sitemap_section(request, section, page):
+    sections = _sections(request)
+    if section not in sections or not 1 <= page <= max(len(sections[section][1]), 1):
+        raise Http404
+    base = f'{request.scheme}://{request.get_host()}'
+    starts = sections[section][1]
+    start = starts[page - 1] if starts else None
+
+    def render():
+        yield XML_HEADER + URLSET_OPEN
+        yield from _chunked(_section_rows(section, base, start, settings.SITEMAP_URLS_PER_FILE))
+        yield URLSET_CLOSE
+    return _cached_xml(_cache_key(request, section, page), render)
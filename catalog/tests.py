@@ -0,0 +1,149 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import api
+from .models import Category, Order, Product, ProductImage
+
+
+class AdminQueryCountTests(TestCase):
+    """
+    The admin changelists must not issue queries per row: the counts below
+    hold whatever the page size, and stay the same as the catalog grows.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.roots = []
+        for root_number in range(3):
+            root = Category.objects.create(name=f'Розділ {root_number}', slug=f'root-{root_number}')
+            cls.roots.append(root)
+            for child_number in range(2):
+                Category.objects.create(name=f'Підрозділ {root_number}.{child_number}',
+                                        slug=f'child-{root_number}-{child_number}', parent=root)
+        cls.add_products(30)
+
+    @classmethod
+    def add_products(cls, count):
+        categories = list(Category.objects.filter(level=1).order_by('tree_id', 'lft'))
+        start = Product.objects.count()
+        for number in range(start, start + count):
+            product = Product.objects.create(
+                category=categories[number % len(categories)],
+                name=f'Товар {number}',
+                slug=f'product-{number}',
+                sku=f'SKU-{number}',
+                price=Decimal('100.00'),
+            )
+            ProductImage.objects.create(product=product, image=f'products/{number}.jpg', is_main=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertChangelistQueries(self, num, url, data=None):
+        """``num`` queries for ``url``, also after the catalog has doubled."""
+        for _ in range(2):
+            with self.assertNumQueries(num):
+                response = self.client.get(url, data)
+            self.assertEqual(response.status_code, 200)
+            self.add_products(30)
+
+    def test_product_changelist(self):
+        self.assertChangelistQueries(5, reverse('admin:catalog_product_changelist'))
+
+    def test_product_changelist_category_filter(self):
+        url = reverse('admin:catalog_product_changelist')
+        # Products 0 and 1 are in the first root's subtree, product 2 is not
+        response = self.client.get(url, {'category_tree': self.roots[0].pk})
+        self.assertContains(response, '>SKU-0<')
+        self.assertNotContains(response, '>SKU-2<')
+        self.assertChangelistQueries(6, url, {'category_tree': self.roots[0].pk})
+
+    def test_product_search(self):
+        url = reverse('admin:catalog_product_changelist')
+        response = self.client.get(url, {'q': 'SKU-3'})
+        self.assertContains(response, '>SKU-3<')
+        self.assertNotContains(response, '>SKU-30<')
+        self.assertChangelistQueries(5, url, {'q': 'SKU-3'})
+
+    def test_category_changelist(self):
+        self.assertChangelistQueries(5, reverse('admin:catalog_category_changelist'))
+
+    def test_category_search(self):
+        self.assertChangelistQueries(5, reverse('admin:catalog_category_changelist'), {'q': 'Підрозділ'})
+
+    def test_product_image_changelist(self):
+        self.assertChangelistQueries(4, reverse('admin:catalog_productimage_changelist'))
+
+
+@override_settings(ORDER_RATE_LIMIT_PER_IP='', ORDER_RATE_LIMIT_GLOBAL='')
+class CreateOrderTests(TestCase):
+    """Deduplication and rate limiting of /api/create-order/."""
+
+    CART = {'items': [{'sku': 'SKU-1', 'name': 'Товар', 'price': 100, 'qty': 1}], 'currency': 'UAH'}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def post(self, cart=None, key=None):
+        headers = {'Idempotency-Key': key} if key else {}
+        return self.client.post(reverse('catalog:create_order'), cart or self.CART,
+                                content_type='application/json', headers=headers)
+
+    def test_same_key_replays_the_order(self):
+        first = self.post(key='checkout-1')
+        self.assertEqual(first.status_code, 200)
+        replay = self.post(key='checkout-1')
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_same_cart_without_key_replays_while_new(self):
+        first = self.post()
+        self.assertEqual(self.post().json(), first.json())
+        Order.objects.update(status=Order.STATUS_CONFIRMED)
+        self.assertNotEqual(self.post().json(), first.json())
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_reused_for_another_cart(self):
+        self.post(key='checkout-1')
+        other = {**self.CART, 'items': [{**self.CART['items'][0], 'qty': 2}]}
+        response = self.post(other, key='checkout-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @mock.patch.object(api, 'DEDUP_WAIT_SECONDS', 0.1)
+    def test_key_claimed_by_a_request_in_flight(self):
+        # Claimed by a concurrent request that has not created the order yet
+        data, _error = api._order_data(self.CART, 'checkout-1')
+        fingerprint, _cart_key, claim_key = api._claim_keys(data, 'checkout-1', '127.0.0.1')
+        cache.add(claim_key, {'fingerprint': fingerprint, 'order_id': None})
+        response = self.post(key='checkout-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(ORDER_RATE_LIMIT_PER_IP='1/m')
+    def test_rate_limit(self):
+        self.assertEqual(self.post().status_code, 200)
+        response = self.post(key='checkout-2')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @override_settings(ORDER_RATE_LIMIT_PER_IP='3/m', ORDER_RATE_LIMIT_GLOBAL='1/m')
+    def test_rejected_request_gives_back_its_tokens(self):
+        self.assertEqual(self.post().status_code, 200)
+        # Taken from the per-IP bucket, then rejected by the global one
+        for number in range(3):
+            self.assertEqual(self.post(key=f'checkout-{number}').status_code, 429)
+        with override_settings(ORDER_RATE_LIMIT_GLOBAL=''):
+            self.assertEqual(self.post(key='checkout-3').status_code, 200)
+            self.assertEqual(self.post(key='checkout-4').status_code, 200)
+            self.assertEqual(self.post(key='checkout-5').status_code, 429)
@@ -0,0 +1,136 @@
+"""
+Category tree maintenance.
+
+django-mptt keeps lft/rght/tree_id/level in sync on every save, and with
+``order_insertion_by = ['order', 'name']`` a single insert can shift those
+values across a whole tree. The helpers here batch structural changes and
+touch only the trees that actually changed, instead of Category.objects.rebuild().
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count
+from mptt.exceptions import InvalidMove
+
+from .cache import bump_catalog_version
+from .models import Category, Product
+
+# Drop positions used by the admin tree -> django-mptt move_node() positions
+MOVE_POSITIONS = {
+    'before': 'left',
+    'after': 'right',
+    'inside': 'last-child',
+}
+
+
+@contextmanager
+def batch_tree_updates():
+    """
+    Defer MPTT maintenance for a block of category writes.
+
+    Saves inside the block only write their own row; every tree that was
+    touched is partially rebuilt once on exit, in the same transaction.
+    Tree fields of the saved instances are stale until the block ends.
+    Yields a function that marks a tree as touched, for rows written without
+    save() (bulk_create(), queryset updates).
+    """
+    with transaction.atomic():
+        with Category.objects.delay_mptt_updates():
+            yield Category._mptt_track_tree_modified
+        transaction.on_commit(bump_catalog_version)
+
+
+def child_nodes(parent_id=None):
+    """
+    One level of the tree for the lazy admin view: the roots or the children
+    of ``parent_id``, with direct product counts. Two queries regardless of size.
+    """
+    nodes = list(
+        Category.objects.filter(parent_id=parent_id)
+        .order_by('tree_id', 'lft')
+        .values('id', 'name', 'slug', 'order', 'is_active', 'lft', 'rght')
+    )
+    counts = dict(
+        Product.objects.filter(category_id__in=[node['id'] for node in nodes])
+        .order_by()
+        .values_list('category_id')
+        .annotate(total=Count('id'))
+    )
+    for node in nodes:
+        node['has_children'] = node.pop('rght') - node.pop('lft') > 1
+        node['products'] = counts.get(node['id'], 0)
+    return nodes
+
+
+def renumber_siblings(parent_id):
+    """
+    Rewrite ``order`` of a sibling group to match its current tree position,
+    so a later save() (which re-sorts by order_insertion_by) keeps it in place.
+    Only rows whose value changes are written.
+    """
+    siblings = list(
+        Category.objects.filter(parent_id=parent_id)
+        .order_by('tree_id', 'lft')
+        .only('id', 'order')
+    )
+    changed = []
+    for index, sibling in enumerate(siblings):
+        if sibling.order != index:
+            sibling.order = index
+            changed.append(sibling)
+    Category.objects.bulk_update(changed, ['order'])
+    return len(changed)
+
+
+def reorder_siblings(node, target, position):
+    """
+    Put ``node`` before/after its sibling ``target`` by rewriting ``order``
+    of the sibling group. Must run inside batch_tree_updates(): the saves
+    only write ``order`` and the tree is rebuilt once, sorted by it.
+    """
+    siblings = [
+        sibling for sibling in Category.objects.filter(parent_id=node.parent_id).order_by('tree_id', 'lft')
+        if sibling.pk != node.pk
+    ]
+    index = next(index for index, sibling in enumerate(siblings) if sibling.pk == target.pk)
+    siblings.insert(index + (position == 'after'), node)
+    for index, sibling in enumerate(siblings):
+        if sibling.order != index:
+            sibling.order = index
+            sibling.save(update_fields=['order'])
+
+
+def move_category(node, target, position):
+    """
+    Move ``node`` before/after/inside ``target``.
+
+    A reorder within one parent rewrites ``order`` of the siblings under
+    batch_tree_updates(), so their tree is rebuilt once instead of being
+    shifted on every save. Other moves (a new parent, or roots, whose tree
+    order a partial rebuild cannot change) use django-mptt's incremental
+    move (UPDATEs limited to the affected lft/rght ranges), then renumber
+    ``order`` of the old and new sibling groups. Raises InvalidMove for moves
+    into the node's own subtree or an unknown position.
+    """
+    if position not in MOVE_POSITIONS:
+        raise InvalidMove(f'Невідома позиція: {position!r}')
+    if node.pk == target.pk:
+        raise InvalidMove('Категорію не можна перемістити відносно самої себе.')
+
+    with transaction.atomic():
+        # Re-read both rows inside the transaction: tree fields may have shifted
+        node = Category.objects.select_for_update().get(pk=node.pk)
+        target = Category.objects.select_for_update().get(pk=target.pk)
+        old_parent_id = node.parent_id
+
+        if position != 'inside' and old_parent_id is not None and target.parent_id == old_parent_id:
+            with batch_tree_updates():
+                reorder_siblings(node, target, position)
+        else:
+            Category.objects.move_node(node, target, MOVE_POSITIONS[position])
+            renumber_siblings(node.parent_id)
+            if old_parent_id != node.parent_id:
+                renumber_siblings(old_parent_id)
+            transaction.on_commit(bump_catalog_version)
+        node.refresh_from_db(fields=['parent', 'order', 'tree_id', 'lft', 'rght', 'level'])
+    return node
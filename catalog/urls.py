@@ -1,19 +1,30 @@
+from django.conf import settings
 from django.urls import path
 from django.views.generic import TemplateView
 
-from . import api, views
+from . import api, async_views, feeds, sitemaps, views
 
 app_name = 'catalog'
 
+if getattr(settings, 'CATALOG_ASYNC_VIEWS', False):
+    page_views, order_api = async_views, async_views
+else:
+    page_views, order_api = views, api
+
 urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
+    path('', page_views.IndexView.as_view(), name='index'),
     path('about/', TemplateView.as_view(template_name='pages/about.html'), name='about'),
     path('delivery/', TemplateView.as_view(template_name='pages/delivery.html'), name='delivery'),
     path('catalog/', views.CategoryListView.as_view(), name='category_list'),
-    path('catalog/<slug:slug>/', views.CategoryDetailView.as_view(), name='category_detail'),
-    path('catalog/<slug:category_slug>/<slug:product_slug>/', views.ProductDetailView.as_view(), name='product_detail'),
+    path('catalog/<slug:slug>/', page_views.CategoryDetailView.as_view(), name='category_detail'),
+    path('catalog/<slug:category_slug>/<slug:product_slug>/', page_views.ProductDetailView.as_view(), name='product_detail'),
     path('cart/', TemplateView.as_view(template_name='catalog/cart.html'), name='cart'),
-    path('api/create-order/', api.create_order, name='create_order'),
-    path('api/order/<str:order_id>/', api.get_order, name='get_order'),
-    path('api/order/<str:order_id>/confirm/', api.confirm_order, name='confirm_order'),
+    path('sitemap.xml', sitemaps.sitemap_index, name='sitemap'),
+    path('sitemap-<str:section>-<int:page>.xml', sitemaps.sitemap_section, name='sitemap_section'),
+    path('feeds/<str:name>.xml', feeds.feed_view, name='feed'),
+    path('api/create-order/', order_api.create_order, name='create_order'),
+    path('api/bulk-order/', order_api.bulk_order, name='bulk_order'),
+    path('api/order/<str:order_id>/', order_api.get_order, name='get_order'),
+    path('api/order/<str:order_id>/events/', order_api.order_events, name='order_events'),
+    path('api/order/<str:order_id>/confirm/', order_api.confirm_order, name='confirm_order'),
 ]
@@ -0,0 +1,54 @@
+from django.urls import reverse
+from django.utils.text import slugify
+
+
+# Transliteration table for Ukrainian
+TRANSLIT_TABLE = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'h', 'ґ': 'g', 'д': 'd', 'е': 'e',
+    'є': 'ie', 'ж': 'zh', 'з': 'z', 'и': 'y', 'і': 'i', 'ї': 'i', 'й': 'i',
+    'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch',
+    'ш': 'sh', 'щ': 'shch', 'ь': '', 'ю': 'iu', 'я': 'ia',
+    'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'H', 'Ґ': 'G', 'Д': 'D', 'Е': 'E',
+    'Є': 'Ie', 'Ж': 'Zh', 'З': 'Z', 'И': 'Y', 'І': 'I', 'Ї': 'I', 'Й': 'I',
+    'К': 'K', 'Л': 'L', 'М': 'M', 'Н': 'N', 'О': 'O', 'П': 'P', 'Р': 'R',
+    'С': 'S', 'Т': 'T', 'У': 'U', 'Ф': 'F', 'Х': 'Kh', 'Ц': 'Ts', 'Ч': 'Ch',
+    'Ш': 'Sh', 'Щ': 'Shch', 'Ь': '', 'Ю': 'Iu', 'Я': 'Ia',
+}
+
+
+def transliterate(text):
+    """Transliterate Ukrainian text to Latin characters."""
+    result = []
+    for char in text:
+        result.append(TRANSLIT_TABLE.get(char, char))
+    return ''.join(result)
+
+
+def make_slug(text):
+    """Create a slug from Ukrainian text."""
+    return slugify(transliterate(text))
+
+
+def batched(iterable, size):
+    """Yield lists of up to `size` items from any iterable, lazily."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def url_pattern(name, *kwargs):
+    """
+    reverse() a URL once with placeholders and return a str.format() pattern,
+    e.g. url_pattern('catalog:category_detail', 'slug') -> '/catalog/{slug}/'.
+    Cheap way to build many URLs from values() rows.
+    """
+    url = reverse(name, kwargs={key: f'__{key}__' for key in kwargs})
+    for key in kwargs:
+        url = url.replace(f'__{key}__', '{%s}' % key)
+    return url
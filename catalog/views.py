@@ -4,6 +4,28 @@ from django.shortcuts import get_object_or_404
 from django.views.generic import DetailView, ListView, TemplateView
 
 from .models import Category, Product
+from .popularity import record_view
+
+
+def pagination_context(paginator, page_obj):
+    """Template context for a paginated product grid."""
+    context = {
+        'products': page_obj,
+        'page_obj': page_obj,
+        'paginator': paginator,
+        'is_paginated': page_obj.has_other_pages(),
+        'products_count': paginator.count,
+    }
+    if page_obj.has_other_pages():
+        current = page_obj.number
+        total_pages = paginator.num_pages
+        window = 2
+        start = max(current - window, 1)
+        end = min(current + window, total_pages)
+        context['page_numbers'] = list(range(start, end + 1))
+        context['show_left_ellipsis'] = start > 2
+        context['show_right_ellipsis'] = end < total_pages - 1
+    return context
 
 
 class IndexView(TemplateView):
@@ -13,7 +35,9 @@ class IndexView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['categories'] = Category.objects.filter(is_active=True, level=0)
-        context['popular_products'] = Product.objects.filter(is_popular=True, is_available=True)[:8]
+        context['popular_products'] = Product.objects.filter(
+            is_popular=True, is_available=True
+        ).order_by('-popularity_score', '-created_at')[:8]
         context['new_products'] = Product.objects.filter(is_new=True, is_available=True)[:8]
         return context
 
@@ -50,20 +74,7 @@ class CategoryDetailView(DetailView):
         paginator = Paginator(products_qs, page_size)
         page_number = self.request.GET.get('page')
         page_obj = paginator.get_page(page_number)
-        context['products'] = page_obj
-        context['page_obj'] = page_obj
-        context['paginator'] = paginator
-        context['is_paginated'] = page_obj.has_other_pages()
-        context['products_count'] = paginator.count
-        if page_obj.has_other_pages():
-            current = page_obj.number
-            total_pages = paginator.num_pages
-            window = 2
-            start = max(current - window, 1)
-            end = min(current + window, total_pages)
-            context['page_numbers'] = list(range(start, end + 1))
-            context['show_left_ellipsis'] = start > 2
-            context['show_right_ellipsis'] = end < total_pages - 1
+        context.update(pagination_context(paginator, page_obj))
         context['subcategories'] = category.get_children().filter(is_active=True)
         context['ancestors'] = category.get_ancestors()
         return context
@@ -89,6 +100,11 @@ class ProductDetailView(DetailView):
             category__slug=self.kwargs['category_slug']
         )
 
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        record_view(self.object.pk)
+        return response
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         product = self.object
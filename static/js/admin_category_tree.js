@@ -0,0 +1,177 @@
+// Lazy drag-and-drop category tree for the admin (templates/admin/catalog/category/tree.html)
+(function () {
+    const root = document.getElementById('category-tree');
+    if (!root) {
+        return;
+    }
+    const statusEl = document.getElementById('tree-status');
+    const canChange = root.dataset.canChange === '1';
+    const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
+    let dragged = null;
+
+    const setStatus = (message, isError = false) => {
+        statusEl.textContent = message;
+        statusEl.style.color = isError ? 'var(--error-fg)' : '';
+    };
+
+    const changeUrl = (id) => root.dataset.changeUrl.replace('/0/', `/${id}/`);
+
+    const loadChildren = async (list, parentId) => {
+        const url = new URL(root.dataset.nodesUrl, window.location.origin);
+        if (parentId) {
+            url.searchParams.set('parent', parentId);
+        }
+        const response = await fetch(url, { headers: { Accept: 'application/json' } });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const data = await response.json();
+        list.replaceChildren(...data.nodes.map(renderNode));
+        list.dataset.loaded = '1';
+    };
+
+    const renderNode = (node) => {
+        const item = document.createElement('li');
+        item.dataset.id = node.id;
+        if (!node.is_active) {
+            item.classList.add('inactive');
+        }
+
+        const row = document.createElement('div');
+        row.className = 'node';
+        row.draggable = canChange;
+
+        const toggle = document.createElement('span');
+        toggle.className = 'toggle';
+        toggle.textContent = node.has_children ? '▸' : '·';
+
+        const link = document.createElement('a');
+        link.className = 'name';
+        link.href = changeUrl(node.id);
+        link.textContent = node.name;
+
+        const meta = document.createElement('span');
+        meta.className = 'meta';
+        meta.textContent = `${node.slug} · товарів: ${node.products}`;
+
+        row.append(toggle, link, meta);
+        item.append(row);
+
+        const children = document.createElement('ul');
+        children.hidden = true;
+        item.append(children);
+
+        toggle.addEventListener('click', () => toggleNode(item));
+        if (canChange) {
+            bindDrag(item, row);
+        }
+        return item;
+    };
+
+    const toggleNode = async (item, forceOpen = false) => {
+        const toggle = item.querySelector(':scope > .node > .toggle');
+        const children = item.querySelector(':scope > ul');
+        if (toggle.textContent === '·' && !forceOpen) {
+            return;
+        }
+        const open = forceOpen || children.hidden;
+        if (open && !children.dataset.loaded) {
+            toggle.textContent = '…';
+            try {
+                await loadChildren(children, item.dataset.id);
+            } catch (err) {
+                toggle.textContent = '▸';
+                setStatus(`Не вдалося завантажити гілку: ${err.message}`, true);
+                return;
+            }
+        }
+        children.hidden = !open;
+        toggle.textContent = open ? '▾' : '▸';
+    };
+
+    const dropPosition = (row, event) => {
+        const rect = row.getBoundingClientRect();
+        const offset = (event.clientY - rect.top) / rect.height;
+        if (offset < 0.25) {
+            return 'before';
+        }
+        if (offset > 0.75) {
+            return 'after';
+        }
+        return 'inside';
+    };
+
+    const clearMarkers = (row) => row.classList.remove('drop-before', 'drop-after', 'drop-inside');
+
+    const bindDrag = (item, row) => {
+        row.addEventListener('dragstart', (event) => {
+            dragged = item;
+            event.dataTransfer.effectAllowed = 'move';
+            event.dataTransfer.setData('text/plain', item.dataset.id);
+        });
+        row.addEventListener('dragend', () => {
+            dragged = null;
+        });
+        row.addEventListener('dragover', (event) => {
+            if (!dragged || dragged === item || dragged.contains(item)) {
+                return;
+            }
+            event.preventDefault();
+            clearMarkers(row);
+            row.classList.add(`drop-${dropPosition(row, event)}`);
+        });
+        row.addEventListener('dragleave', () => clearMarkers(row));
+        row.addEventListener('drop', async (event) => {
+            event.preventDefault();
+            clearMarkers(row);
+            if (!dragged || dragged === item || dragged.contains(item)) {
+                return;
+            }
+            await moveNode(dragged, item, dropPosition(row, event));
+        });
+    };
+
+    const moveNode = async (source, target, position) => {
+        const body = new URLSearchParams({
+            node: source.dataset.id,
+            target: target.dataset.id,
+            position,
+        });
+        setStatus('Збереження…');
+        let data = {};
+        try {
+            const response = await fetch(root.dataset.moveUrl, {
+                method: 'POST',
+                headers: { 'X-CSRFToken': csrfToken },
+                body,
+            });
+            data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.error || `HTTP ${response.status}`);
+            }
+        } catch (err) {
+            setStatus(`Не вдалося перемістити: ${err.message}`, true);
+            return;
+        }
+
+        // Mirror the move locally instead of reloading the tree
+        const oldList = source.parentElement;
+        if (position === 'inside') {
+            const children = target.querySelector(':scope > ul');
+            if (children.dataset.loaded) {
+                children.append(source);
+            } else {
+                source.remove();
+            }
+            await toggleNode(target, true);
+        } else {
+            target.insertAdjacentElement(position === 'before' ? 'beforebegin' : 'afterend', source);
+        }
+        if (oldList !== root && !oldList.children.length) {
+            oldList.closest('li').querySelector(':scope > .node > .toggle').textContent = '·';
+        }
+        setStatus('Збережено.');
+    };
+
+    loadChildren(root, null).catch((err) => setStatus(`Не вдалося завантажити дерево: ${err.message}`, true));
+})();
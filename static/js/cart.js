@@ -498,6 +498,7 @@ log('[cart] cart.js loaded; window.addToCart =', typeof window.addToCart);
                         cartContainer.innerHTML = '';
                         try {
                             renderSuccessModal({ showTelegramLink: true });
+                            watchOrderStatus(localStorage.getItem('order_id'));
                         } catch (err) {
                             // ignore
                         }
@@ -507,6 +508,7 @@ log('[cart] cart.js loaded; window.addToCart =', typeof window.addToCart);
                 // Remove stale flags
                 localStorage.removeItem('order_sent');
                 localStorage.removeItem('order_time');
+                localStorage.removeItem('order_id');
             }
         }
     };
@@ -529,6 +531,18 @@ log('[cart] cart.js loaded; window.addToCart =', typeof window.addToCart);
         items: [],
         total: 0,
         isSubmitting: false,
+        // One key per checkout attempt: retries and repeated clicks reuse it,
+        // so the server returns the same order instead of creating another.
+        idempotencyKey: '',
+    };
+
+    const ORDER_RETRY_DELAYS = [500, 1500];
+
+    const newIdempotencyKey = () => {
+        if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+            return window.crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
     };
 
     const getCookie = (name) => {
@@ -599,6 +613,7 @@ log('[cart] cart.js loaded; window.addToCart =', typeof window.addToCart);
     const closeCheckoutModal = () => {
         const modal = document.getElementById('checkout-modal');
         if (!modal) return;
+        stopOrderStatus();
         modal.classList.remove('is-open');
         modal.setAttribute('hidden', '');
         document.body.classList.remove('modal-open');
@@ -624,14 +639,33 @@ log('[cart] cart.js loaded; window.addToCart =', typeof window.addToCart);
             throw new Error('Не вдалося отримати CSRF токен.');
         }
 
-        const response = await fetch('/api/create-order/', {
+        if (!checkoutState.idempotencyKey) {
+            checkoutState.idempotencyKey = newIdempotencyKey();
+        }
+        const request = {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': csrfToken,
+                'Idempotency-Key': checkoutState.idempotencyKey,
             },
             body: JSON.stringify(buildOrderPayload()),
-        });
+        };
+
+        let response = null;
+        for (let attempt = 0; ; attempt += 1) {
+            try {
+                response = await fetch('/api/create-order/', request);
+                break;
+            } catch (err) {
+                // Network error: the order may or may not exist, the key makes retrying safe
+                if (attempt >= ORDER_RETRY_DELAYS.length) {
+                    throw new Error('Немає зʼєднання з сервером. Спробуйте ще раз.');
+                }
+                log('[Cart] Network error, retrying create-order:', err);
+                await new Promise((resolve) => setTimeout(resolve, ORDER_RETRY_DELAYS[attempt]));
+            }
+        }
 
         if (!response.ok) {
             let errorMessage = 'Помилка при створенні замовлення.';
@@ -688,6 +722,108 @@ log('[cart] cart.js loaded; window.addToCart =', typeof window.addToCart);
         document.body.classList.add('modal-open');
     };
 
+    // Live order status from /api/order/<id>/events/ while the success modal
+    // is shown: Server-Sent Events when the site runs the async views
+    // (<body data-order-events="sse">), otherwise a long poll with pauses, so
+    // waiting pages do not hold the sync workers.
+    const ORDER_STATUS_MESSAGES = {
+        confirmed: ['✅ Замовлення підтверджено', 'Менеджер зв’яжеться з вами найближчим часом.'],
+        paid: ['✅ Замовлення оплачено', 'Дякуємо! Ми готуємо його до відправки.'],
+        shipped: ['📦 Замовлення відправлено', ''],
+        cancelled: ['Замовлення скасовано', 'Якщо це помилка, зверніться до нас у Telegram.'],
+    };
+    const ORDER_FINAL_STATUSES = ['shipped', 'cancelled'];
+    const ORDER_POLL_PAUSE = 3000;
+    const ORDER_WATCH_MAX_MS = 15 * 60 * 1000;
+    const orderWatch = { source: null, generation: 0 };
+
+    const stopOrderStatus = () => {
+        orderWatch.generation += 1;
+        if (orderWatch.source) {
+            orderWatch.source.close();
+            orderWatch.source = null;
+        }
+    };
+
+    const isSuccessModalOpen = () => {
+        const modal = document.getElementById('checkout-modal');
+        return !!modal && !modal.hasAttribute('hidden');
+    };
+
+    const showOrderStatus = (data) => {
+        const messages = ORDER_STATUS_MESSAGES[data.status];
+        if (!messages) return;
+        const modal = document.getElementById('checkout-modal');
+        if (!modal || modal.hasAttribute('hidden')) return;
+        const title = modal.querySelector('#checkout-modal-title');
+        const subtitle = modal.querySelector('.checkout-modal-subtitle');
+        if (title) title.textContent = messages[0];
+        if (subtitle) {
+            subtitle.textContent = data.ttn ? `ТТН: ${data.ttn}` : messages[1];
+        }
+    };
+
+    const watchOrderStatus = (orderId) => {
+        if (!orderId) return;
+        stopOrderStatus();
+        const generation = orderWatch.generation;
+        const stopAt = Date.now() + ORDER_WATCH_MAX_MS;
+        const url = `/api/order/${encodeURIComponent(orderId)}/events/`;
+        const handle = (data) => {
+            showOrderStatus(data);
+            if (ORDER_FINAL_STATUSES.includes(data.status)) {
+                localStorage.removeItem('order_id');
+                // The server ends the stream here; do not let EventSource reconnect
+                stopOrderStatus();
+            }
+        };
+
+        if (document.body.dataset.orderEvents === 'sse' && window.EventSource) {
+            const source = new EventSource(url);
+            orderWatch.source = source;
+            source.addEventListener('status', (event) => {
+                try {
+                    handle(JSON.parse(event.data));
+                } catch (err) {
+                    console.error('[Cart] Bad order status event:', err);
+                }
+            });
+            setTimeout(() => {
+                if (orderWatch.source === source) stopOrderStatus();
+            }, ORDER_WATCH_MAX_MS);
+            return;
+        }
+
+        const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+        const watching = () => generation === orderWatch.generation && isSuccessModalOpen() && Date.now() < stopAt;
+        let status = 'new';
+        const poll = async () => {
+            while (watching()) {
+                let pause = ORDER_POLL_PAUSE;
+                try {
+                    const response = await fetch(`${url}?status=${encodeURIComponent(status)}`);
+                    if (response.status === 429 || response.status === 503) {
+                        pause = (Number(response.headers.get('Retry-After')) || 10) * 1000;
+                    } else if (!response.ok) {
+                        return;
+                    } else {
+                        const data = await response.json();
+                        if (data.status !== status) {
+                            status = data.status;
+                            if (!watching()) return;
+                            handle(data);
+                        }
+                        if (ORDER_FINAL_STATUSES.includes(status)) return;
+                    }
+                } catch (err) {
+                    pause = 5000;
+                }
+                await sleep(pause);
+            }
+        };
+        poll();
+    };
+
     const startCheckout = () => {
         const cart = getCart();
         const items = Object.values(cart.items || {});
@@ -700,6 +836,8 @@ log('[cart] cart.js loaded; window.addToCart =', typeof window.addToCart);
             (sum, item) => sum + (Number(item.price) || 0) * (Number(item.qty) || 1),
             0
         );
+        // Opening the checkout starts a new attempt (the cart may have changed)
+        checkoutState.idempotencyKey = '';
         openCheckoutModal();
     };
 
@@ -770,6 +908,7 @@ log('[cart] cart.js loaded; window.addToCart =', typeof window.addToCart);
                 sessionStorage.setItem('order_just_sent', 'true');
                 localStorage.setItem('order_sent', 'true');
                 localStorage.setItem('order_time', String(Date.now()));
+                localStorage.setItem('order_id', orderId);
                 setOrderTimestamp();
                 log('[Cart] ✅ Cart cleared from localStorage');
             } catch (err) {
@@ -778,6 +917,7 @@ log('[cart] cart.js loaded; window.addToCart =', typeof window.addToCart);
 
             checkoutState.items = [];
             checkoutState.total = 0;
+            checkoutState.idempotencyKey = '';
 
             try {
                 if (window.updateCartBadge) {
@@ -799,6 +939,7 @@ log('[cart] cart.js loaded; window.addToCart =', typeof window.addToCart);
                 try {
                     const popupOpened = !!botPopup;
                     renderSuccessModal({ showTelegramLink: !popupOpened });
+                    watchOrderStatus(orderId);
                     log('[Cart] ✅ Success modal shown');
                 } catch (err) {
                     console.error('[Cart] ❌ Failed to show success modal:', err);
@@ -5,11 +5,8 @@ import asyncio
 import base64
 import json
 import logging
-import os
 import re
-import ssl
 from typing import Any, Dict, List, Optional, Tuple
-from urllib import request as urlrequest
 
 from telegram import (
     InlineKeyboardButton,
@@ -29,7 +26,13 @@ from telegram.ext import (
     filters,
 )
 
-from config import BOT_TOKEN, LOG_FILE, ORDERS_CHAT_ID, MANAGER_USERNAME, SITE_URL, PAYMENT_DETAILS
+from config import (
+    BOT_TOKEN, LOG_FILE, ORDERS_CHAT_ID, MANAGER_USERNAME, SITE_URL, PAYMENT_DETAILS,
+    ORDER_INBOX, ORDER_INBOX_TOKEN, ORDER_SOURCE,
+)
+from order_inbox import ORDER_CACHE, start_inbox
+import order_store
+import site_api
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -68,80 +71,30 @@ MENU_ORDER_SENT = "🛒 Замовлення"
 # ============================================
 # ORDER API
 # ============================================
-def _open_url(url: str) -> Optional[bytes]:
-    try:
-        with urlrequest.urlopen(url, timeout=10) as response:
-            if response.status != 200:
-                return None
-            return response.read()
-    except Exception:
-        return None
-
-
-def _open_url_allow_insecure(url: str) -> Optional[bytes]:
-    try:
-        context = ssl._create_unverified_context()
-        with urlrequest.urlopen(url, timeout=10, context=context) as response:
-            if response.status != 200:
-                return None
-            return response.read()
-    except Exception:
-        return None
-
-
-def fetch_order_from_api(order_id: str) -> Optional[dict]:
-    """Fetch order JSON from site API."""
-    bases = []
-    site = SITE_URL.rstrip('/')
-    if site:
-        bases.append(site)
-    env_bases = os.getenv('ORDER_API_BASE_URLS', '')
-    for raw in env_bases.split(','):
-        base = raw.strip().rstrip('/')
-        if base:
-            bases.append(base)
-    if '127.0.0.1' not in ' '.join(bases):
-        bases.append('http://127.0.0.1:8000')
-    if 'localhost' not in ' '.join(bases):
-        bases.append('http://localhost:8000')
-
-    for base_url in bases:
-        url = f"{base_url}/api/order/{order_id}/"
+async def load_order(order_id: str) -> Optional[dict]:
+    """
+    Order pushed by the site, else read from the order store (ORDER_SOURCE=store),
+    else fetched from the API. A store read that succeeds is final.
+    """
+    order_data = ORDER_CACHE.get(order_id)
+    if order_data:
+        return order_data
+    if ORDER_SOURCE == 'store':
         try:
-            data = _open_url(url)
-            if data is None:
-                data = _open_url_allow_insecure(url)
-            if data is None:
-                continue
-            return json.loads(data.decode('utf-8'))
-        except Exception as exc:
-            logger.error(f"Failed to fetch order {order_id} from {base_url}: {exc}")
-            continue
-    return None
+            return await asyncio.to_thread(order_store.read_order, order_id)
+        except order_store.StoreUnavailable as exc:
+            logger.error(f"Order store unavailable, falling back to the API: {exc}")
+    order_data = await site_api.fetch_order(order_id)
+    if not order_data:
+        await asyncio.sleep(1)
+        order_data = ORDER_CACHE.get(order_id) or await site_api.fetch_order(order_id)
+    return order_data
 
 
-def confirm_order_via_api(order_id: str) -> bool:
-    """Mark order as confirmed via site API."""
-    base_url = SITE_URL.rstrip('/')
-    url = f"{base_url}/api/order/{order_id}/confirm/"
-    request = urlrequest.Request(url, method='POST', data=b'{}', headers={'Content-Type': 'application/json'})
-    try:
-        try:
-            with urlrequest.urlopen(request, timeout=10) as response:
-                if response.status != 200:
-                    return False
-                data = response.read()
-        except Exception:
-            context = ssl._create_unverified_context()
-            with urlrequest.urlopen(request, timeout=10, context=context) as response:
-                if response.status != 200:
-                    return False
-                data = response.read()
-        payload = json.loads((data or b'{}').decode('utf-8'))
-        return payload.get('status') == 'confirmed'
-    except Exception as exc:
-        logger.error(f"Failed to confirm order {order_id}: {exc}")
-        return False
+async def confirm_order(order_id: str) -> bool:
+    if ORDER_SOURCE == 'store' and await asyncio.to_thread(order_store.confirm_order, order_id):
+        return True
+    return await site_api.confirm_order(order_id)
 
 
 # ============================================
@@ -494,10 +447,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
         if re.match(r'^[a-z0-9]{8,12}$', payload):
             order_id = payload
-            order_data = fetch_order_from_api(order_id)
-            if not order_data:
-                await asyncio.sleep(1)
-                order_data = fetch_order_from_api(order_id)
+            order_data = await load_order(order_id)
             if not order_data:
                 await update.message.reply_text(
                     "⏳ Замовлення ще обробляється. Будь ласка, повторіть команду "
@@ -736,8 +686,8 @@ async def finalize_order(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     order_id = context.user_data.get("order_id")
 
     if order_id:
-        if not confirm_order_via_api(str(order_id)):
-            logger.warning(f"Failed to confirm order {order_id} via API")
+        if not await confirm_order(str(order_id)):
+            logger.warning(f"Failed to confirm order {order_id}")
 
     try:
         if group_message_sent:
@@ -910,6 +860,19 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
     logger.exception("Error: %s", context.error)
 
 
+async def post_init(application: Application) -> None:
+    if ORDER_INBOX:
+        application.bot_data["order_inbox"] = await start_inbox(ORDER_INBOX, ORDER_INBOX_TOKEN)
+
+
+async def post_shutdown(application: Application) -> None:
+    server = application.bot_data.get("order_inbox")
+    if server:
+        server.close()
+        await server.wait_closed()
+    await site_api.close()
+
+
 def main() -> None:
     logger.info("Starting ANTIDRONE Order Bot...")
 
@@ -920,6 +883,8 @@ def main() -> None:
         .read_timeout(30.0)
         .write_timeout(30.0)
         .pool_timeout(30.0)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .build()
     )
 
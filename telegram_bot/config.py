@@ -15,6 +15,22 @@ MANAGER_USERNAME = os.getenv('MANAGER_USERNAME', '')
 SITE_URL = os.getenv('SITE_URL', '')
 TELEGRAM_CHANNEL = os.getenv('TELEGRAM_CHANNEL', '')
 
+# Where the bot reads orders: "api" (HTTP, SITE_URL / ORDER_API_BASE_URLS) or
+# "store" (the site's order store directly, when the bot runs on the same host;
+# the API stays as fallback). SITE_PROJECT_DIR is the Django project root.
+ORDER_SOURCE = os.getenv('ORDER_SOURCE', 'api')
+# Extra base URLs of the order API (comma-separated), requested together with
+# SITE_URL; and the timeout of each API call in seconds
+ORDER_API_BASE_URLS = os.getenv('ORDER_API_BASE_URLS', '')
+ORDER_API_TIMEOUT = float(os.getenv('ORDER_API_TIMEOUT', '5'))
+SITE_PROJECT_DIR = os.getenv('SITE_PROJECT_DIR', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Inbox for orders pushed by the site (dispatch_outbox): "127.0.0.1:8081" or
+# "unix:/run/antidrone/bot.sock"; empty disables it. The token must match the
+# site's ORDER_OUTBOX_TOKEN and is required for a TCP address.
+ORDER_INBOX = os.getenv('ORDER_INBOX', '')
+ORDER_INBOX_TOKEN = os.getenv('ORDER_INBOX_TOKEN', '')
+
 # Payment details
 PAYMENT_DETAILS = {
     'privat': {
@@ -0,0 +1,119 @@
+"""Inbox for orders pushed by the site (dispatch_outbox) and the in-memory order cache.
+
+A minimal HTTP/1.1 server on the bot's event loop: POST /orders with the
+order JSON and the shared X-Outbox-Token. Accepted orders are kept in
+ORDER_CACHE, so /start <order_id> usually finds the order without asking
+the site's API. Listens on ORDER_INBOX: ``host:port`` or ``unix:/path``.
+A TCP inbox refuses to start without ORDER_INBOX_TOKEN; a Unix socket is
+protected by its file permissions, so the token is optional there.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ORDER_ID_RE = re.compile(r'^[a-z0-9]{8,12}$')
+MAX_BODY = 256 * 1024
+READ_TIMEOUT = 30
+
+
+class OrderCache:
+    """LRU of recently pushed orders, each kept for ``ttl`` seconds."""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 24 * 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._orders: 'OrderedDict[str, tuple]' = OrderedDict()
+
+    def put(self, order: dict) -> None:
+        self._orders[order['order_id']] = (time.monotonic() + self.ttl, order)
+        self._orders.move_to_end(order['order_id'])
+        while len(self._orders) > self.max_size:
+            self._orders.popitem(last=False)
+
+    def get(self, order_id: str) -> Optional[dict]:
+        entry = self._orders.get(order_id)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._orders[order_id]
+            return None
+        return entry[1]
+
+
+ORDER_CACHE = OrderCache()
+
+
+def _response(writer, status: int, reason: str) -> None:
+    writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Length: 0\r\n\r\n'.encode('ascii'))
+
+
+async def _handle(reader, writer, token: str, cache: OrderCache) -> None:
+    """Serve requests of one keep-alive connection."""
+    try:
+        while True:
+            request_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+            if not request_line:
+                return
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length') or 0)
+            if length > MAX_BODY:
+                _response(writer, 413, 'Payload Too Large')
+                return
+            body = await reader.readexactly(length)
+
+            method, path = (request_line.decode('latin-1').split() + ['', ''])[:2]
+            if method != 'POST' or path != '/orders':
+                _response(writer, 404, 'Not Found')
+            elif token and not hmac.compare_digest(headers.get('x-outbox-token', '').encode(), token.encode()):
+                _response(writer, 403, 'Forbidden')
+            else:
+                try:
+                    order = json.loads(body)
+                    valid = ORDER_ID_RE.match(str(order.get('order_id', ''))) and isinstance(order.get('items'), list)
+                except (ValueError, AttributeError):
+                    valid = False
+                if valid:
+                    cache.put(order)
+                    logger.info("Order %s pushed by the site", order['order_id'])
+                    _response(writer, 204, 'No Content')
+                else:
+                    _response(writer, 400, 'Bad Request')
+            await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ValueError):
+        return
+    finally:
+        writer.close()
+
+
+async def start_inbox(address: str, token: str, cache: OrderCache = ORDER_CACHE):
+    """Start listening on ``host:port`` or ``unix:/path``; returns the asyncio server."""
+    if not address.startswith('unix:') and not token:
+        raise ValueError('ORDER_INBOX_TOKEN is required when ORDER_INBOX is a TCP address')
+
+    def handler(reader, writer):
+        return _handle(reader, writer, token, cache)
+
+    if address.startswith('unix:'):
+        socket_path = address[len('unix:'):]
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(handler, path=socket_path)
+    else:
+        host, _, port = address.rpartition(':')
+        server = await asyncio.start_server(handler, host or '127.0.0.1', int(port))
+    logger.info("Order inbox listening on %s", address)
+    return server
@@ -0,0 +1,68 @@
+"""Direct access to the site's order store for a bot running on the same host.
+
+With ORDER_SOURCE=store the bot loads the site's Django settings from
+SITE_PROJECT_DIR and goes through the same OrderStore as the order API
+(database, file or events backend, whatever ORDER_STORE says), instead of
+calling the API over HTTP. Everything here is blocking: call it through
+asyncio.to_thread() from handlers.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+from config import SITE_PROJECT_DIR
+
+logger = logging.getLogger(__name__)
+
+_setup_lock = threading.Lock()
+_store = None
+
+
+class StoreUnavailable(Exception):
+    """The store could not be read; the caller should fall back to the API."""
+
+
+def _get_store():
+    global _store
+    with _setup_lock:
+        if _store is None:
+            if SITE_PROJECT_DIR not in sys.path:
+                sys.path.insert(0, SITE_PROJECT_DIR)
+            os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'antidrone.settings')
+            import django
+            django.setup()
+            from catalog.order_store import get_order_store
+            _store = get_order_store()
+        return _store
+
+
+def read_order(order_id: str) -> Optional[dict]:
+    """The order in the API's format, None if it does not exist (or expired)."""
+    try:
+        from django.conf import settings
+        from django.db import close_old_connections
+
+        store = _get_store()
+        order = store.get(order_id)
+        close_old_connections()
+    except Exception as exc:
+        raise StoreUnavailable(str(exc)) from exc
+    ttl_seconds = max(settings.ORDER_TTL_HOURS, 1) * 3600
+    if order is None or order.get('created_at', 0) < time.time() - ttl_seconds:
+        return None
+    return {key: order.get(key) for key in ('order_id', 'items', 'total', 'currency', 'ts', 'source')}
+
+
+def confirm_order(order_id: str) -> bool:
+    try:
+        from django.db import close_old_connections
+
+        order = _get_store().transition(order_id, 'confirmed')
+        close_old_connections()
+    except Exception as exc:
+        logger.error(f"Failed to confirm order {order_id} in the store: {exc}")
+        return False
+    return order is not None and order.get('status') == 'confirmed'
@@ -0,0 +1,106 @@
+"""Async client for the site's order API.
+
+All calls share one httpx.AsyncClient, so connections to the site are
+kept alive and reused, and a slow site never blocks the bot's
+event loop. Every call has its own timeout (ORDER_API_TIMEOUT). Orders are
+requested from all base URLs at once (SITE_URL, ORDER_API_BASE_URLS, local
+fallbacks); the first successful answer wins and the other requests are
+cancelled. A base URL whose certificate does not verify is retried without
+verification, as before.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+import httpx
+
+from config import ORDER_API_BASE_URLS, ORDER_API_TIMEOUT, SITE_URL
+
+logger = logging.getLogger(__name__)
+
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
+
+_clients = {}
+
+
+def base_urls() -> List[str]:
+    bases = []
+    site = SITE_URL.rstrip('/')
+    if site:
+        bases.append(site)
+    for raw in ORDER_API_BASE_URLS.split(','):
+        base = raw.strip().rstrip('/')
+        if base and base not in bases:
+            bases.append(base)
+    if '127.0.0.1' not in ' '.join(bases):
+        bases.append('http://127.0.0.1:8000')
+    if 'localhost' not in ' '.join(bases):
+        bases.append('http://localhost:8000')
+    return bases
+
+
+def _client(verify: bool = True) -> httpx.AsyncClient:
+    """The shared client (created on first use, inside the bot's event loop)."""
+    client = _clients.get(verify)
+    if client is None or client.is_closed:
+        client = _clients[verify] = httpx.AsyncClient(
+            limits=LIMITS,
+            timeout=ORDER_API_TIMEOUT,
+            verify=verify,
+            headers={'Accept': 'application/json'},
+        )
+    return client
+
+
+async def close() -> None:
+    """Close the pooled connections; call on shutdown."""
+    while _clients:
+        _verify, client = _clients.popitem()
+        await client.aclose()
+
+
+async def _request(method: str, url: str, timeout: float, **kwargs) -> httpx.Response:
+    try:
+        return await _client().request(method, url, timeout=timeout, **kwargs)
+    except httpx.ConnectError as exc:
+        if not url.startswith('https:') or 'CERTIFICATE' not in str(exc).upper():
+            raise
+        return await _client(verify=False).request(method, url, timeout=timeout, **kwargs)
+
+
+async def _fetch_from(base_url: str, order_id: str, timeout: float) -> Optional[dict]:
+    try:
+        response = await _request('GET', f"{base_url}/api/order/{order_id}/", timeout)
+        if response.status_code != 200:
+            return None
+        return response.json()
+    except (httpx.HTTPError, ValueError) as exc:
+        logger.error(f"Failed to fetch order {order_id} from {base_url}: {exc!r}")
+        return None
+
+
+async def fetch_order(order_id: str, timeout: float = ORDER_API_TIMEOUT) -> Optional[dict]:
+    """Order JSON from the first base URL that has it; None if none does."""
+    tasks = [asyncio.create_task(_fetch_from(base, order_id, timeout)) for base in base_urls()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            order = await next_done
+            if order:
+                return order
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def confirm_order(order_id: str, timeout: float = ORDER_API_TIMEOUT) -> bool:
+    """Mark the order as confirmed through SITE_URL."""
+    url = f"{SITE_URL.rstrip('/')}/api/order/{order_id}/confirm/"
+    try:
+        response = await _request('POST', url, timeout, json={})
+        if response.status_code != 200:
+            return False
+        return response.json().get('status') == 'confirmed'
+    except (httpx.HTTPError, ValueError) as exc:
+        logger.error(f"Failed to confirm order {order_id}: {exc!r}")
+        return False